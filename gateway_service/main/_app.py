@@ -6,10 +6,18 @@ from apscheduler.triggers.cron import CronTrigger
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from ._cache import image_cache, image_filter, phash_index
 from ._config import config
+from ._db import db
+from ._notifier import job_event_hub, notifier
 from ._rabbit import rabbit_connection
 from .libs.cron_libs import retry_lib
-from .middlewares import AccessLogMiddleware, DBSessionMiddleware
+from .middlewares import (
+    AccessLogMiddleware,
+    BodySizeLimitMiddleware,
+    DBSessionMiddleware,
+)
+from .services.storage_client import create_backend, storage_client
 from ._redis import redis
 
 api_docs_enabled = config.ENVIRONMENT == "local"
@@ -30,11 +38,37 @@ scheduler.start()
 async def lifespan(_: FastAPI):
     # Setup phase
     await redis.ping()
+    await notifier.start()
+    await job_event_hub.start()
     await rabbit_connection.connect()
+    await image_cache.start()
+    await storage_client.start(
+        backend=create_backend(
+            config.STORAGE_BACKEND,
+            local_root=config.STORAGE_LOCAL_ROOT,
+            connection_limit=config.GCS_CONNECTION_LIMIT,
+            limit_per_host=config.GCS_CONNECTION_LIMIT_PER_HOST,
+            dns_cache_ttl=config.GCS_DNS_CACHE_TTL,
+            keepalive_timeout=config.GCS_KEEPALIVE_TIMEOUT,
+            download_timeout=config.GCS_DOWNLOAD_TIMEOUT,
+        ),
+        max_download_size=config.UPLOAD_MAX_SIZE,
+    )
+    if config.BLOOM_FILTER_ENABLED:
+        await image_filter.start()
+    if config.PHASH_ENABLED:
+        async with db.scope():
+            await phash_index.start(session=db.session)
     try:
         yield
     finally:
         # Teardown phase
+        await image_cache.close()
+        await image_filter.close()
+        await phash_index.close()
+        await storage_client.close()
+        await notifier.close()
+        await job_event_hub.close()
         await redis.close()
         await rabbit_connection.disconnect()
         scheduler.shutdown()
@@ -50,6 +84,17 @@ app = FastAPI(
     redoc_url=None, docs_url="/docs" if api_docs_enabled else None, lifespan=lifespan
 )
 
+# Bodies too large for an upload are rejected before Starlette parses them
+# into temporary files, spool_upload then checks every file
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_size=(config.UPLOAD_MAX_SIZE + config.UPLOAD_MULTIPART_OVERHEAD)
+    * config.UPLOAD_MAX_FILES,
+    path_limits={
+        "/api/upload-image": config.UPLOAD_MAX_SIZE + config.UPLOAD_MULTIPART_OVERHEAD
+    },
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -0,0 +1,57 @@
+from ._config import config
+from ._db import db
+from ._redis import redis
+from .libs.bloom_filter import CacheKeyFilter
+from .libs.phash_index import PerceptualHashIndex
+from .libs.tiered_cache import TieredCache
+from .services import image_service
+
+# image hash -> pdf url
+image_cache = TieredCache(
+    name="image_cache",
+    redis=redis,
+    loader=image_service.get_cached_pdf_urls,
+    local_maxsize=config.CACHE_LOCAL_MAXSIZE,
+    local_ttl=config.CACHE_LOCAL_TTL,
+)
+
+# image hashes known to image_cache
+image_filter = CacheKeyFilter(
+    name="image_cache",
+    redis=redis,
+    session_factory=db.session_factory,
+    loader=image_service.get_image_hashes,
+    initial_capacity=config.BLOOM_INITIAL_CAPACITY,
+    error_rate=config.BLOOM_ERROR_RATE,
+    start_timeout=config.BLOOM_START_TIMEOUT,
+)
+
+# perceptual hash -> image hashes
+phash_index = PerceptualHashIndex(
+    name="image_phash",
+    redis=redis,
+    loader=image_service.get_image_phashes,
+    max_distance=config.PHASH_MAX_DISTANCE,
+    start_timeout=config.PHASH_START_TIMEOUT,
+)
+
+
+async def get_image_cache() -> TieredCache:
+    """
+    Get the image hash -> pdf url cache.
+    """
+    return image_cache
+
+
+async def get_image_filter() -> CacheKeyFilter:
+    """
+    Get the Bloom filter of the image hashes in the image cache.
+    """
+    return image_filter
+
+
+async def get_phash_index() -> PerceptualHashIndex:
+    """
+    Get the index of the images' perceptual hashes.
+    """
+    return phash_index
@@ -17,6 +17,11 @@ class Config(BaseSettings):
     RABBITMQ_QUEUE_OCR_TO_TRANSLATE: str
     RABBITMQ_QUEUE_TRANSLATE_TO_PDF: str
     RABBITMQ_CONNECTION: str
+    # Channels published on by concurrent requests, most messages of a
+    # request waiting for their confirms at once, seconds a confirm may take
+    RABBITMQ_CHANNEL_POOL_SIZE: int = 8
+    RABBITMQ_PUBLISH_WINDOW: int = 100
+    RABBITMQ_PUBLISH_TIMEOUT: float = 10
     model_config = SettingsConfigDict(
         case_sensitive=True,
         env_file_encoding="utf-8",
@@ -34,10 +39,79 @@ class Config(BaseSettings):
     PUSHER_KEY: str
     PUSHER_SECRET: str
     PUSHER_CLUSTER: str
+    # Notifications are sent in the background, in batches of at most
+    # PUSHER_BATCH_SIZE events (10 at most) waiting up to PUSHER_BATCH_DELAY
+    # seconds to fill up. A failed batch is retried PUSHER_MAX_RETRIES times
+    # with backoff, then kept in Redis and sent again every
+    # PUSHER_REPLAY_INTERVAL seconds
+    PUSHER_BATCH_SIZE: int = 10
+    PUSHER_BATCH_DELAY: float = 0.05
+    PUSHER_MAX_QUEUED: int = 10_000
+    PUSHER_MAX_RETRIES: int = 3
+    PUSHER_RETRY_DELAY: float = 0.5
+    PUSHER_REPLAY_INTERVAL: float = 30
 
     GCS_BUCKET_NAME: str
     SENTRY_DSN: str
 
+    # Object storage: "gcs", or "local" keeping the files under
+    # STORAGE_LOCAL_ROOT, for tests and benchmarks
+    STORAGE_BACKEND: str = "gcs"
+    STORAGE_LOCAL_ROOT: str = "storage"
+    # Storage client shared by the process: max connections open at once, in
+    # total and per host, seconds DNS lookups are cached and idle connections
+    # kept open, seconds allowed per download. Downloads are capped at
+    # UPLOAD_MAX_SIZE like uploads
+    GCS_CONNECTION_LIMIT: int = 100
+    GCS_CONNECTION_LIMIT_PER_HOST: int = 32
+    GCS_DNS_CACHE_TTL: int = 300
+    GCS_KEEPALIVE_TIMEOUT: float = 30
+    GCS_DOWNLOAD_TIMEOUT: float = 30
+
+    # Jobs: seconds a job's state and result are kept after its last update,
+    # seconds between two keep-alives of an event stream and longest it stays
+    # open, longest a long-poll request waits, most jobs of a status request
+    JOB_TTL: int = 86400
+    JOB_EVENTS_KEEPALIVE: float = 15
+    JOB_EVENTS_MAX_WAIT: float = 300
+    JOB_LONG_POLL_TIMEOUT: float = 30
+    JOB_STATUS_MAX_BATCH: int = 100
+
+    # Upload settings, UPLOAD_MAX_FILES images at most per batch upload, of
+    # which UPLOAD_MAX_CONCURRENT_DOWNLOADS are downloaded from GCS at once
+    UPLOAD_MAX_SIZE: int = 10 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    UPLOAD_MAX_FILES: int = 50
+    UPLOAD_MAX_CONCURRENT_DOWNLOADS: int = 4
+    # Request bodies are rejected before they're parsed past UPLOAD_MAX_SIZE
+    # plus UPLOAD_MULTIPART_OVERHEAD per file they may hold
+    UPLOAD_MULTIPART_OVERHEAD: int = 64 * 1024
+
+    # Process-local tier of the caches
+    CACHE_LOCAL_MAXSIZE: int = 10_000
+    CACHE_LOCAL_TTL: float = 300
+
+    # How long an image may stay in flight before it can be published again
+    INFLIGHT_LEASE_SECONDS: int = 600
+
+    # Bloom filter of the cached image hashes, new images skip the Redis
+    # and MySQL lookups when the filter knows they're not cached
+    BLOOM_FILTER_ENABLED: bool = True
+    BLOOM_INITIAL_CAPACITY: int = 100_000
+    BLOOM_ERROR_RATE: float = 0.01
+    # Startup goes on with the filter disabled if it can't subscribe to
+    # Redis in that time
+    BLOOM_START_TIMEOUT: float = 10
+
+    # Near-duplicate lookup: images whose perceptual hashes differ by at
+    # most PHASH_MAX_DISTANCE of their 64 bits share the cached PDF.
+    # Off by default: text pages have close hashes, distinct documents can
+    # be a few bits apart, so a larger radius serves another document's PDF
+    PHASH_ENABLED: bool = False
+    PHASH_MAX_DISTANCE: int = 2
+    # Startup fails if the index can't subscribe to Redis in that time
+    PHASH_START_TIMEOUT: float = 10
+
 
 environment = os.environ.get("ENVIRONMENT", "local")
 config = Config(
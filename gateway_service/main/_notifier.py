@@ -0,0 +1,33 @@
+from pusher import pusher
+
+from ._config import config
+from ._redis import redis
+from .libs.job_events import JobEventHub
+from .libs.notifier import Notifier
+
+notifier = Notifier(
+    client=pusher.Pusher(
+        app_id=config.PUSHER_APP_ID,
+        key=config.PUSHER_KEY,
+        secret=config.PUSHER_SECRET,
+        cluster=config.PUSHER_CLUSTER,
+        ssl=True,
+    ),
+    redis=redis,
+    batch_size=config.PUSHER_BATCH_SIZE,
+    batch_delay=config.PUSHER_BATCH_DELAY,
+    max_queued=config.PUSHER_MAX_QUEUED,
+    max_retries=config.PUSHER_MAX_RETRIES,
+    retry_delay=config.PUSHER_RETRY_DELAY,
+    replay_interval=config.PUSHER_REPLAY_INTERVAL,
+)
+
+# job uuid -> requests waiting for its result
+job_event_hub = JobEventHub(redis=redis)
+
+
+async def get_job_event_hub() -> JobEventHub:
+    """
+    Get the hub handing job results to the waiting requests.
+    """
+    return job_event_hub
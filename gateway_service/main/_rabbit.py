@@ -1,16 +1,25 @@
+import asyncio
 import json
 import logging
 from dataclasses import dataclass
 from aio_pika import connect_robust, Message
 from aio_pika.abc import AbstractRobustConnection, AbstractRobustChannel
+from aio_pika.pool import Pool
 
 from .enums import RabbitStatus
 
+_encoder = json.JSONEncoder(separators=(",", ":"))
+
 
 @dataclass
 class RabbitConnection:
     connection: AbstractRobustConnection | None = None
     channel: AbstractRobustChannel | None = None
+    # Channels the messages are published on, one per concurrent caller
+    channel_pool: Pool | None = None
+    # Most messages of a caller waiting for their confirms at once
+    publish_window: int = 100
+    publish_timeout: float | None = None
 
     def status(self) -> bool:
         """
@@ -23,13 +32,22 @@ class RabbitConnection:
         return True
 
     async def _clear(self) -> None:
-        if not self.channel.is_closed:
+        if self.channel_pool is not None and not self.channel_pool.is_closed:
+            await self.channel_pool.close()
+        # connect() may have failed before the channel or connection existed
+        if self.channel is not None and not self.channel.is_closed:
             await self.channel.close()
-        if not self.connection.is_closed:
+        if self.connection is not None and not self.connection.is_closed:
             await self.connection.close()
 
         self.connection = None
         self.channel = None
+        self.channel_pool = None
+
+    async def _open_channel(self) -> AbstractRobustChannel:
+        return await self.connection.channel(
+            publisher_confirms=True, on_return_raises=True
+        )
 
     async def connect(self) -> None:
         """
@@ -42,9 +60,12 @@ class RabbitConnection:
             from ._config import config
 
             self.connection = await connect_robust(config.RABBITMQ_CONNECTION)
-            self.channel = await self.connection.channel(
-                publisher_confirms=True, on_return_raises=True
+            self.channel = await self._open_channel()
+            self.channel_pool = Pool(
+                self._open_channel, max_size=config.RABBITMQ_CHANNEL_POOL_SIZE
             )
+            self.publish_window = config.RABBITMQ_PUBLISH_WINDOW
+            self.publish_timeout = config.RABBITMQ_PUBLISH_TIMEOUT
             logging.info(RabbitStatus.CONNECTED)
         except Exception as e:
             await self._clear()
@@ -60,31 +81,58 @@ class RabbitConnection:
 
     async def send_messages(
         self, messages: list | dict, routing_key: str = None
-    ) -> None:
+    ) -> list[Exception | None]:
         """
         Public message or messages to the RabbitMQ queue.
 
+        The messages are published without waiting for the previous confirms,
+        up to ``publish_window`` of them in flight at once, on a channel of
+        the pool so that concurrent callers don't share one.
+
         :param messages: list or dict with messages objects.
         :param routing_key: Routing key of RabbitMQ, not required. Tip: the same as in the consumer.
+        :return: For each message, None once the broker confirmed it or the
+            error it failed with. A failed message doesn't stop the others.
         """
         if not routing_key:
             from ._config import config
 
             routing_key = config.RABBITMQ_QUEUE_GATEWAY_TO_OCR
-        if not self.channel:
+        if not self.channel_pool:
             raise RuntimeError(RabbitStatus.NOT_CONNECTED)
 
         if isinstance(messages, dict):
             messages = [messages]
 
-        for message in messages:
-            message = Message(body=json.dumps(message).encode())
-
-            await self.channel.default_exchange.publish(
-                message,
-                routing_key=routing_key,
-                mandatory=True,
+        bodies = [_encoder.encode(message).encode() for message in messages]
+        window = asyncio.Semaphore(self.publish_window)
+
+        async with self.channel_pool.acquire() as channel:
+
+            async def publish(body: bytes) -> Exception | None:
+                async with window:
+                    try:
+                        await channel.default_exchange.publish(
+                            Message(body=body),
+                            routing_key=routing_key,
+                            mandatory=True,
+                            timeout=self.publish_timeout,
+                        )
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        return e
+                    return None
+
+            errors = await asyncio.gather(*(publish(body) for body in bodies))
+
+        failed = [error for error in errors if error is not None]
+        if failed:
+            logging.error(
+                f"RabbitMQ: {len(failed)} of {len(errors)} messages to "
+                f"{routing_key} failed, {failed[0]!r}"
             )
+        return errors
 
 
 rabbit_connection = RabbitConnection()
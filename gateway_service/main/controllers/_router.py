@@ -2,7 +2,7 @@
 
 from fastapi import APIRouter
 
-from . import items, probe, image, presigned_url
+from . import items, probe, image, job, presigned_url
 
 router = APIRouter()
 
@@ -10,3 +10,4 @@ router.include_router(probe.router, tags=["probe"])
 router.include_router(items.router, tags=["items"])
 router.include_router(image.router, tags=["image"])
 router.include_router(presigned_url.router, tags=["presigned_url"])
+router.include_router(job.router, tags=["job"])
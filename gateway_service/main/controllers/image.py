@@ -1,10 +1,15 @@
+import asyncio
+import uuid
 from pathlib import Path
 
-from fastapi import APIRouter, UploadFile, File, Depends
+from fastapi import APIRouter, UploadFile, File, Form, Depends
 
+from main import config
+from main._cache import get_image_cache, get_image_filter, get_phash_index
 from main._db import get_db_session
 from main._redis import get_redis
-from main.libs import image_lib
+from main.libs import image_lib, upload_lib
+from main.misc.exceptions import BadRequest
 from main.misc.utils import hashing
 from main._rabbit import rabbit_connection
 from main.schemas.image import ImageMetadata, ImageRequest
@@ -19,39 +24,172 @@ UPLOAD_FOLDER.mkdir(exist_ok=True)
 async def upload_image(
     file: UploadFile = File(...),
     cache_connection=Depends(get_redis),
+    image_cache=Depends(get_image_cache),
+    image_filter=Depends(get_image_filter),
+    phash_index=Depends(get_phash_index),
     session=Depends(get_db_session),
 ):
-    # TODO: Validate image type and size
-    # Store image to folder storage and return 200
-
-    # Image hash
-    image_bytes = await file.read()
-    image_hash = hashing.calculate_image_hash(file_bytes=image_bytes)
+    # Stream the image to folder storage, hashing it on the way
+    upload = await upload_lib.spool_upload(file=file, upload_folder=UPLOAD_FOLDER)
 
     # Check if the image already exists in the cache
-    pdf_url_cache = await cache_connection.get(image_hash)
+    pdf_url_cache = await image_lib.get_cached_pdf_url(
+        image_hash=upload.hash,
+        image_cache=image_cache,
+        image_filter=image_filter,
+        session=session,
+    )
+    phash = None
+    if not pdf_url_cache and config.PHASH_ENABLED:
+        # Or an image that looks the same
+        pdf_url_cache, phash = await image_lib.find_near_duplicate(
+            image=str(upload.file_path),
+            phash_index=phash_index,
+            image_cache=image_cache,
+            session=session,
+        )
+
     if pdf_url_cache:
         # If the image already exists in the cache, return the cached image
         # TODO: Handle return pdf file url
+        await upload_lib.discard(upload)
         return {"message": "Image already exists", "pdf_url": pdf_url_cache}
     else:
-        pdf_url_cache = await image_lib.handle_cache_miss(
-            session=session,
+        if phash is not None:
+            await image_lib.register_perceptual_hash(
+                image_hash=upload.hash,
+                phash=phash,
+                phash_index=phash_index,
+                session=session,
+            )
+        job_uuid = str(uuid.uuid4())
+        await image_lib.handle_cache_miss(
             image_metadata=ImageMetadata(
-                filename=file.filename, image_bytes=image_bytes, hash=image_hash
+                filename=file.filename,
+                hash=upload.hash,
+                file_url=str(upload.file_path),
+                job_uuid=job_uuid,
             ),
-            upload_folder=UPLOAD_FOLDER,
+            is_file_from_gcs=False,
             rabbit_connection=rabbit_connection,
             cache_connection=cache_connection,
         )
-        if pdf_url_cache:
-            return {"message": "Image already exists", "pdf_url": pdf_url_cache}
+        # Its result is sent on /api/jobs/{job_uuid}/events
+        return {"message": "Image is being processed", "job_uuid": job_uuid}
+
+
+@router.post("/api/upload-images")
+async def upload_images(
+    files: list[UploadFile] = File(default=[]),
+    file_urls: list[str] = Form(default=[]),
+    cache_connection=Depends(get_redis),
+    image_cache=Depends(get_image_cache),
+    image_filter=Depends(get_image_filter),
+    phash_index=Depends(get_phash_index),
+    session=Depends(get_db_session),
+):
+    """
+    Upload many images at once, as files or as URLs of images on GCS.
+    They're looked up in the cache together and the ones that aren't cached
+    are published to OCR together.
+
+    :return: For each file then each URL, its cached PDF url or the job
+        processing it
+    """
+    if not files and not file_urls:
+        raise BadRequest(error_message="No image to upload")
+    if len(files) + len(file_urls) > config.UPLOAD_MAX_FILES:
+        raise BadRequest(
+            error_message=f"At most {config.UPLOAD_MAX_FILES} images at once"
+        )
+
+    downloads = asyncio.Semaphore(config.UPLOAD_MAX_CONCURRENT_DOWNLOADS)
+
+    async def hash_file_url(file_url: str) -> tuple[str, int | None]:
+        # Only a few images are held in memory at once, until they're hashed
+        async with downloads:
+            image_bytes = await gcs_service.download_image_from_gcs_to_memory(
+                public_url=file_url
+            )
+            image_hash = await asyncio.to_thread(
+                hashing.calculate_image_hash, file_bytes=image_bytes
+            )
+            # While the bytes are at hand, so misses aren't downloaded again
+            phash = None
+            if config.PHASH_ENABLED:
+                phash = await image_lib.calculate_perceptual_hash(image_bytes)
+            return image_hash, phash
+
+    # Get the files from GCS
+    file_url_hashes = await asyncio.gather(
+        *(hash_file_url(file_url) for file_url in file_urls)
+    )
+
+    # Stream the images to folder storage, hashing them on the way
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(
+                await upload_lib.spool_upload(file=file, upload_folder=UPLOAD_FOLDER)
+            )
+
+        images = [
+            (
+                ImageMetadata(
+                    filename=file.filename,
+                    hash=upload.hash,
+                    file_url=str(upload.file_path),
+                    job_uuid=str(uuid.uuid4()),
+                ),
+                False,
+            )
+            for file, upload in zip(files, uploads)
+        ] + [
+            (
+                ImageMetadata(
+                    file_url=file_url,
+                    hash=image_hash,
+                    phash=phash,
+                    job_uuid=str(uuid.uuid4()),
+                ),
+                True,
+            )
+            for file_url, (image_hash, phash) in zip(file_urls, file_url_hashes)
+        ]
+        results = await image_lib.handle_images(
+            images=images,
+            cache_connection=cache_connection,
+            rabbit_connection=rabbit_connection,
+            image_cache=image_cache,
+            image_filter=image_filter,
+            phash_index=phash_index,
+            session=session,
+        )
+    except Exception:
+        # None of the images was published, their spooled files are not needed
+        await asyncio.gather(*(upload_lib.discard(upload) for upload in uploads))
+        raise
+
+    # The results of the jobs are sent on /api/jobs/{job_uuid}/events
+    return {
+        "results": [
+            {"filename": file.filename, **result}
+            for file, result in zip(files, results)
+        ]
+        + [
+            {"file_url": file_url, **result}
+            for file_url, result in zip(file_urls, results[len(files) :])
+        ]
+    }
 
 
 @router.post("/api/handle-image")
 async def handle_image(
     image_request: ImageRequest,
     cache_connection=Depends(get_redis),
+    image_cache=Depends(get_image_cache),
+    image_filter=Depends(get_image_filter),
+    phash_index=Depends(get_phash_index),
     session=Depends(get_db_session),
 ):
     # Get file from GCS
@@ -63,10 +201,31 @@ async def handle_image(
     image_hash = hashing.calculate_image_hash(file_bytes=image_bytes)
 
     # Check if the image already exists in the cache
-    pdf_url_cache = await cache_connection.get(image_hash)
-    if not pdf_url_cache:
-        pdf_url_cache = await image_lib.handle_cache_miss(
+    pdf_url_cache = await image_lib.get_cached_pdf_url(
+        image_hash=image_hash,
+        image_cache=image_cache,
+        image_filter=image_filter,
+        session=session,
+    )
+    phash = None
+    if not pdf_url_cache and config.PHASH_ENABLED:
+        # Or an image that looks the same
+        pdf_url_cache, phash = await image_lib.find_near_duplicate(
+            image=image_bytes,
+            phash_index=phash_index,
+            image_cache=image_cache,
             session=session,
+        )
+
+    if not pdf_url_cache:
+        if phash is not None:
+            await image_lib.register_perceptual_hash(
+                image_hash=image_hash,
+                phash=phash,
+                phash_index=phash_index,
+                session=session,
+            )
+        await image_lib.handle_cache_miss(
             image_metadata=ImageMetadata(
                 file_url=image_request.file_url,
                 image_bytes=image_bytes,
@@ -78,6 +237,9 @@ async def handle_image(
         )
     if pdf_url_cache:
         await image_lib.send_pusher_message(
-            job_uuid=image_request.job_uuid, pdf_url_cache=pdf_url_cache
+            job_uuid=image_request.job_uuid,
+            pdf_url_cache=pdf_url_cache,
+            cache_connection=cache_connection,
         )
         return {"message": "Image already exists", "pdf_url": pdf_url_cache}
+    return {"message": "Image is being processed", "job_uuid": image_request.job_uuid}
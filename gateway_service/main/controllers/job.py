@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from main import config
+from main._notifier import get_job_event_hub
+from main._redis import get_redis
+from main.libs.job_events import JobEventHub
+from main.misc.exceptions import BadRequest, NotFound
+from main.schemas.job import JobStatusRequest, JobStatusSchema
+from main.services import job_service
+
+router: APIRouter = APIRouter()
+
+
+@router.get("/api/jobs/{job_uuid}")
+async def get_job_status(job_uuid: str, cache_connection=Depends(get_redis)):
+    """
+    State of a job, with the times each of its stages was enqueued,
+    started, finished or failed at.
+    """
+    [fields] = await job_service.get_jobs(cache_connection, [job_uuid])
+    if not fields:
+        raise NotFound(error_message=f"Job {job_uuid} not found")
+    return JobStatusSchema.from_fields(job_uuid, fields)
+
+
+@router.post("/api/jobs/status")
+async def get_jobs_status(
+    status_request: JobStatusRequest, cache_connection=Depends(get_redis)
+):
+    """
+    State of many jobs, read with a single round-trip to Redis.
+    """
+    job_uuids = status_request.job_uuids
+    if len(job_uuids) > config.JOB_STATUS_MAX_BATCH:
+        raise BadRequest(
+            error_message=f"At most {config.JOB_STATUS_MAX_BATCH} jobs at once"
+        )
+
+    jobs = await job_service.get_jobs(cache_connection, job_uuids)
+    return {
+        "jobs": [
+            JobStatusSchema.from_fields(job_uuid, fields)
+            for job_uuid, fields in zip(job_uuids, jobs)
+        ]
+    }
+
+
+def _format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/api/jobs/{job_uuid}/events")
+async def stream_job_events(
+    job_uuid: str, job_event_hub: JobEventHub = Depends(get_job_event_hub)
+):
+    """
+    Server-sent events stream sending a "completed" event with the job's
+    PDF URL once it finishes, or a "timeout" event if it takes too long.
+    """
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.JOB_EVENTS_MAX_WAIT
+        async with job_event_hub.subscribe(job_uuid) as result:
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    pdf_url = await asyncio.wait_for(
+                        asyncio.shield(result),
+                        timeout=min(config.JOB_EVENTS_KEEPALIVE, remaining),
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield _format_event(
+                    "completed", {"job_uuid": job_uuid, "pdf_url": pdf_url}
+                )
+                return
+
+        yield _format_event("timeout", {"job_uuid": job_uuid})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/jobs/{job_uuid}/result")
+async def wait_job_result(
+    job_uuid: str,
+    timeout: float = Query(default=30, ge=0),
+    job_event_hub: JobEventHub = Depends(get_job_event_hub),
+):
+    """
+    Long-poll for the result of a job, answered as soon as the job finishes
+    or after ``timeout`` seconds with a "pending" status.
+    """
+    pdf_url = await job_event_hub.wait(
+        job_uuid, timeout=min(timeout, config.JOB_LONG_POLL_TIMEOUT)
+    )
+    if pdf_url is None:
+        return {"job_uuid": job_uuid, "status": "pending"}
+    return {"job_uuid": job_uuid, "status": "completed", "pdf_url": pdf_url}
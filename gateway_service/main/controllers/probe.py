@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 
+from main._cache import image_cache, image_filter, phash_index
 from main._rabbit import rabbit_connection
 
 router = APIRouter()
@@ -8,7 +9,9 @@ router = APIRouter()
 @router.get("/pings")
 async def ping():
     message = {"type": "test_message", "message": "Test message text"}
-    await rabbit_connection.send_messages(messages=message)
+    [error] = await rabbit_connection.send_messages(messages=message)
+    if error is not None:
+        raise error
     return {}
 
 
@@ -17,6 +20,15 @@ async def is_ready():
     return {}
 
 
+@router.get("/cache/stats")
+async def cache_stats():
+    return {
+        image_cache.name: image_cache.get_stats(),
+        f"{image_filter.name}_filter": image_filter.get_stats(),
+        phash_index.name: {"size": len(phash_index)},
+    }
+
+
 @router.get("/sentry-debug")
 async def trigger_error():
     division_by_zero = 1 / 0
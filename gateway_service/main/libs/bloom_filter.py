@@ -0,0 +1,290 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+from typing import AsyncIterator, Callable
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main.libs.tiered_cache import INVALIDATION_CHANNEL
+
+Loader = Callable[[AsyncSession], AsyncIterator[str]]
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter: answers "maybe present" or "definitely absent".
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        :param capacity: Number of keys the filter is sized for
+        :param error_rate: False positive rate once ``capacity`` keys are added
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str) -> list[int]:
+        # Double hashing, k positions out of a single digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def estimated_error_rate(self) -> float:
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** (
+            self.num_hashes
+        )
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows with the number of keys, by adding filters
+    of increasing capacity and decreasing error rate as the previous ones
+    fill up, so the overall error rate stays under ``error_rate``.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, initial_capacity: int, error_rate: float):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self._filters: list[BloomFilter] = []
+
+    def add(self, key: str) -> None:
+        if key in self:
+            return
+
+        if not self._filters or self._filters[-1].is_full:
+            n = len(self._filters)
+            self._filters.append(
+                BloomFilter(
+                    capacity=self.initial_capacity * self.GROWTH**n,
+                    error_rate=self.error_rate
+                    * (1 - self.TIGHTENING)
+                    * self.TIGHTENING**n,
+                )
+            )
+        self._filters[-1].add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in bloom for bloom in self._filters)
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self._filters)
+
+    def estimated_error_rate(self) -> float:
+        rate = 1.0
+        for bloom in self._filters:
+            rate *= 1 - bloom.estimated_error_rate()
+        return 1 - rate
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(len(bloom._bits) for bloom in self._filters)
+
+
+class CacheKeyFilter:
+    """
+    Per-replica Bloom filter of the keys of a TieredCache, letting callers
+    skip the Redis and MySQL lookups of keys that are definitely not cached.
+
+    Built from MySQL at startup, then fed the keys the workers write
+    through the cache's invalidation channel. Until it's loaded, and while
+    it's reloaded after losing that channel, every key is "maybe present".
+    That includes a startup without Redis: the filter is then loaded once
+    the channel is subscribed to.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis: Redis,
+        session_factory: Callable[[], AsyncSession],
+        loader: Loader,
+        initial_capacity: int = 100_000,
+        error_rate: float = 0.01,
+        start_timeout: float = 10,
+    ):
+        """
+        :param name: Name of the cache the filter is for
+        :param redis: Redis connection
+        :param session_factory: Creates the session used to load the keys
+        :param loader: Yields every key of the cache from MySQL
+        :param initial_capacity: Number of keys the first filter is sized for
+        :param error_rate: Target false positive rate
+        :param start_timeout: Seconds startup waits to subscribe to the
+            channel before going on with the filter disabled
+        """
+        self.name = name
+        self.redis = redis
+        self.session_factory = session_factory
+        self.loader = loader
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.start_timeout = start_timeout
+
+        self._bloom: ScalableBloomFilter | None = None
+        # Keys received while (re)loading the filter
+        self._loading_keys: list[str] | None = None
+        self._load_lock = asyncio.Lock()
+        self._channel = INVALIDATION_CHANNEL.format(name=name)
+        self._listener: asyncio.Task | None = None
+        self._reload: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+        # Startup gave up on the channel, the listener loads the filter
+        self._load_on_subscribe = False
+
+        self.stats = {
+            "definitely_absent": 0,
+            "maybe_present": 0,
+            "true_positives": 0,
+            "false_positives": 0,
+            "reloads": 0,
+        }
+
+    @property
+    def is_ready(self) -> bool:
+        return self._bloom is not None
+
+    def might_contain(self, key: str) -> bool:
+        """
+        :return: False if the key is definitely not in the cache
+        """
+        if self._bloom is None or key in self._bloom:
+            self.stats["maybe_present"] += 1
+            return True
+
+        self.stats["definitely_absent"] += 1
+        return False
+
+    def record_lookup(self, found: bool) -> None:
+        """
+        Record the outcome of looking up a key the filter let through, to
+        measure its false positive rate.
+        """
+        if self._bloom is None:
+            return
+        self.stats["true_positives" if found else "false_positives"] += 1
+
+    def add(self, key: str) -> None:
+        if self._bloom is not None:
+            self._bloom.add(key)
+        elif self._loading_keys is not None:
+            self._loading_keys.append(key)
+
+    async def start(self) -> None:
+        """
+        Start listening for the keys written by the workers, then load the
+        filter from MySQL.
+        """
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+            try:
+                await asyncio.wait_for(
+                    self._subscribed.wait(), timeout=self.start_timeout
+                )
+            except asyncio.TimeoutError:
+                self._load_on_subscribe = True
+                logging.warning(
+                    f"Filter {self.name}: Couldn't subscribe to {self._channel}"
+                    f" in {self.start_timeout}s, disabled until it does"
+                )
+                return
+            await self._load()
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._reload is not None:
+            self._reload.cancel()
+            self._reload = None
+
+    async def _load(self) -> None:
+        async with self._load_lock:
+            self._bloom = None
+            self._loading_keys = []
+            bloom = ScalableBloomFilter(
+                initial_capacity=self.initial_capacity, error_rate=self.error_rate
+            )
+            try:
+                async with self.session_factory() as session:
+                    async for key in self.loader(session):
+                        bloom.add(key)
+                for key in self._loading_keys:
+                    bloom.add(key)
+            finally:
+                self._loading_keys = None
+
+            self._bloom = bloom
+            logging.info(f"Filter {self.name}: Loaded {len(bloom)} keys")
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self._channel)
+                    if self._subscribed.is_set() or self._load_on_subscribe:
+                        # Keys may have been missed while disconnected
+                        self.stats["reloads"] += 1
+                        self._reload = asyncio.create_task(self._load())
+                        self._load_on_subscribe = False
+                    self._subscribed.set()
+
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        # Deleted keys are added too, a harmless false positive
+                        for key in json.loads(message["data"])["keys"]:
+                            self.add(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Filter {self.name}: listener failed {e}")
+                self._bloom = None
+                await asyncio.sleep(1)
+
+    def get_stats(self) -> dict:
+        checked = self.stats["definitely_absent"] + self.stats["maybe_present"]
+        negatives = self.stats["definitely_absent"] + self.stats["false_positives"]
+        return {
+            **self.stats,
+            "ready": self.is_ready,
+            "size": len(self._bloom) if self._bloom else 0,
+            "size_bytes": self._bloom.size_bytes if self._bloom else 0,
+            "estimated_false_positive_rate": (
+                self._bloom.estimated_error_rate() if self._bloom else None
+            ),
+            # Share of the keys not in the cache that the filter let through
+            "observed_false_positive_rate": (
+                self.stats["false_positives"] / negatives if negatives else None
+            ),
+            "skipped_lookup_rate": (
+                self.stats["definitely_absent"] / checked if checked else None
+            ),
+        }
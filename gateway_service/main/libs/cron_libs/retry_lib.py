@@ -22,20 +22,20 @@ async def retry_failed_jobs():
 
         from main import config
 
-        if step_one_failed_ids:
-            await rabbit_connection.send_messages(
-                messages={"job_ids": step_one_failed_ids},
-                routing_key=config.RABBITMQ_QUEUE_GATEWAY_TO_OCR,
+        failed = []
+        for job_ids, routing_key in (
+            (step_one_failed_ids, config.RABBITMQ_QUEUE_GATEWAY_TO_OCR),
+            (step_two_failed_ids, config.RABBITMQ_QUEUE_OCR_TO_TRANSLATE),
+            (step_three_failed_ids, config.RABBITMQ_QUEUE_TRANSLATE_TO_PDF),
+        ):
+            if not job_ids:
+                continue
+            [error] = await rabbit_connection.send_messages(
+                messages={"job_ids": job_ids}, routing_key=routing_key
             )
+            if error is not None:
+                failed.append(f"{routing_key}: {error!r}")
 
-        if step_two_failed_ids:
-            await rabbit_connection.send_messages(
-                messages={"job_ids": step_two_failed_ids},
-                routing_key=config.RABBITMQ_QUEUE_OCR_TO_TRANSLATE,
-            )
-
-        if step_three_failed_ids:
-            await rabbit_connection.send_messages(
-                messages={"job_ids": step_three_failed_ids},
-                routing_key=config.RABBITMQ_QUEUE_TRANSLATE_TO_PDF,
-            )
+        # The scheduler reports the failure, the jobs are retried next run
+        if failed:
+            raise RuntimeError(f"Retry jobs could not be published, {failed}")
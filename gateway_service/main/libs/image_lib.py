@@ -1,151 +1,352 @@
+import asyncio
+import logging
 import uuid
+from pathlib import Path
 
-from pusher import pusher
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from main import config
+from main._notifier import notifier
 from main.enums import RabbitMessageType
+from main.libs.bloom_filter import CacheKeyFilter
+from main.libs.phash_index import PerceptualHashIndex
+from main.libs.tiered_cache import TieredCache
 from main.misc.exceptions import InternalServerError
+from main.misc.utils import hashing
 from main.schemas.image import ImageMetadata
 from main.schemas.message import MessageSchema
-from main.services import image_service
+from main.services import gcs_service, image_service, inflight_service, job_service
+from main.services.job_service import JobEvent, JobStage
 
-from main.services.gcs_service import GCSService
+from main.services.gcs_service import get_gcs_service
 from datetime import datetime, timezone
 
-
-import os
-from pathlib import Path
+# Most near-duplicates fetched from the image cache for a single lookup
+MAX_NEAR_DUPLICATES = 16
 
 
-async def publish_rabbitmq_message(
-    file_url: str,
-    image_metadata: ImageMetadata,
-    rabbit_connection,
-    file_name: str | None = None,
-):
-    """
-    Publish a message to RabbitMQ.
-    """
-    message = MessageSchema(
+def _build_message(image_metadata: ImageMetadata, is_file_from_gcs: bool) -> dict:
+    return MessageSchema(
         type=RabbitMessageType.FILE_UPLOADED,
-        file_url=file_url,
+        file_url=image_metadata.file_url,
         image_hash=image_metadata.hash,
-        is_file_from_gcs=True if file_name is None else False,
+        is_file_from_gcs=is_file_from_gcs,
         job_uuid=image_metadata.job_uuid,
-    )
-    await rabbit_connection.send_messages(messages=message.model_dump())
-    return {"success": True, "filename": file_name, "file_url": file_url}
+    ).model_dump()
 
 
-async def _handle_proceed_from_local_storage(
-    image_metadata: ImageMetadata, upload_folder: Path, rabbit_connection
-) -> None:
-    try:
-        filename = uuid.uuid4().hex + "." + image_metadata.filename.split(".")[-1]
+async def _discard_spooled_file(image_metadata: ImageMetadata) -> None:
+    await asyncio.to_thread(Path(image_metadata.file_url).unlink, missing_ok=True)
 
-        # Save the uploaded file to the storage directory
-        file_path = os.path.join(upload_folder, filename)
-        with open(file_path, "wb") as f:
-            f.write(image_metadata.image_bytes)
 
-        await publish_rabbitmq_message(
-            file_url=file_path,
-            file_name=image_metadata.filename,
-            image_metadata=image_metadata,
-            rabbit_connection=rabbit_connection,
-        )
+async def get_cached_pdf_url(
+    image_hash: str,
+    image_cache: TieredCache,
+    image_filter: CacheKeyFilter,
+    session: AsyncSession,
+) -> str | None:
+    """
+    Look an image up in the cache, without going to Redis or MySQL when
+    the filter knows the image is not cached.
+    """
+    if not image_filter.might_contain(image_hash):
         return None
 
+    pdf_url = await image_cache.get(image_hash, session=session)
+    image_filter.record_lookup(found=pdf_url is not None)
+    return pdf_url
+
+
+async def calculate_perceptual_hash(image: bytes | str) -> int | None:
+    """
+    :param image: Image bytes or path
+    :return: Perceptual hash of the image, None if it couldn't be decoded
+    """
+    try:
+        return await asyncio.to_thread(hashing.calculate_perceptual_hash, image)
     except Exception as e:
-        raise InternalServerError(error_message=str(e))
+        logging.warning(f"Can't compute the perceptual hash of the image: {e}")
+        return None
 
 
-async def _handle_proceed_from_gcs(
-    image_metadata: ImageMetadata, rabbit_connection
+async def find_near_duplicate(
+    image: bytes | str | None,
+    phash_index: PerceptualHashIndex,
+    image_cache: TieredCache,
+    session: AsyncSession,
+    phash: int | None = None,
+) -> tuple[str | None, int | None]:
+    """
+    Look for an already processed image that looks like this one, e.g. the
+    same page re-photographed, resized or saved with another quality.
+
+    :param image: Image bytes or path, not needed if its phash is given
+    :param phash: Perceptual hash of the image if it's already computed
+    :return: PDF url of the closest processed image if any, and the
+        perceptual hash of the image, None if it couldn't be decoded
+    """
+    if phash is None:
+        phash = await calculate_perceptual_hash(image)
+        if phash is None:
+            return None, None
+
+    candidates = phash_index.search(phash, max_distance=config.PHASH_MAX_DISTANCE)
+    candidates = candidates[:MAX_NEAR_DUPLICATES]
+    if candidates:
+        # Only images whose job is done have a PDF
+        pdf_urls = await image_cache.get_many(candidates, session=session)
+        for hash_id in candidates:
+            if hash_id in pdf_urls:
+                return pdf_urls[hash_id], phash
+
+    return None, phash
+
+
+async def register_perceptual_hash(
+    image_hash: str,
+    phash: int,
+    phash_index: PerceptualHashIndex,
+    session: AsyncSession,
 ) -> None:
-    try:
-        await publish_rabbitmq_message(
-            file_url=image_metadata.file_url,
-            image_metadata=image_metadata,
-            rabbit_connection=rabbit_connection,
+    """
+    Make an image sent to OCR findable by its perceptual hash.
+    """
+    await image_service.save_image_phash(
+        session=session, hash_id=image_hash, phash=phash
+    )
+    await phash_index.add(hash_id=image_hash, phash=phash)
+
+
+async def get_cached_pdf_urls(
+    image_hashes: list[str],
+    image_cache: TieredCache,
+    image_filter: CacheKeyFilter,
+    session: AsyncSession,
+) -> dict[str, str]:
+    """
+    Look many images up in the cache at once, with one Redis and one MySQL
+    round-trip at most for the images the filter lets through.
+
+    :return: PDF url of the images found
+    """
+    image_hashes = [
+        image_hash
+        for image_hash in dict.fromkeys(image_hashes)
+        if image_filter.might_contain(image_hash)
+    ]
+    if not image_hashes:
+        return {}
+
+    pdf_urls = await image_cache.get_many(image_hashes, session=session)
+    for image_hash in image_hashes:
+        image_filter.record_lookup(found=image_hash in pdf_urls)
+    return pdf_urls
+
+
+async def handle_cache_misses(
+    images: list[tuple[ImageMetadata, bool]],
+    cache_connection: Redis,
+    rabbit_connection,
+) -> dict[str, str]:
+    """
+    Send images that are in none of the cache tiers to OCR, publishing them
+    all at once.
+
+    :param images: Metadata of each image, and whether its file is on GCS
+        rather than spooled to the storage directory
+    :return: Why each image that couldn't be published failed, by hash
+    """
+    # Requests attached to a job in flight stay queued until it finishes
+    await asyncio.gather(
+        *(
+            job_service.record(
+                redis=cache_connection,
+                job_uuid=image_metadata.job_uuid,
+                stage=JobStage.OCR,
+                event=JobEvent.ENQUEUED,
+                ttl=config.JOB_TTL,
+            )
+            for image_metadata, _ in images
         )
-        return None
+    )
+    # Only the first request for an image publishes it, the others wait
+    # for that job to finish and get notified with its result
+    owners = await asyncio.gather(
+        *(
+            inflight_service.acquire(
+                redis=cache_connection,
+                image_hash=image_metadata.hash,
+                job_uuid=image_metadata.job_uuid,
+                lease_seconds=config.INFLIGHT_LEASE_SECONDS,
+            )
+            for image_metadata, _ in images
+        )
+    )
 
+    to_publish = []
+    for (image_metadata, is_file_from_gcs), is_owner in zip(images, owners):
+        if is_owner:
+            to_publish.append((image_metadata, is_file_from_gcs))
+        elif not is_file_from_gcs:
+            # The spooled copy of the image won't be processed
+            await _discard_spooled_file(image_metadata)
+    if not to_publish:
+        return {}
+
+    try:
+        errors = await rabbit_connection.send_messages(
+            messages=[
+                _build_message(image_metadata, is_file_from_gcs)
+                for image_metadata, is_file_from_gcs in to_publish
+            ]
+        )
     except Exception as e:
-        raise InternalServerError(error_message=str(e))
+        errors = [e] * len(to_publish)
 
+    failed = {}
+    for (image_metadata, is_file_from_gcs), error in zip(to_publish, errors):
+        if error is None:
+            continue
 
-async def _proceed_to_next_step(
-    image_metadata: ImageMetadata,
-    rabbit_connection,
-    is_file_from_gcs: bool = False,
-    upload_folder: Path | None = None,
-) -> None:
-    if not is_file_from_gcs:
-        await _handle_proceed_from_local_storage(
-            image_metadata=image_metadata,
-            upload_folder=upload_folder,
-            rabbit_connection=rabbit_connection,
+        failed[image_metadata.hash] = str(error) or repr(error)
+        # The next request for the image publishes it again
+        await inflight_service.abandon(
+            redis=cache_connection, image_hash=image_metadata.hash
         )
-    else:
-        await _handle_proceed_from_gcs(
-            image_metadata=image_metadata, rabbit_connection=rabbit_connection
+        await job_service.record(
+            redis=cache_connection,
+            job_uuid=image_metadata.job_uuid,
+            stage=JobStage.OCR,
+            event=JobEvent.FAILED,
+            error=failed[image_metadata.hash],
+            ttl=config.JOB_TTL,
         )
+        if not is_file_from_gcs:
+            await _discard_spooled_file(image_metadata)
+    return failed
 
 
 async def handle_cache_miss(
-    session: AsyncSession,
     image_metadata: ImageMetadata,
     cache_connection: Redis,
     rabbit_connection,
-    upload_folder: Path | None = None,
-) -> str | None:
-    # Get from database
-    cached_image = await image_service.get_cached_image(
-        session=session, input_hash=image_metadata.hash
+    is_file_from_gcs: bool = True,
+) -> None:
+    """
+    Send an image that's in none of the cache tiers to OCR.
+
+    :raises InternalServerError: if the image couldn't be published
+    """
+    failed = await handle_cache_misses(
+        images=[(image_metadata, is_file_from_gcs)],
+        cache_connection=cache_connection,
+        rabbit_connection=rabbit_connection,
     )
-    if cached_image:
-        await cache_connection.set(image_metadata.hash, cached_image.pdf_url)
-        return cached_image.pdf_url
-    else:
-        # Proceed to the next step
-        await _proceed_to_next_step(
-            image_metadata=image_metadata,
-            is_file_from_gcs=True if not upload_folder else False,
-            rabbit_connection=rabbit_connection,
-        )
-        return None
+    if failed:
+        raise InternalServerError(error_message=failed[image_metadata.hash])
 
 
-async def check_cache_from_db(
-    session: AsyncSession,
-    image_metadata: ImageMetadata,
+async def handle_images(
+    images: list[tuple[ImageMetadata, bool]],
     cache_connection: Redis,
-) -> str | None:
-    # Get from database
-    cached_image = await image_service.get_cached_image(
-        session=session, input_hash=image_metadata.hash
-    )
-    if cached_image:
-        await cache_connection.set(image_metadata.hash, cached_image.pdf_url)
-        return cached_image.pdf_url
-    return None
-
-
-async def send_pusher_message(job_uuid: str, pdf_url_cache: str) -> None:
-    pusher_client = pusher.Pusher(
-        app_id=config.PUSHER_APP_ID,
-        key=config.PUSHER_KEY,
-        secret=config.PUSHER_SECRET,
-        cluster=config.PUSHER_CLUSTER,
-        ssl=True,
+    rabbit_connection,
+    image_cache: TieredCache,
+    image_filter: CacheKeyFilter,
+    phash_index: PerceptualHashIndex,
+    session: AsyncSession,
+) -> list[dict]:
+    """
+    Look many images up in the cache at once and send the ones that aren't
+    cached to OCR together. The same image sent twice gets a single job.
+
+    :param images: Metadata of each image with the job it's given if it's
+        not cached, and whether its file is on GCS rather than spooled. The
+        images on GCS are only looked up by perceptual hash if their phash
+        or bytes are given, they're not downloaded again
+    :return: For each image in order, its cached "pdf_url" or the
+        "job_uuid" processing it, with an "error" if it couldn't be published
+    """
+    pdf_urls = await get_cached_pdf_urls(
+        image_hashes=[image_metadata.hash for image_metadata, _ in images],
+        image_cache=image_cache,
+        image_filter=image_filter,
+        session=session,
     )
+    misses = {}
+    for image_metadata, is_file_from_gcs in images:
+        if image_metadata.hash not in pdf_urls:
+            misses.setdefault(image_metadata.hash, (image_metadata, is_file_from_gcs))
 
-    message = {"file_url": pdf_url_cache}
-    EVENT_NAME = "message"
-    pusher_client.trigger(job_uuid, EVENT_NAME, message)
+    if config.PHASH_ENABLED:
+        # Or images that look the same, one at a time as they share the session
+        for image_metadata, is_file_from_gcs in list(misses.values()):
+            if is_file_from_gcs:
+                image = image_metadata.image_bytes
+            else:
+                image = image_metadata.file_url
+            if image is None and image_metadata.phash is None:
+                # Its phash couldn't be computed when it was downloaded
+                continue
+
+            pdf_url, phash = await find_near_duplicate(
+                image=image,
+                phash=image_metadata.phash,
+                phash_index=phash_index,
+                image_cache=image_cache,
+                session=session,
+            )
+            if pdf_url:
+                pdf_urls[image_metadata.hash] = pdf_url
+                del misses[image_metadata.hash]
+            elif phash is not None:
+                await register_perceptual_hash(
+                    image_hash=image_metadata.hash,
+                    phash=phash,
+                    phash_index=phash_index,
+                    session=session,
+                )
+
+    failed = {}
+    if misses:
+        failed = await handle_cache_misses(
+            images=list(misses.values()),
+            cache_connection=cache_connection,
+            rabbit_connection=rabbit_connection,
+        )
+
+    results = []
+    for image_metadata, is_file_from_gcs in images:
+        if image_metadata.hash in pdf_urls:
+            results.append({"pdf_url": pdf_urls[image_metadata.hash]})
+        else:
+            job_metadata, _ = misses[image_metadata.hash]
+            result = {"job_uuid": job_metadata.job_uuid}
+            if image_metadata.hash in failed:
+                result["error"] = failed[image_metadata.hash]
+            results.append(result)
+            if job_metadata is image_metadata:
+                continue
+        if not is_file_from_gcs:
+            await _discard_spooled_file(image_metadata)
+    return results
+
+
+async def send_pusher_message(
+    job_uuid: str, pdf_url_cache: str, cache_connection: Redis
+) -> None:
+    """
+    Send the result of a job to its client, through Pusher and through the
+    job events.
+    """
+    # Sent in the background, see Notifier
+    notifier.notify(channel=job_uuid, event="message", data={"file_url": pdf_url_cache})
+    await job_service.publish_result(
+        redis=cache_connection,
+        job_uuid=job_uuid,
+        pdf_url=pdf_url_cache,
+        ttl=config.JOB_TTL,
+    )
 
 
 async def generate_presigned_url(file_name: str) -> tuple[str, str]:
@@ -157,7 +358,7 @@ async def generate_presigned_url(file_name: str) -> tuple[str, str]:
         gmt_time = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
 
         # Upload to GCS
-        gcs_service = GCSService()
+        gcs_service = get_gcs_service()
         file_url = await gcs_service.get_presigned_url(
             destination_blob_name=f"images/{gmt_time}_{filename}",
             content_type=content_type,
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from redis.asyncio import Redis
+
+from main.services import job_service
+
+
+class JobEventHub:
+    """
+    Hands the results of finished jobs to the requests of this replica
+    waiting on them.
+
+    The replica subscribes once to the job events channel, however many
+    clients are waiting, and resolves their futures as events come in.
+    Results published before a client started waiting are read from Redis.
+    """
+
+    def __init__(self, redis: Redis, channel: str = job_service.JOB_EVENTS_CHANNEL):
+        self.redis = redis
+        self.channel = channel
+        self._waiters: dict[str, set[asyncio.Future]] = {}
+        self._listener: asyncio.Task | None = None
+
+        self.stats = {"events": 0, "delivered": 0}
+
+    @asynccontextmanager
+    async def subscribe(self, job_uuid: str) -> AsyncIterator[asyncio.Future]:
+        """
+        Wait for a job inside the context.
+
+        :return: Future resolved with the URL of the job's PDF
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_uuid, set()).add(future)
+        try:
+            # The job may have finished before we started waiting
+            pdf_url = await job_service.get_result(self.redis, job_uuid)
+            if pdf_url is not None and not future.done():
+                future.set_result(pdf_url)
+            yield future
+        finally:
+            waiters = self._waiters.get(job_uuid, set())
+            waiters.discard(future)
+            if not waiters:
+                self._waiters.pop(job_uuid, None)
+
+    async def wait(self, job_uuid: str, timeout: float) -> str | None:
+        """
+        :return: URL of the job's PDF, None if it didn't finish in time
+        """
+        async with self.subscribe(job_uuid) as result:
+            try:
+                return await asyncio.wait_for(result, timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+
+    def _resolve(self, job_uuid: str, pdf_url: str) -> None:
+        for future in self._waiters.get(job_uuid, ()):
+            if not future.done():
+                future.set_result(pdf_url)
+                self.stats["delivered"] += 1
+
+    async def _resolve_finished(self) -> None:
+        # Events may have been missed while we weren't subscribed
+        job_uuids = list(self._waiters)
+        if job_uuids:
+            results = await job_service.get_results(self.redis, job_uuids)
+            for job_uuid, pdf_url in zip(job_uuids, results):
+                if pdf_url is not None:
+                    self._resolve(job_uuid, pdf_url)
+
+    async def start(self) -> None:
+        """
+        Start listening for the job events.
+        """
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    await self._resolve_finished()
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+
+                        self.stats["events"] += 1
+                        event = json.loads(message["data"])
+                        self._resolve(event["job_uuid"], event["pdf_url"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Job events: listener failed {e}")
+                await asyncio.sleep(1)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "waiting": len(self._waiters)}
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from main.misc.utils.hashing import hamming_distance
+
+Loader = Callable[[AsyncSession], Awaitable[dict[str, int]]]
+
+ADDITION_CHANNEL = "phash-index:{name}"
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing of 64-bit hashes for Hamming-radius queries.
+
+    Hashes are split into ``max_distance + 1`` chunks, each indexed in its
+    own table. Two hashes at most ``max_distance`` bits apart differ in at
+    most ``max_distance`` chunks, so they share at least one chunk exactly:
+    a search only has to compare the hashes found in the query's buckets.
+    """
+
+    def __init__(self, max_distance: int, bits: int = 64):
+        self.max_distance = max_distance
+
+        # (shift, mask) of every chunk, widths differing by one bit at most
+        chunks = max_distance + 1
+        self._chunks = []
+        shift = 0
+        for i in range(chunks):
+            width = bits // chunks + (1 if i < bits % chunks else 0)
+            self._chunks.append((shift, (1 << width) - 1))
+            shift += width
+
+        self._tables: list[dict[int, list[tuple[int, str]]]] = [
+            {} for _ in self._chunks
+        ]
+        self._size = 0
+
+    def add(self, phash: int, hash_id: str) -> None:
+        entry = (phash, hash_id)
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((phash >> shift) & mask, []).append(entry)
+        self._size += 1
+
+    def search(self, phash: int, radius: int) -> list[tuple[int, str]]:
+        """
+        Find the hashes within ``radius`` bits of the given one.
+
+        :return: (distance, image hash) pairs, closest first
+        """
+        if radius > self.max_distance:
+            raise ValueError(f"Radius is larger than {self.max_distance}")
+
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            candidates.update(table.get((phash >> shift) & mask, ()))
+
+        found = []
+        for candidate, hash_id in candidates:
+            distance = hamming_distance(phash, candidate)
+            if distance <= radius:
+                found.append((distance, hash_id))
+
+        found.sort()
+        return found
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class PerceptualHashIndex:
+    """
+    In-memory index of the perceptual hashes of every image sent to OCR,
+    answering "which images look like this one" without touching MySQL.
+
+    The index is loaded from MySQL at startup, then kept in sync with the
+    other replicas over Redis pub/sub.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis: Redis,
+        loader: Loader,
+        max_distance: int,
+        start_timeout: float = 10,
+    ):
+        """
+        :param name: Name of the index, used for the pub/sub channel
+        :param redis: Redis connection
+        :param loader: Loads every image hash -> perceptual hash from MySQL
+        :param max_distance: Largest distance searches may be made with
+        :param start_timeout: Seconds allowed to subscribe to the channel at startup
+        """
+        self.name = name
+        self.redis = redis
+        self.loader = loader
+        self.start_timeout = start_timeout
+
+        self._index = MultiIndexHash(max_distance=max_distance)
+        self._known: set[str] = set()
+        self._channel = ADDITION_CHANNEL.format(name=name)
+        self._instance_id = uuid.uuid4().hex
+        self._listener: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+
+    def search(self, phash: int, max_distance: int) -> list[str]:
+        """
+        :return: Hashes of the images within ``max_distance`` bits, closest first
+        """
+        return [hash_id for _, hash_id in self._index.search(phash, max_distance)]
+
+    async def add(self, hash_id: str, phash: int) -> None:
+        """
+        Add an image to the index of every replica.
+        """
+        self._add_local(hash_id, phash)
+        message = json.dumps(
+            {"sender": self._instance_id, "hash_id": hash_id, "phash": phash}
+        )
+        await self.redis.publish(self._channel, message)
+
+    def _add_local(self, hash_id: str, phash: int) -> None:
+        if hash_id not in self._known:
+            self._known.add(hash_id)
+            self._index.add(phash, hash_id)
+
+    async def start(self, session: AsyncSession) -> None:
+        """
+        Load the index and start listening for images added by the other
+        replicas.
+
+        :raises TimeoutError: if Redis couldn't be subscribed to in time
+        """
+        if self._listener is not None:
+            return
+
+        # Subscribe first so nothing added while loading is missed
+        self._listener = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout=self.start_timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise TimeoutError(
+                f"Index {self.name}: Couldn't subscribe to {self._channel}"
+                f" in {self.start_timeout}s"
+            )
+        for hash_id, phash in (await self.loader(session)).items():
+            self._add_local(hash_id, phash)
+        logging.info(f"Index {self.name}: Loaded {len(self._index)} images")
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self._channel)
+                    self._subscribed.set()
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+
+                        data = json.loads(message["data"])
+                        if data["sender"] != self._instance_id:
+                            self._add_local(data["hash_id"], data["phash"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Index {self.name}: listener failed {e}")
+                await asyncio.sleep(1)
+
+    def __len__(self) -> int:
+        return len(self._index)
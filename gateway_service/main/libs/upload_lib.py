@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import UploadFile
+
+from main import config
+from main.misc.exceptions import PayloadTooLarge, UnsupportedMediaType
+
+_IMAGE_SIGNATURES = {
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
+    b"GIF87a": "image/gif",
+    b"GIF89a": "image/gif",
+    b"BM": "image/bmp",
+    b"II*\x00": "image/tiff",
+    b"MM\x00*": "image/tiff",
+}
+
+
+@dataclass
+class SpooledUpload:
+    hash: str
+    size: int
+    content_type: str
+    file_path: Path | None = None
+
+
+def sniff_image_type(header: bytes) -> str | None:
+    """
+    Detect the image type from the first bytes of a file.
+
+    :return: MIME type of the image, None if it's not a supported image
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+
+    for signature, content_type in _IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+async def discard(upload: SpooledUpload) -> None:
+    """Remove the spooled file of an upload that's no longer needed."""
+    if upload.file_path:
+        await asyncio.to_thread(upload.file_path.unlink, missing_ok=True)
+
+
+async def spool_upload(
+    file: UploadFile, upload_folder: Path | None = None
+) -> SpooledUpload:
+    """
+    Read an upload chunk by chunk, hashing it and writing it to disk as it
+    goes, so only one chunk is ever held in memory.
+
+    The content type is sniffed from the first chunk and the size checked
+    after every chunk. The request body was already checked against the
+    size of a whole upload by BodySizeLimitMiddleware, this checks every
+    file of it.
+
+    :param file: Uploaded file
+    :param upload_folder: Folder to spool the file into, only hash it if None
+    :raises UnsupportedMediaType: if the file is not an image
+    :raises PayloadTooLarge: if the file is bigger than UPLOAD_MAX_SIZE
+    """
+    chunk = await file.read(config.UPLOAD_CHUNK_SIZE)
+    content_type = sniff_image_type(chunk)
+    if content_type is None:
+        raise UnsupportedMediaType(error_message="File is not a supported image")
+
+    file_path = None
+    output = None
+    if upload_folder is not None:
+        extension = content_type.split("/")[-1]
+        file_path = Path(upload_folder) / f"{uuid.uuid4().hex}.{extension}"
+        output = await asyncio.to_thread(open, file_path, "wb")
+
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        while chunk:
+            size += len(chunk)
+            if size > config.UPLOAD_MAX_SIZE:
+                raise PayloadTooLarge(
+                    error_message=f"File is larger than {config.UPLOAD_MAX_SIZE} bytes"
+                )
+
+            hasher.update(chunk)
+            if output:
+                await asyncio.to_thread(output.write, chunk)
+
+            chunk = await file.read(config.UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        if output:
+            await asyncio.to_thread(output.close)
+            await asyncio.to_thread(os.remove, file_path)
+        raise
+
+    if output:
+        await asyncio.to_thread(output.close)
+
+    return SpooledUpload(
+        hash=hasher.hexdigest(),
+        size=size,
+        content_type=content_type,
+        file_path=file_path,
+    )
@@ -1,2 +1,3 @@
 from .access_log import AccessLogMiddleware
+from .body_size import BodySizeLimitMiddleware
 from .db import DBSessionMiddleware
@@ -0,0 +1,75 @@
+from typing import TYPE_CHECKING
+
+from starlette.exceptions import HTTPException
+
+from main.misc.exceptions import PayloadTooLarge, StatusCode
+
+
+if TYPE_CHECKING:
+    from asgiref.typing import (
+        ASGI3Application,
+        ASGIReceiveCallable,
+        ASGIReceiveEvent,
+        ASGISendCallable,
+        HTTPScope,
+    )
+
+
+class BodySizeLimitMiddleware:
+    """
+    Reject request bodies over the limit of their path with a 413, before
+    the endpoint parses them into temporary files.
+
+    A Content-Length over the limit is rejected without reading the body,
+    and a body without one, e.g. chunked, as soon as it goes over it.
+    """
+
+    def __init__(
+        self,
+        app: "ASGI3Application",
+        max_body_size: int,
+        path_limits: dict[str, int] | None = None,
+    ):
+        """
+        :param max_body_size: Most bytes of a request body
+        :param path_limits: Most bytes of a request body by path, instead of
+            ``max_body_size``
+        """
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_limits = path_limits or {}
+
+    async def __call__(
+        self,
+        scope: "HTTPScope",
+        receive: "ASGIReceiveCallable",
+        send: "ASGISendCallable",
+    ):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)  # pragma: no cover
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_body_size)
+        error_message = f"Request body is larger than {limit} bytes"
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and int(content_length) > limit:
+            response = PayloadTooLarge(error_message=error_message).to_response()
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> "ASGIReceiveEvent":
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised again by FastAPI while it parses the body
+                    raise HTTPException(
+                        status_code=StatusCode.PAYLOAD_TOO_LARGE, detail=error_message
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -10,6 +10,8 @@ class StatusCode:
     FORBIDDEN = 403
     NOT_FOUND = 404
     METHOD_NOT_ALLOWED = 405
+    PAYLOAD_TOO_LARGE = 413
+    UNSUPPORTED_MEDIA_TYPE = 415
     INTERNAL_SERVER_ERROR = 500
 
 
@@ -20,6 +22,8 @@ class ErrorCode:
     FORBIDDEN = 403000
     NOT_FOUND = 404000
     METHOD_NOT_ALLOWED = 405000
+    PAYLOAD_TOO_LARGE = 413000
+    UNSUPPORTED_MEDIA_TYPE = 415000
     INTERNAL_SERVER_ERROR = 500000
 
 
@@ -30,6 +34,8 @@ class _ErrorMessage:
     FORBIDDEN = "Forbidden."
     NOT_FOUND = "Not found."
     METHOD_NOT_ALLOWED = "Method not allowed."
+    PAYLOAD_TOO_LARGE = "Payload too large."
+    UNSUPPORTED_MEDIA_TYPE = "Unsupported media type."
     INTERNAL_SERVER_ERROR = "Internal server error."
 
 
@@ -103,6 +109,18 @@ class NotFound(BaseError):
     error_code = ErrorCode.NOT_FOUND
 
 
+class PayloadTooLarge(BaseError):
+    status_code = StatusCode.PAYLOAD_TOO_LARGE
+    error_message = _ErrorMessage.PAYLOAD_TOO_LARGE
+    error_code = ErrorCode.PAYLOAD_TOO_LARGE
+
+
+class UnsupportedMediaType(BaseError):
+    status_code = StatusCode.UNSUPPORTED_MEDIA_TYPE
+    error_message = _ErrorMessage.UNSUPPORTED_MEDIA_TYPE
+    error_code = ErrorCode.UNSUPPORTED_MEDIA_TYPE
+
+
 class InternalServerError(BaseError):
     status_code = StatusCode.INTERNAL_SERVER_ERROR
     error_message = _ErrorMessage.INTERNAL_SERVER_ERROR
@@ -1,5 +1,38 @@
 import hashlib
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# dHash compares each pixel of a (size + 1) x size grayscale thumbnail with
+# its right neighbour, giving a size * size bit hash
+PHASH_SIZE = 8
 
 
 def calculate_image_hash(file_bytes: bytes) -> str:
     return hashlib.sha256(file_bytes).hexdigest()
+
+
+def calculate_perceptual_hash(image: bytes | str | Path) -> int:
+    """
+    Difference hash of an image, close for images that look alike even
+    after being re-encoded, resized or re-compressed.
+
+    :param image: Image bytes or path
+    :return: 64-bit hash
+    """
+    source = BytesIO(image) if isinstance(image, bytes) else image
+    with Image.open(source) as img:
+        img.draft("L", (PHASH_SIZE * 4, PHASH_SIZE * 4))
+        thumbnail = img.convert("L").resize(
+            (PHASH_SIZE + 1, PHASH_SIZE), Image.Resampling.LANCZOS
+        )
+
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
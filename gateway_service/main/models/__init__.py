@@ -1 +1,8 @@
-__all__ = ["item", "image_cache", "text_cache", "retry_job"]
+__all__ = [
+    "item",
+    "image_cache",
+    "image_phash",
+    "text_cache",
+    "retry_job",
+    "translation_memory",
+]
@@ -0,0 +1,12 @@
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel, TimestampMixin, DeleteMark
+
+
+class ImagePHashModel(BaseModel, TimestampMixin, DeleteMark):
+    __tablename__ = "image_phash"
+
+    hash_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # 64-bit perceptual hash, hex-encoded
+    phash: Mapped[str] = mapped_column(String(16))
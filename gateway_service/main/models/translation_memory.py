@@ -0,0 +1,12 @@
+from sqlalchemy import String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel, TimestampMixin, DeleteMark
+
+
+class TranslationMemoryModel(BaseModel, TimestampMixin, DeleteMark):
+    __tablename__ = "translation_memory"
+
+    # Language pair and digest of the source sentence
+    segment_key: Mapped[str] = mapped_column(String(128), primary_key=True)
+    translated_text: Mapped[str] = mapped_column(Text)
@@ -4,7 +4,8 @@ from pydantic import BaseModel
 class ImageMetadata(BaseModel):
     filename: str | None = None
     hash: str
-    image_bytes: bytes
+    image_bytes: bytes | None = None
+    phash: int | None = None
     file_url: str | None = None
     job_uuid: str | None = None
 
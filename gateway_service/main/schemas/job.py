@@ -0,0 +1,55 @@
+from pydantic import BaseModel, Field
+
+from main.services.job_service import JobEvent, JobStage
+
+
+class JobStatusRequest(BaseModel):
+    job_uuids: list[str] = Field(min_length=1)
+
+
+class JobStageSchema(BaseModel):
+    enqueued_at: float | None = None
+    started_at: float | None = None
+    finished_at: float | None = None
+    failed_at: float | None = None
+
+
+class JobStatusSchema(BaseModel):
+    job_uuid: str
+    # "unknown" for the jobs never recorded or expired
+    state: str = "unknown"
+    stage: str | None = None
+    pdf_url: str | None = None
+    error: str | None = None
+    completed_at: float | None = None
+    stages: dict[str, JobStageSchema] = {}
+
+    @classmethod
+    def from_fields(cls, job_uuid: str, fields: dict[str, str]) -> "JobStatusSchema":
+        """
+        :param fields: Fields of the job's hash in Redis, see job_service
+        """
+        stages = {}
+        for stage in (JobStage.OCR, JobStage.TRANSLATION, JobStage.PDF):
+            timestamps = {
+                f"{event}_at": fields[f"{stage}_{event}_at"]
+                for event in (
+                    JobEvent.ENQUEUED,
+                    JobEvent.STARTED,
+                    JobEvent.FINISHED,
+                    JobEvent.FAILED,
+                )
+                if f"{stage}_{event}_at" in fields
+            }
+            if timestamps:
+                stages[stage] = JobStageSchema(**timestamps)
+
+        return cls(
+            job_uuid=job_uuid,
+            state=fields.get("state", "unknown"),
+            stage=fields.get("stage"),
+            pdf_url=fields.get("pdf_url"),
+            error=fields.get("error"),
+            completed_at=fields.get("completed_at"),
+            stages=stages,
+        )
@@ -1,10 +1,11 @@
-import aiohttp
+from functools import cache
 from google.cloud import storage
 from typing import Optional
 from datetime import timedelta
 
 from main import config
-from main.misc.exceptions import BadRequest
+from main.misc.exceptions import BadRequest, PayloadTooLarge
+from main.services.storage_client import ObjectTooLarge, StorageError, storage_client
 
 
 class GCSService:
@@ -49,6 +50,15 @@ class GCSService:
         return blob.public_url
 
 
+@cache
+def get_gcs_service() -> GCSService:
+    """
+    Get the GCS service shared by every request, so its client and
+    credentials are only set up once.
+    """
+    return GCSService()
+
+
 async def download_image_from_gcs_to_memory(public_url: str) -> bytes:
     """
     Downloads an image file from a public Google Cloud Storage URL into memory.
@@ -58,17 +68,11 @@ async def download_image_from_gcs_to_memory(public_url: str) -> bytes:
     :return: Image content as bytes
     :raises: Exception if file is not an image
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(public_url) as response:
-            if response.status != 200:
-                raise BadRequest(
-                    error_message=f"Failed to download file: HTTP {response.status}"
-                )
-
-            # content_type = response.headers.get("Content-Type", "")
-            # if not content_type.startswith("image/"):
-            #     raise BadRequest(
-            #         error_message=f"File is not an image (Content-Type: {content_type})"
-            #     )
-
-            return await response.read()
+    try:
+        return await storage_client.download(
+            public_url, max_size=config.UPLOAD_MAX_SIZE
+        )
+    except ObjectTooLarge as e:
+        raise PayloadTooLarge(error_message=str(e))
+    except StorageError as e:
+        raise BadRequest(error_message=str(e))
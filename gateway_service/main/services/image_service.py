@@ -1,7 +1,10 @@
-from sqlalchemy import select
+from typing import AsyncIterator
+
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from main.models.image_cache import ImageCacheModel
+from main.models.image_phash import ImagePHashModel
 
 
 async def get_cached_image(
@@ -11,3 +14,35 @@ async def get_cached_image(
     stmt = stmt.where(ImageCacheModel.is_deleted.is_(False))
     result = await session.execute(stmt)
     return result.scalars().first()
+
+
+async def get_cached_pdf_urls(
+    session: AsyncSession, input_hashes: list[str]
+) -> dict[str, str]:
+    stmt = select(ImageCacheModel.hash_id, ImageCacheModel.pdf_url)
+    stmt = stmt.where(ImageCacheModel.hash_id.in_(input_hashes))
+    stmt = stmt.where(ImageCacheModel.is_deleted.is_(False))
+    result = await session.execute(stmt)
+    return {hash_id: pdf_url for hash_id, pdf_url in result.all()}
+
+
+async def get_image_hashes(session: AsyncSession) -> AsyncIterator[str]:
+    stmt = select(ImageCacheModel.hash_id)
+    stmt = stmt.where(ImageCacheModel.is_deleted.is_(False))
+    stmt = stmt.execution_options(yield_per=10_000)
+    async for hash_id in await session.stream_scalars(stmt):
+        yield hash_id
+
+
+async def get_image_phashes(session: AsyncSession) -> dict[str, int]:
+    stmt = select(ImagePHashModel.hash_id, ImagePHashModel.phash)
+    stmt = stmt.where(ImagePHashModel.is_deleted.is_(False))
+    result = await session.execute(stmt)
+    return {hash_id: int(phash, 16) for hash_id, phash in result.all()}
+
+
+async def save_image_phash(session: AsyncSession, hash_id: str, phash: int) -> None:
+    # The image may have been uploaded by another request in the meantime
+    stmt = insert(ImagePHashModel).prefix_with("IGNORE")
+    await session.execute(stmt, [{"hash_id": hash_id, "phash": f"{phash:016x}"}])
+    await session.commit()
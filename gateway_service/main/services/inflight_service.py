@@ -0,0 +1,51 @@
+from redis.asyncio import Redis
+
+# Registry of the images currently going through OCR -> translation -> PDF.
+# The first request for an image takes the lease and publishes the job, the
+# following ones are added to the subscribers and notified by the worker that
+# finishes the job.
+INFLIGHT_KEY = "inflight:{image_hash}"
+SUBSCRIBERS_KEY = "inflight:{image_hash}:subscribers"
+
+# Take the lease, or subscribe to the job already holding it
+_ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return 1
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 0
+"""
+
+
+async def acquire(
+    redis: Redis, image_hash: str, job_uuid: str, lease_seconds: int
+) -> bool:
+    """
+    Register a job for an image unless one is already in flight.
+
+    :param redis: Redis connection
+    :param image_hash: Hash of the image
+    :param job_uuid: Job of the current request
+    :param lease_seconds: How long the job may stay in flight before
+        another request is allowed to publish it again
+    :return: True if the caller owns the job and must publish it,
+        False if it was attached to the job already in flight
+    """
+    script = redis.register_script(_ACQUIRE_SCRIPT)
+    acquired = await script(
+        keys=[
+            INFLIGHT_KEY.format(image_hash=image_hash),
+            SUBSCRIBERS_KEY.format(image_hash=image_hash),
+        ],
+        args=[job_uuid, lease_seconds],
+    )
+    return bool(acquired)
+
+
+async def abandon(redis: Redis, image_hash: str) -> None:
+    """
+    Give the lease up after failing to publish the job, so the next request
+    for the image publishes it. Subscribers stay attached to that next job.
+    """
+    await redis.delete(INFLIGHT_KEY.format(image_hash=image_hash))
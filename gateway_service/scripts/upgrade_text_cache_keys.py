@@ -0,0 +1,154 @@
+"""
+Bring a database created before the text cache digest keys up to date with
+modern_sa.sql, then give every legacy text_cache row its digest key.
+
+    python ./gateway_service/scripts/upgrade_text_cache_keys.py
+
+Safe to run again: finished steps are skipped, and the backfill resumes
+with the rows still missing a key. Once it's done, the OCR workers can run
+with TEXT_CACHE_LEGACY_READ off.
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import config
+
+# Must match TEXT_KEY_PREFIX in the OCR and PDF services' misc/utils/encoder.py
+TEXT_KEY_PREFIX = "text:v2:"
+BACKFILL_BATCH_SIZE = 1000
+
+NEW_TABLES = {
+    "image_phash": """
+        CREATE TABLE IF NOT EXISTS `image_phash` (
+          `hash_id` varchar(255) NOT NULL,
+          `phash` varchar(16) NOT NULL,
+          `created_at` datetime NOT NULL,
+          `updated_at` datetime NOT NULL,
+          `is_deleted` tinyint(1) NOT NULL,
+          PRIMARY KEY (`hash_id`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+    "translation_memory": """
+        CREATE TABLE IF NOT EXISTS `translation_memory` (
+          `segment_key` varchar(128) NOT NULL,
+          `translated_text` text NOT NULL,
+          `created_at` datetime NOT NULL,
+          `updated_at` datetime NOT NULL,
+          `is_deleted` tinyint(1) NOT NULL,
+          PRIMARY KEY (`segment_key`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """,
+}
+
+
+def text_key(text_encode: str) -> str:
+    """
+    Digest key of a text, from its legacy base64 key.
+    """
+    return TEXT_KEY_PREFIX + hashlib.sha256(base64.b64decode(text_encode)).hexdigest()
+
+
+async def _has_column(connection: AsyncConnection, table: str, column: str) -> bool:
+    result = await connection.execute(
+        text(
+            "SELECT 1 FROM information_schema.columns WHERE table_schema ="
+            " DATABASE() AND table_name = :table AND column_name = :column"
+        ),
+        {"table": table, "column": column},
+    )
+    return result.first() is not None
+
+
+async def _has_index(connection: AsyncConnection, table: str, index: str) -> bool:
+    result = await connection.execute(
+        text(
+            "SELECT 1 FROM information_schema.statistics WHERE table_schema ="
+            " DATABASE() AND table_name = :table AND index_name = :index"
+        ),
+        {"table": table, "index": index},
+    )
+    return result.first() is not None
+
+
+async def upgrade_schema(connection: AsyncConnection) -> None:
+    for table, ddl in NEW_TABLES.items():
+        await connection.execute(text(ddl))
+        logging.info(f"Table {table} is created")
+
+    if not await _has_column(connection, "text_cache", "text_key"):
+        await connection.execute(
+            text(
+                "ALTER TABLE `text_cache`"
+                " ADD COLUMN `text_key` varchar(128) DEFAULT NULL AFTER `id`,"
+                " MODIFY `text_encode` text NULL"
+            )
+        )
+        logging.info("Column text_cache.text_key is added")
+
+    # Indexed before the backfill, which looks the rows missing a key up
+    if not await _has_index(connection, "text_cache", "ix_text_key"):
+        await connection.execute(
+            text("CREATE INDEX `ix_text_key` ON `text_cache` (`text_key`)")
+        )
+        logging.info("Index ix_text_key is created")
+
+
+async def backfill_text_keys(connection: AsyncConnection) -> int:
+    """
+    Give the legacy rows their digest key, one batch per transaction.
+
+    :return: Number of rows updated
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = (
+            await connection.execute(
+                text(
+                    "SELECT id, text_encode FROM text_cache WHERE id > :last_id"
+                    " AND text_key IS NULL AND text_encode IS NOT NULL"
+                    " ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE},
+            )
+        ).all()
+        if not rows:
+            return updated
+
+        await connection.execute(
+            text("UPDATE text_cache SET text_key = :text_key WHERE id = :id"),
+            [
+                {"id": row_id, "text_key": text_key(text_encode)}
+                for row_id, text_encode in rows
+            ],
+        )
+        await connection.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+        logging.info(f"Backfilled {updated} text_cache rows")
+
+
+async def main() -> None:
+    engine = create_async_engine(config.SQLALCHEMY_DATABASE_URI)
+    try:
+        async with engine.connect() as connection:
+            await upgrade_schema(connection)
+            await connection.commit()
+            updated = await backfill_text_keys(connection)
+    finally:
+        await engine.dispose()
+    logging.info(f"Done, {updated} text_cache rows given a digest key")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import asyncio
+import contextlib
+import uuid
+
+from main.libs.bloom_filter import BloomFilter, CacheKeyFilter, ScalableBloomFilter
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [uuid.uuid4().hex for _ in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    assert bloom.is_full
+
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10_000))
+    assert false_positives < 300
+
+
+def test_scalable_bloom_filter_grows():
+    bloom = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+    keys = [uuid.uuid4().hex for _ in range(5000)]
+    for key in keys:
+        bloom.add(key)
+    bloom.add(keys[0])
+
+    # Keys already "in" the filter, false positives included, are not added twice
+    assert 4900 < len(bloom) <= 5000
+    assert all(key in bloom for key in keys)
+    assert bloom.estimated_error_rate() < 0.01
+
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10_000))
+    assert false_positives < 200
+
+
+class FlakyPubSub:
+    async def subscribe(self, channel: str):
+        pass
+
+    async def listen(self):
+        await asyncio.Future()
+        yield
+
+
+class FlakyRedis:
+    def __init__(self):
+        self.reachable = False
+
+    @contextlib.asynccontextmanager
+    async def pubsub(self):
+        if not self.reachable:
+            raise ConnectionError("Redis is unreachable")
+        yield FlakyPubSub()
+
+
+async def test_cache_key_filter_starts_disabled_without_redis():
+    redis = FlakyRedis()
+
+    @contextlib.asynccontextmanager
+    async def session_factory():
+        yield None
+
+    async def loader(session):
+        yield "cached"
+
+    image_filter = CacheKeyFilter(
+        name="image_cache",
+        redis=redis,
+        session_factory=session_factory,
+        loader=loader,
+        start_timeout=0.05,
+    )
+
+    try:
+        await asyncio.wait_for(image_filter.start(), timeout=1)
+        # Every key is "maybe present" while the filter is disabled
+        assert not image_filter.is_ready
+        assert image_filter.might_contain("absent")
+
+        # Loaded once Redis is back
+        redis.reachable = True
+        async with asyncio.timeout(3):
+            while not image_filter.is_ready:
+                await asyncio.sleep(0.05)
+        assert image_filter.might_contain("cached")
+        assert not image_filter.might_contain("absent")
+    finally:
+        await image_filter.close()
@@ -0,0 +1,174 @@
+from main import config
+from main.libs import image_lib
+from main.schemas.image import ImageMetadata
+from main.services import gcs_service, inflight_service, job_service
+
+
+class FakeCache:
+    def __init__(self, values: dict[str, str]):
+        self.values = values
+        self.calls = []
+
+    async def get_many(self, keys: list[str], session=None) -> dict[str, str]:
+        self.calls.append(keys)
+        return {key: self.values[key] for key in keys if key in self.values}
+
+
+class FakeFilter:
+    def might_contain(self, key: str) -> bool:
+        return key != "absent"
+
+    def record_lookup(self, found: bool) -> None:
+        pass
+
+
+class FakeRabbit:
+    def __init__(self, failing: set[str] = frozenset()):
+        self.failing = failing
+        self.sent = []
+
+    async def send_messages(self, messages: list | dict, routing_key=None):
+        self.sent.append(messages)
+        return [
+            ValueError("nacked") if message["job_uuid"] in self.failing else None
+            for message in messages
+        ]
+
+
+async def test_handle_images_looks_up_and_publishes_in_bulk(monkeypatch):
+    async def record(**kwargs):
+        pass
+
+    async def acquire(image_hash: str, **kwargs) -> bool:
+        return image_hash != "in-flight"
+
+    monkeypatch.setattr(config, "PHASH_ENABLED", False)
+    monkeypatch.setattr(job_service, "record", record)
+    monkeypatch.setattr(inflight_service, "acquire", acquire)
+    cache = FakeCache({"cached": "cached.pdf"})
+    rabbit = FakeRabbit()
+    images = [
+        (ImageMetadata(hash=image_hash, file_url=image_hash, job_uuid=job_uuid), True)
+        for image_hash, job_uuid in [
+            ("cached", "job-1"),
+            ("new", "job-2"),
+            ("absent", "job-3"),
+            ("new", "job-4"),
+            ("in-flight", "job-5"),
+        ]
+    ]
+
+    results = await image_lib.handle_images(
+        images=images,
+        cache_connection=None,
+        rabbit_connection=rabbit,
+        image_cache=cache,
+        image_filter=FakeFilter(),
+        phash_index=None,
+        session=None,
+    )
+
+    assert results == [
+        {"pdf_url": "cached.pdf"},
+        {"job_uuid": "job-2"},
+        {"job_uuid": "job-3"},
+        {"job_uuid": "job-2"},
+        {"job_uuid": "job-5"},
+    ]
+    # One lookup for the images the filter let through, one publish
+    assert cache.calls == [["cached", "new", "in-flight"]]
+    [messages] = rabbit.sent
+    assert [message["job_uuid"] for message in messages] == ["job-2", "job-3"]
+
+
+async def test_handle_images_reports_the_images_that_failed_to_publish(monkeypatch):
+    records = []
+    abandoned = []
+
+    async def record(job_uuid: str, event: str, **kwargs):
+        records.append((job_uuid, event))
+
+    async def acquire(**kwargs) -> bool:
+        return True
+
+    async def abandon(image_hash: str, **kwargs):
+        abandoned.append(image_hash)
+
+    monkeypatch.setattr(config, "PHASH_ENABLED", False)
+    monkeypatch.setattr(job_service, "record", record)
+    monkeypatch.setattr(inflight_service, "acquire", acquire)
+    monkeypatch.setattr(inflight_service, "abandon", abandon)
+    images = [
+        (ImageMetadata(hash=image_hash, file_url=image_hash, job_uuid=job_uuid), True)
+        for image_hash, job_uuid in [("a", "job-1"), ("b", "job-2")]
+    ]
+
+    results = await image_lib.handle_images(
+        images=images,
+        cache_connection=None,
+        rabbit_connection=FakeRabbit(failing={"job-1"}),
+        image_cache=FakeCache({}),
+        image_filter=FakeFilter(),
+        phash_index=None,
+        session=None,
+    )
+
+    assert results == [{"job_uuid": "job-1", "error": "nacked"}, {"job_uuid": "job-2"}]
+    assert abandoned == ["a"]
+    assert ("job-1", "failed") in records
+
+
+async def test_handle_images_looks_gcs_misses_up_by_their_given_phash(monkeypatch):
+    downloads = []
+    lookups = []
+
+    async def record(**kwargs):
+        pass
+
+    async def acquire(**kwargs) -> bool:
+        return True
+
+    async def download(public_url: str) -> bytes:
+        downloads.append(public_url)
+        return b"image"
+
+    async def find_near_duplicate(image, phash=None, **kwargs):
+        lookups.append((image, phash))
+        return ("near.pdf", phash) if phash == 1 else (None, None)
+
+    monkeypatch.setattr(config, "PHASH_ENABLED", True)
+    monkeypatch.setattr(job_service, "record", record)
+    monkeypatch.setattr(inflight_service, "acquire", acquire)
+    monkeypatch.setattr(gcs_service, "download_image_from_gcs_to_memory", download)
+    monkeypatch.setattr(image_lib, "find_near_duplicate", find_near_duplicate)
+    images = [
+        (
+            ImageMetadata(
+                hash=image_hash,
+                file_url=f"gs://{image_hash}",
+                phash=phash,
+                job_uuid=f"job-{image_hash}",
+            ),
+            True,
+        )
+        for image_hash, phash in [("cached", 0), ("near", 1), ("undecodable", None)]
+    ]
+
+    results = await image_lib.handle_images(
+        images=images,
+        cache_connection=None,
+        rabbit_connection=FakeRabbit(),
+        image_cache=FakeCache({"cached": "cached.pdf"}),
+        image_filter=FakeFilter(),
+        phash_index=None,
+        session=None,
+    )
+
+    assert results == [
+        {"pdf_url": "cached.pdf"},
+        {"pdf_url": "near.pdf"},
+        {"job_uuid": "job-undecodable"},
+    ]
+    # The images downloaded to be hashed are not downloaded again
+    assert downloads == []
+    assert lookups == [(None, 1)]
@@ -0,0 +1,30 @@
+import asyncio
+
+from main.libs.job_events import JobEventHub
+
+
+class FakeRedis:
+    def __init__(self, jobs: dict[str, dict[str, str]]):
+        self.jobs = jobs
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return self.jobs.get(key, {}).get(field)
+
+
+async def test_hub_hands_a_result_to_every_waiting_request():
+    hub = JobEventHub(redis=FakeRedis({}))
+    waiters = [asyncio.create_task(hub.wait("job-1", timeout=1)) for _ in range(3)]
+    other = asyncio.create_task(hub.wait("job-2", timeout=0.05))
+    await asyncio.sleep(0.01)
+
+    hub._resolve("job-1", "a.pdf")
+
+    assert await asyncio.gather(*waiters) == ["a.pdf"] * 3
+    assert await other is None
+    assert hub.get_stats() == {"events": 0, "delivered": 3, "waiting": 0}
+
+
+async def test_hub_reads_results_published_before_waiting():
+    hub = JobEventHub(redis=FakeRedis({"job:job-1": {"pdf_url": "a.pdf"}}))
+
+    assert await hub.wait("job-1", timeout=0) == "a.pdf"
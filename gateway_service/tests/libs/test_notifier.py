@@ -0,0 +1,80 @@
+import asyncio
+
+from main.libs.notifier import Notifier
+
+
+class FakeClient:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches = []
+
+    def trigger_batch(self, batch: list[dict]) -> dict:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Provider is down")
+        self.batches.append(batch)
+        return {}
+
+
+class FakeRedis:
+    """
+    The list commands of Redis used by the notifier.
+    """
+
+    def __init__(self):
+        self.lists = {}
+
+    async def rpush(self, key: str, *values: str) -> int:
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    async def lpop(self, key: str, count: int) -> list[str] | None:
+        values = self.lists.get(key, [])
+        popped, self.lists[key] = values[:count], values[count:]
+        return popped or None
+
+
+async def test_notifier_sends_queued_events_in_batches():
+    client = FakeClient()
+    notifier = Notifier(client=client, batch_delay=0.01)
+    await notifier.start()
+
+    for i in range(25):
+        notifier.notify(channel=f"job-{i}", event="message", data={"file_url": i})
+    # Nothing is sent until the caller yields
+    assert client.batches == []
+
+    await notifier.close()
+
+    assert [len(batch) for batch in client.batches] == [10, 10, 5]
+    assert client.batches[0][0] == {
+        "channel": "job-0",
+        "name": "message",
+        "data": {"file_url": 0},
+    }
+    assert notifier.get_stats()["sent"] == 25
+
+
+async def test_notifier_spills_to_redis_and_replays_when_provider_is_back():
+    client = FakeClient(failures=3)
+    redis = FakeRedis()
+    notifier = Notifier(
+        client=client, redis=redis, batch_delay=0, max_retries=2, retry_delay=0
+    )
+    await notifier.start()
+
+    notifier.notify(channel="job-1", event="message", data={"file_url": "a.pdf"})
+    await asyncio.sleep(0.05)
+
+    # Sent once, retried twice, then kept in Redis
+    assert client.batches == []
+    assert len(redis.lists["notifications:spill"]) == 1
+
+    assert await notifier.replay() == 1
+    await notifier.close()
+
+    assert client.batches == [
+        [{"channel": "job-1", "name": "message", "data": {"file_url": "a.pdf"}}]
+    ]
+    assert redis.lists["notifications:spill"] == []
+    assert notifier.get_stats()["retries"] == 2
@@ -0,0 +1,136 @@
+import random
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageDraw
+
+from main import config
+from main.libs.image_lib import find_near_duplicate
+from main.libs.phash_index import MultiIndexHash, PerceptualHashIndex
+from main.misc.utils.hashing import calculate_perceptual_hash, hamming_distance
+
+
+def _page(size: tuple[int, int], quality: int) -> bytes:
+    image = Image.new("L", (800, 1000), color=255)
+    draw = ImageDraw.Draw(image)
+    for i in range(20):
+        draw.rectangle((50, 40 + i * 45, 300 + (i * 97) % 450, 65 + i * 45), fill=0)
+
+    output = BytesIO()
+    image.resize(size).save(output, format="JPEG", quality=quality)
+    return output.getvalue()
+
+
+def test_perceptual_hash_of_re_encoded_image():
+    original = calculate_perceptual_hash(_page((800, 1000), quality=95))
+    re_encoded = calculate_perceptual_hash(_page((400, 500), quality=40))
+
+    assert hamming_distance(original, re_encoded) <= config.PHASH_MAX_DISTANCE
+
+
+def test_perceptual_hash_of_different_images():
+    page = calculate_perceptual_hash(_page((800, 1000), quality=95))
+    blank = BytesIO()
+    Image.new("L", (800, 1000), color=255).save(blank, format="PNG")
+
+    assert hamming_distance(page, calculate_perceptual_hash(blank.getvalue())) > 4
+
+
+def test_multi_index_hash_search():
+    rng = random.Random(0)
+    hashes = {f"image-{i}": rng.getrandbits(64) for i in range(1000)}
+    index = MultiIndexHash(max_distance=4)
+    for hash_id, phash in hashes.items():
+        index.add(phash, hash_id)
+
+    query = hashes["image-42"] ^ 0b101
+    found = index.search(query, radius=4)
+
+    expected = sorted(
+        (hamming_distance(query, phash), hash_id)
+        for hash_id, phash in hashes.items()
+        if hamming_distance(query, phash) <= 4
+    )
+    assert found == expected
+    assert found[0] == (2, "image-42")
+    assert len(index) == 1000
+
+
+class UnreachableRedis:
+    def pubsub(self):
+        raise ConnectionError("Redis is unreachable")
+
+
+async def test_perceptual_hash_index_start_times_out_without_redis():
+    async def loader(session) -> dict[str, int]:
+        return {}
+
+    index = PerceptualHashIndex(
+        name="image_phash",
+        redis=UnreachableRedis(),
+        loader=loader,
+        max_distance=4,
+        start_timeout=0.05,
+    )
+
+    with pytest.raises(TimeoutError):
+        await index.start(session=None)
+    assert index._listener is None
+
+
+def _text_page(seed: int) -> bytes:
+    """
+    Page of randomly laid out words, a different document for every seed.
+    """
+    rng = random.Random(seed)
+    image = Image.new("L", (800, 1000), color=255)
+    draw = ImageDraw.Draw(image)
+    y = 60
+    while y < 940:
+        x = 60
+        while x < 740:
+            width = rng.randint(20, 90)
+            draw.rectangle((x, y, min(x + width, 740), y + 14), fill=0)
+            x += width + rng.randint(8, 16)
+        y += rng.choice([28, 28, 28, 56])
+
+    output = BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+class FakeCache:
+    def __init__(self, values: dict[str, str]):
+        self.values = values
+
+    async def get_many(self, keys: list[str], session=None) -> dict[str, str]:
+        return {key: self.values[key] for key in keys if key in self.values}
+
+
+async def test_find_near_duplicate_does_not_match_different_text_pages():
+    index = PerceptualHashIndex(
+        name="image_phash", redis=None, loader=None, max_distance=4
+    )
+    pdf_urls = {}
+    for seed in range(30):
+        hash_id = f"page-{seed}"
+        index._add_local(hash_id, calculate_perceptual_hash(_text_page(seed)))
+        pdf_urls[hash_id] = f"{hash_id}.pdf"
+    cache = FakeCache(pdf_urls)
+
+    for seed in range(30, 60):
+        pdf_url, _ = await find_near_duplicate(
+            _text_page(seed), phash_index=index, image_cache=cache, session=None
+        )
+        assert pdf_url is None
+
+    # The same page re-encoded is still found
+    index._add_local("page", calculate_perceptual_hash(_page((800, 1000), 95)))
+    cache.values["page"] = "page.pdf"
+    pdf_url, _ = await find_near_duplicate(
+        _page((400, 500), quality=40),
+        phash_index=index,
+        image_cache=cache,
+        session=None,
+    )
+    assert pdf_url == "page.pdf"
@@ -0,0 +1,53 @@
+import hashlib
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from main import config
+from main.libs import upload_lib
+from main.misc.exceptions import PayloadTooLarge, UnsupportedMediaType
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200_000
+
+
+async def test_spool_upload(tmp_path):
+    file = UploadFile(io.BytesIO(PNG_BYTES), filename="page.png")
+
+    upload = await upload_lib.spool_upload(file=file, upload_folder=tmp_path)
+
+    assert upload.hash == hashlib.sha256(PNG_BYTES).hexdigest()
+    assert upload.size == len(PNG_BYTES)
+    assert upload.content_type == "image/png"
+    assert upload.file_path.read_bytes() == PNG_BYTES
+
+    await upload_lib.discard(upload)
+    assert not upload.file_path.exists()
+
+
+async def test_spool_upload_hash_only():
+    file = UploadFile(io.BytesIO(PNG_BYTES), filename="page.png")
+
+    upload = await upload_lib.spool_upload(file=file)
+
+    assert upload.hash == hashlib.sha256(PNG_BYTES).hexdigest()
+    assert upload.file_path is None
+
+
+async def test_spool_upload_rejects_non_image(tmp_path):
+    file = UploadFile(io.BytesIO(b"%PDF-1.4"), filename="page.png")
+
+    with pytest.raises(UnsupportedMediaType):
+        await upload_lib.spool_upload(file=file, upload_folder=tmp_path)
+
+    assert not list(tmp_path.iterdir())
+
+
+async def test_spool_upload_rejects_large_file(tmp_path):
+    data = b"\xff\xd8\xff" + b"\x00" * config.UPLOAD_MAX_SIZE
+    file = UploadFile(io.BytesIO(data), filename="page.jpg")
+
+    with pytest.raises(PayloadTooLarge):
+        await upload_lib.spool_upload(file=file, upload_folder=tmp_path)
+
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,70 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from main.middlewares import BodySizeLimitMiddleware
+from main.misc.error_handlers import register_error_handlers
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2000
+
+
+def _create_client(max_body_size: int) -> tuple[TestClient, list[str]]:
+    uploads = []
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, max_body_size=max_body_size)
+    register_error_handlers(app)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        uploads.append(file.filename)
+        return {"size": len(await file.read())}
+
+    return TestClient(app), uploads
+
+
+def test_body_size_limit_accepts_small_bodies():
+    client, uploads = _create_client(max_body_size=4096)
+
+    response = client.post("/upload", files={"file": ("page.png", PNG_BYTES)})
+
+    assert response.status_code == 200
+    assert response.json() == {"size": len(PNG_BYTES)}
+    assert uploads == ["page.png"]
+
+
+def test_body_size_limit_rejects_large_content_length():
+    client, uploads = _create_client(max_body_size=1024)
+
+    response = client.post("/upload", files={"file": ("page.png", PNG_BYTES)})
+
+    assert response.status_code == 413
+    assert response.json()["error_code"] == 413000
+    assert uploads == []
+
+
+def test_body_size_limit_rejects_large_chunked_body():
+    client, uploads = _create_client(max_body_size=1024)
+    boundary = "boundary"
+    body = (
+        (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="page.png"\r\n'
+            "Content-Type: image/png\r\n\r\n"
+        ).encode()
+        + PNG_BYTES
+        + f"\r\n--{boundary}--\r\n".encode()
+    )
+
+    def chunks():
+        # Streamed without a Content-Length
+        for start in range(0, len(body), 256):
+            yield body[start : start + 256]
+
+    response = client.post(
+        "/upload",
+        content=chunks(),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+
+    assert response.status_code == 413
+    assert response.json()["error_code"] == 413000
+    assert uploads == []
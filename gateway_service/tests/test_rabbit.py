@@ -0,0 +1,82 @@
+import asyncio
+
+from aio_pika.exceptions import DeliveryError
+from aio_pika.pool import Pool
+
+from main._rabbit import RabbitConnection
+
+
+class FakeExchange:
+    def __init__(self):
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def publish(self, message, routing_key: str, mandatory: bool, timeout):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Waiting for the confirm
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if message.body == b'{"id":3}':
+            raise DeliveryError(None, None)
+        self.bodies.append(message.body)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.default_exchange = FakeExchange()
+
+    async def close(self):
+        pass
+
+
+async def test_send_messages_publishes_within_the_window():
+    channels = []
+
+    async def open_channel():
+        channels.append(FakeChannel())
+        return channels[-1]
+
+    rabbit = RabbitConnection(
+        channel_pool=Pool(open_channel, max_size=2), publish_window=4
+    )
+
+    errors = await rabbit.send_messages(
+        messages=[{"id": i} for i in range(10)], routing_key="queue"
+    )
+
+    assert [i for i, error in enumerate(errors) if error is not None] == [3]
+    assert isinstance(errors[3], DeliveryError)
+    [channel] = channels
+    assert len(channel.default_exchange.bodies) == 9
+    assert channel.default_exchange.max_in_flight == 4
+
+
+async def test_concurrent_callers_publish_on_channels_of_their_own():
+    channels = []
+
+    async def open_channel():
+        channels.append(FakeChannel())
+        return channels[-1]
+
+    rabbit = RabbitConnection(channel_pool=Pool(open_channel, max_size=2))
+
+    await asyncio.gather(
+        *(
+            rabbit.send_messages(messages={"id": i}, routing_key="queue")
+            for i in range(4)
+        )
+    )
+
+    assert len(channels) == 2
+
+
+async def test_disconnect_without_a_connection():
+    rabbit = RabbitConnection()
+
+    await rabbit.disconnect()
+
+    assert rabbit.channel_pool is None
@@ -16,6 +16,16 @@ class Config(BaseSettings):
     RABBITMQ_QUEUE_GATEWAY_TO_OCR: str
     RABBITMQ_QUEUE_OCR_TO_TRANSLATE: str
     RABBITMQ_CONNECTION: str
+    # Long-lived publisher: channel pool size, messages kept while the
+    # broker is unreachable, seconds to wait for a publisher confirm
+    RABBITMQ_PUBLISHER_CHANNELS: int = 4
+    RABBITMQ_PUBLISHER_BUFFER: int = 1000
+    RABBITMQ_PUBLISH_TIMEOUT: float = 10
+    # Consumer: messages handled at once, unacknowledged messages sent by
+    # the broker (0 means twice the concurrency), seconds allowed per message
+    WORKER_CONCURRENCY: int = 0  # 0 means twice the OCR pool workers
+    RABBITMQ_PREFETCH_COUNT: int = 0
+    WORKER_MESSAGE_TIMEOUT: float = 300
 
     model_config = SettingsConfigDict(
         case_sensitive=True,
@@ -27,14 +37,64 @@ class Config(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
 
+    # Process-local tier of the caches
+    CACHE_LOCAL_MAXSIZE: int = 10_000
+    CACHE_LOCAL_TTL: float = 300
+    # Also look texts up under their legacy base64 key, in Redis and MySQL.
+    # Only meant for the rollout, until gateway_service/scripts/
+    # upgrade_text_cache_keys.py has given every legacy row its digest key:
+    # text_encode isn't indexed, so each miss scans text_cache
+    TEXT_CACHE_LEGACY_READ: bool = False
+
     # Pusher settings
     PUSHER_APP_ID: str
     PUSHER_KEY: str
     PUSHER_SECRET: str
     PUSHER_CLUSTER: str
+    # Notifications are sent in the background, in batches of at most
+    # PUSHER_BATCH_SIZE events (10 at most) waiting up to PUSHER_BATCH_DELAY
+    # seconds to fill up. A failed batch is retried PUSHER_MAX_RETRIES times
+    # with backoff, then kept in Redis and sent again every
+    # PUSHER_REPLAY_INTERVAL seconds
+    PUSHER_BATCH_SIZE: int = 10
+    PUSHER_BATCH_DELAY: float = 0.05
+    PUSHER_MAX_QUEUED: int = 10_000
+    PUSHER_MAX_RETRIES: int = 3
+    PUSHER_RETRY_DELAY: float = 0.5
+    PUSHER_REPLAY_INTERVAL: float = 30
 
     SENTRY_DSN: str
 
+    # Seconds a job's state and result are kept after its last update
+    JOB_TTL: int = 86400
+
+    # Object storage: "gcs", or "local" keeping the files under
+    # STORAGE_LOCAL_ROOT, for tests and benchmarks
+    STORAGE_BACKEND: str = "gcs"
+    STORAGE_LOCAL_ROOT: str = "storage"
+    # Storage client shared by the process: max connections open at once, in
+    # total and per host, seconds DNS lookups are cached and idle connections
+    # kept open, seconds allowed per download, max bytes of a download
+    GCS_CONNECTION_LIMIT: int = 100
+    GCS_CONNECTION_LIMIT_PER_HOST: int = 32
+    GCS_DNS_CACHE_TTL: int = 300
+    GCS_KEEPALIVE_TIMEOUT: float = 30
+    GCS_DOWNLOAD_TIMEOUT: float = 30
+    GCS_MAX_DOWNLOAD_SIZE: int = 10 * 1024 * 1024
+
+    # OCR process pool settings, 0 means derived from the container CPU quota
+    OCR_POOL_WORKERS: int = 0
+    OCR_TASK_TIMEOUT: float = 30.0
+    OCR_MAX_PENDING: int = 0
+
+    # OCR engine: "tesserocr" keeps tesseract loaded in each worker,
+    # "pytesseract" runs the tesseract binary per image. tesserocr is built
+    # against libtesseract and libleptonica (see the Dockerfile), it can't
+    # stop at OCR_TASK_TIMEOUT by itself so its worker is killed then
+    OCR_ENGINE: str = "tesserocr"
+    OCR_LANG: str = "eng"
+    OCR_TESSDATA_PATH: str | None = None
+
 
 environment = os.environ.get("ENVIRONMENT", "local")
 config = Config(
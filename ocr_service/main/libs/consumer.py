@@ -0,0 +1,130 @@
+import asyncio
+import contextlib
+import logging
+from typing import Awaitable, Callable
+
+import aio_pika
+from aio_pika.abc import AbstractIncomingMessage
+
+Handler = Callable[[AbstractIncomingMessage], Awaitable[None]]
+RejectHandler = Callable[[AbstractIncomingMessage, str], Awaitable[None]]
+
+
+class Consumer:
+    """
+    Consumes a queue with a bounded number of messages in memory and in
+    progress at once.
+
+    The broker sends at most ``prefetch_count`` unacknowledged messages to
+    the worker, so the backlog stays in RabbitMQ where other replicas can
+    take it, and at most ``concurrency`` of them are handled at once. Every
+    message runs as a task of the consumer's task group with its own
+    timeout, and is acknowledged once its handler returns.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        queue_name: str,
+        handler: Handler,
+        concurrency: int = 4,
+        prefetch_count: int = 0,
+        message_timeout: float = 300,
+        on_reject: RejectHandler | None = None,
+    ):
+        """
+        :param url: RabbitMQ connection url
+        :param queue_name: Queue to consume
+        :param handler: Coroutine handling a message, it must not ack it
+        :param concurrency: Max messages handled at once
+        :param prefetch_count: Max unacknowledged messages, defaults to
+            twice the concurrency so the next messages are already there
+            when a slot frees up
+        :param message_timeout: Seconds allowed to handle a message
+        :param on_reject: Coroutine called with a message and the error when
+            it's rejected, i.e. dead-lettered, after its handler timed out or
+            raised
+        """
+        self.url = url
+        self.queue_name = queue_name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.prefetch_count = prefetch_count or concurrency * 2
+        self.message_timeout = message_timeout
+        self.on_reject = on_reject
+
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: asyncio.TaskGroup | None = None
+
+    async def run(self) -> None:
+        """
+        Consume the queue until cancelled. Messages still in progress then
+        are cancelled and given back to the broker.
+        """
+        connection = await aio_pika.connect_robust(self.url)
+        async with connection:
+            channel = await connection.channel()
+            await channel.set_qos(prefetch_count=self.prefetch_count)
+            queue = await channel.declare_queue(self.queue_name, durable=True)
+
+            async with asyncio.TaskGroup() as tasks:
+                self._tasks = tasks
+                consumer_tag = await queue.consume(self._on_message)
+                logging.info(
+                    f"Consumer: Consuming {self.queue_name}, "
+                    f"{self.concurrency} at once, prefetch {self.prefetch_count}"
+                )
+                try:
+                    await asyncio.Future()
+                finally:
+                    with contextlib.suppress(Exception):
+                        await queue.cancel(consumer_tag)
+
+    async def _on_message(self, message: AbstractIncomingMessage) -> None:
+        await self._slots.acquire()
+        try:
+            self._tasks.create_task(self._process(message))
+        except RuntimeError:
+            # The task group is shutting down
+            self._slots.release()
+            await self._settle(message.nack(requeue=True))
+
+    async def _process(self, message: AbstractIncomingMessage) -> None:
+        try:
+            async with asyncio.timeout(self.message_timeout):
+                await self.handler(message)
+        except asyncio.CancelledError:
+            # Shutting down, another worker will handle the message
+            await self._settle(message.nack(requeue=True))
+            raise
+        except TimeoutError:
+            logging.error(
+                f"Consumer: Message {message.delivery_tag} of {self.queue_name} "
+                f"took more than {self.message_timeout}s"
+            )
+            await self._reject(
+                message, f"Took more than {self.message_timeout}s to handle"
+            )
+        except Exception as e:
+            logging.exception(f"Consumer: Failed to handle a {self.queue_name} message")
+            await self._reject(message, str(e))
+        else:
+            await self._settle(message.ack())
+        finally:
+            self._slots.release()
+
+    async def _reject(self, message: AbstractIncomingMessage, error: str) -> None:
+        await self._settle(message.reject())
+        if self.on_reject is not None:
+            try:
+                await self.on_reject(message, error)
+            except Exception as e:
+                logging.warning(f"Consumer: Failed to handle a rejected message {e!r}")
+
+    @staticmethod
+    async def _settle(outcome: Awaitable[None]) -> None:
+        # The channel may be gone, the broker then redelivers the message
+        try:
+            await outcome
+        except Exception as e:
+            logging.warning(f"Consumer: Failed to settle a message {e!r}")
@@ -1,5 +1,21 @@
 import base64
+import hashlib
+
+# Text cache keys are a fixed-length digest of the text, prefixed with the
+# version of the scheme so it can change without clashing with older keys.
+TEXT_KEY_PREFIX = "text:v2:"
 
 
 def encode_text(input_text: str) -> str:
+    """
+    Legacy (v1) text cache key, the whole text base64-encoded.
+    """
     return base64.b64encode(input_text.encode("utf-8")).decode("utf-8")
+
+
+def text_cache_key(input_text: str) -> str:
+    return TEXT_KEY_PREFIX + hashlib.sha256(input_text.encode("utf-8")).hexdigest()
+
+
+def is_text_cache_key(key: str | None) -> bool:
+    return bool(key) and key.startswith(TEXT_KEY_PREFIX)
@@ -9,17 +9,26 @@ import aio_pika
 from PIL import ImageFile, Image
 from pusher import pusher
 from redis.asyncio import Redis
-from sqlalchemy import select
+from redis.exceptions import RedisError
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from _config import config
+from libs.publisher import Publisher
+from libs.consumer import Consumer
+from libs.notifier import Notifier
+from libs.tiered_cache import TieredCache
 from models.retry_job import RetryJobModel
 from models.text_cache import TextCacheModel
 from schemas.message import MessageSchema
 from models.image_cache import ImageCacheModel
-from misc.utils.encoder import encode_text
-from services import ocr_service, gcp_service
+from misc.utils.cpu import available_cpus
+from misc.utils.encoder import encode_text, text_cache_key
+from services import ocr_service, gcp_service, inflight_service, job_service
+from services.job_service import JobEvent, JobStage
+from services.ocr_pool import ocr_pool
+from services.storage_client import create_backend, storage_client
 
 import sentry_sdk
 
@@ -43,6 +52,32 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+redis = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, decode_responses=True)
+
+notifier = Notifier(
+    client=pusher.Pusher(
+        app_id=config.PUSHER_APP_ID,
+        key=config.PUSHER_KEY,
+        secret=config.PUSHER_SECRET,
+        cluster=config.PUSHER_CLUSTER,
+        ssl=True,
+    ),
+    redis=redis,
+    batch_size=config.PUSHER_BATCH_SIZE,
+    batch_delay=config.PUSHER_BATCH_DELAY,
+    max_queued=config.PUSHER_MAX_QUEUED,
+    max_retries=config.PUSHER_MAX_RETRIES,
+    retry_delay=config.PUSHER_RETRY_DELAY,
+    replay_interval=config.PUSHER_REPLAY_INTERVAL,
+)
+
+publisher = Publisher(
+    url=config.RABBITMQ_CONNECTION,
+    channels=config.RABBITMQ_PUBLISHER_CHANNELS,
+    max_buffered=config.RABBITMQ_PUBLISHER_BUFFER,
+    publish_timeout=config.RABBITMQ_PUBLISH_TIMEOUT,
+)
+
 
 # Dependency to get the session
 async def get_db_session():
@@ -54,55 +89,82 @@ PHASE = 1
 
 
 async def check_if_text_cached(
-    input_text: str, redis: Redis, image_hash: str, session: AsyncSession
+    input_text: str,
+    image_hash: str,
+    session: AsyncSession,
+    text_cache: TieredCache,
+    image_cache: TieredCache,
 ) -> tuple[str | None, str]:
-    encoded_text = encode_text(input_text=input_text)
-    # Check if the text is already cached in Redis
-    cached_text = await redis.get(encoded_text)
-    if cached_text:
-        logging.info(f"Text is already cached in Redis: {cached_text}")
-        await handle_add_new_cache(
-            image_hash=image_hash,
-            pdf_url=cached_text,
-            redis=redis,
+    text_key = text_cache_key(input_text=input_text)
+    # Check if the text is already cached, in memory, Redis or the database
+    cached_pdf_url = await text_cache.get(text_key, session=session)
+    if not cached_pdf_url and config.TEXT_CACHE_LEGACY_READ:
+        cached_pdf_url = await get_legacy_cached_pdf_url(
+            input_text=input_text,
+            text_key=text_key,
             session=session,
+            text_cache=text_cache,
         )
-        return cached_text, encoded_text
-    else:
-        cached_text_record = await get_cached_image(
-            session=session, input_text=encoded_text
-        )
-        if cached_text_record:
-            await redis.set(encoded_text, cached_text_record.pdf_url)
-            await handle_add_new_cache(
-                image_hash=image_hash,
-                pdf_url=cached_text_record.pdf_url,
-                redis=redis,
-                session=session,
+
+    if cached_pdf_url:
+        logging.info(f"Text is already cached: {cached_pdf_url}")
+        await image_cache.set(image_hash, cached_pdf_url, session=session)
+        return cached_pdf_url, text_key
+
+    return None, text_key
+
+
+async def get_legacy_cached_pdf_url(
+    input_text: str, text_key: str, session: AsyncSession, text_cache: TieredCache
+) -> str | None:
+    """
+    Look the text up under its legacy base64 key, in Redis then in MySQL,
+    giving the entry its digest key when found so it's found directly next
+    time.
+    """
+    text_encode = encode_text(input_text=input_text)
+    pdf_url = await text_cache.redis.get(text_encode)
+    if not pdf_url:
+        stmt = select(TextCacheModel.id, TextCacheModel.pdf_url)
+        stmt = stmt.where(TextCacheModel.text_encode == text_encode)
+        stmt = stmt.where(TextCacheModel.text_key.is_(None))
+        stmt = stmt.where(TextCacheModel.is_deleted.is_(False))
+        row = (await session.execute(stmt)).first()
+        if row is not None:
+            row_id, pdf_url = row
+            await session.execute(
+                update(TextCacheModel)
+                .where(TextCacheModel.id == row_id)
+                .values(text_key=text_key)
             )
-            return cached_text_record.pdf_url, encoded_text
+            await session.commit()
 
-    return None, encoded_text
+    if pdf_url:
+        await text_cache.set(text_key, pdf_url)
+    return pdf_url
 
 
-async def get_cached_image(
-    session: AsyncSession, input_text: str
-) -> TextCacheModel | None:
-    stmt = select(TextCacheModel).where(TextCacheModel.text_encode == input_text)
+async def get_cached_pdf_urls(
+    session: AsyncSession, text_keys: list[str]
+) -> dict[str, str]:
+    stmt = select(TextCacheModel.text_key, TextCacheModel.pdf_url)
+    stmt = stmt.where(TextCacheModel.text_key.in_(text_keys))
     stmt = stmt.where(TextCacheModel.is_deleted.is_(False))
     result = await session.execute(stmt)
-    return result.scalars().first()
-
-
-async def handle_add_new_cache(
-    image_hash: str, pdf_url: str, redis: Redis, session: AsyncSession
-):
-    await redis.set(image_hash, pdf_url)
-    try:
-        session.add(ImageCacheModel(**{"hash_id": image_hash, "pdf_url": pdf_url}))
-        await session.commit()
-    except Exception:
-        pass
+    return {text_key: pdf_url for text_key, pdf_url in result.all()}
+
+
+async def handle_add_new_cache(session: AsyncSession, pdf_urls: dict[str, str]):
+    # The image may have been cached by another job in the meantime
+    stmt = insert(ImageCacheModel).prefix_with("IGNORE")
+    await session.execute(
+        stmt,
+        [
+            {"hash_id": image_hash, "pdf_url": pdf_url}
+            for image_hash, pdf_url in pdf_urls.items()
+        ],
+    )
+    await session.commit()
 
 
 async def create_retry_job(session: AsyncSession, data: dict) -> RetryJobModel:
@@ -113,17 +175,8 @@ async def create_retry_job(session: AsyncSession, data: dict) -> RetryJobModel:
 
 
 async def publish_message(message: str):
-    connection = await aio_pika.connect_robust(config.RABBITMQ_CONNECTION)
-    async with connection:
-        channel = await connection.channel(
-            publisher_confirms=True, on_return_raises=True
-        )
-        await channel.default_exchange.publish(
-            aio_pika.Message(body=message.encode()),
-            routing_key=config.RABBITMQ_QUEUE_OCR_TO_TRANSLATE,
-            mandatory=True,
-        )
-        logging.info(f"OCR: Published message {message} to RabbitMQ")
+    await publisher.publish(message, routing_key=config.RABBITMQ_QUEUE_OCR_TO_TRANSLATE)
+    logging.info(f"OCR: Published message {message} to RabbitMQ")
 
 
 async def get_failed_jobs(
@@ -152,25 +205,93 @@ async def _get_image(file_url: str, is_from_gcs: bool) -> ImageFile.ImageFile:
 
 
 async def send_pusher_message(job_uuid: str, pdf_url_cache: str) -> None:
-    pusher_client = pusher.Pusher(
-        app_id=config.PUSHER_APP_ID,
-        key=config.PUSHER_KEY,
-        secret=config.PUSHER_SECRET,
-        cluster=config.PUSHER_CLUSTER,
-        ssl=True,
+    """
+    Send the result of a job to its client, through Pusher and through the
+    gateways' job events.
+    """
+    # Sent in the background, see Notifier
+    notifier.notify(channel=job_uuid, event="message", data={"file_url": pdf_url_cache})
+    await job_service.publish_result(
+        redis=redis,
+        job_uuid=job_uuid,
+        pdf_url=pdf_url_cache,
+        ttl=config.JOB_TTL,
     )
 
-    message = {"file_url": pdf_url_cache}
-    EVENT_NAME = "message"
-    pusher_client.trigger(job_uuid, EVENT_NAME, message)
 
-
-async def handle_retry_flow(session: AsyncSession, redis: Redis, job_ids: list[int]):
+async def record_job(job_uuid: str, event: str, **kwargs) -> None:
+    # The job's state is only informative, failing to record it mustn't fail
+    # the job
+    try:
+        await job_service.record(
+            redis=redis,
+            job_uuid=job_uuid,
+            stage=JobStage.OCR,
+            event=event,
+            ttl=config.JOB_TTL,
+            **kwargs,
+        )
+    except RedisError as e:
+        logging.warning(f"OCR: Failed to record the state of job {job_uuid} {e}")
+
+
+async def notify_subscribers(redis: Redis, image_hash: str, pdf_url: str) -> None:
+    """
+    Release the image's in-flight job and send its result to every request
+    that was attached to it.
+    """
+    subscribers = await inflight_service.release(redis=redis, image_hash=image_hash)
+    for job_uuid in subscribers:
+        await send_pusher_message(job_uuid=job_uuid, pdf_url_cache=pdf_url)
+
+
+async def fail_subscribers(image_hash: str, error: str) -> None:
+    """
+    Release the image's in-flight job after it failed, and fail every
+    request that was attached to it instead of leaving it waiting.
+    """
+    # Like the job's state, this mustn't hide the failure being handled
+    try:
+        subscribers = await inflight_service.fail(
+            redis=redis,
+            image_hash=image_hash,
+            stage=JobStage.OCR,
+            error=error,
+            ttl=config.JOB_TTL,
+        )
+    except RedisError as e:
+        logging.warning(f"OCR: Failed to release the job of image {image_hash} {e}")
+        return
+    for job_uuid in subscribers:
+        # Sent in the background, see Notifier
+        notifier.notify(channel=job_uuid, event="failed", data={"error": error})
+
+
+async def handle_rejected_message(message: aio_pika.IncomingMessage, error: str):
+    """
+    Fail the job of a message dead-lettered by the consumer, and its
+    subscribers.
+    """
+    data = json.loads(message.body.decode())
+    # A retried job released its image when it first failed
+    if not data.get("job_ids"):
+        await record_job(job_uuid=data["job_uuid"], event=JobEvent.FAILED, error=error)
+        await fail_subscribers(image_hash=data["image_hash"], error=error)
+
+
+async def handle_retry_flow(
+    session: AsyncSession,
+    redis: Redis,
+    job_ids: list[int],
+    text_cache: TieredCache,
+    image_cache: TieredCache,
+):
     NEXT_PHASE = 2
     failed_jobs = await get_failed_jobs(session=session, job_ids=job_ids)
     if failed_jobs:
         for job in failed_jobs:
             try:
+                await record_job(job_uuid=job.job_uuid, event=JobEvent.STARTED)
                 image = await _get_image(
                     file_url=job.file_url, is_from_gcs=job.is_file_from_gcs
                 )
@@ -178,58 +299,94 @@ async def handle_retry_flow(session: AsyncSession, redis: Redis, job_ids: list[i
 
                 cached_pdf_url, encoded_text = await check_if_text_cached(
                     input_text=text,
-                    redis=redis,
                     image_hash=job.image_hash,
                     session=session,
+                    text_cache=text_cache,
+                    image_cache=image_cache,
                 )
                 if cached_pdf_url:
                     await send_pusher_message(
                         job_uuid=job.job_uuid, pdf_url_cache=cached_pdf_url
                     )
+                    await notify_subscribers(
+                        redis=redis, image_hash=job.image_hash, pdf_url=cached_pdf_url
+                    )
                     job.is_deleted = True
 
                 else:
                     job.text_to_translate = text
                     job.encoded_text = encoded_text
                     job.step = NEXT_PHASE
+                    await record_job(
+                        job_uuid=job.job_uuid,
+                        event=JobEvent.FINISHED,
+                        next_stage=JobStage.TRANSLATION,
+                    )
 
-            except NotImplementedError:
+            except NotImplementedError as e:
                 job.is_deleted = True
+                await record_job(
+                    job_uuid=job.job_uuid, event=JobEvent.FAILED, error=str(e)
+                )
 
             except Exception as e:
                 job.job_metadata = json.dumps(
                     {"error": str(e), "trace": traceback.format_exc()}
                 )
+                await record_job(
+                    job_uuid=job.job_uuid, event=JobEvent.FAILED, error=str(e)
+                )
 
     await session.commit()
 
 
-async def handle_normal_flow(session: AsyncSession, data: dict, redis: Redis):
+async def handle_normal_flow(
+    session: AsyncSession,
+    data: dict,
+    redis: Redis,
+    text_cache: TieredCache,
+    image_cache: TieredCache,
+):
     data = MessageSchema(**data)
     logging.info(
         f"OCR: Received message from RabbitMQ, processing content {str(data.model_dump())}"
     )
     try:
+        await record_job(job_uuid=data.job_uuid, event=JobEvent.STARTED)
         image = await _get_image(
             file_url=data.file_url, is_from_gcs=data.is_file_from_gcs
         )
         text = await ocr_service.image_to_text(image=image)
 
         cached_pdf_url, encoded_text = await check_if_text_cached(
-            input_text=text, redis=redis, image_hash=data.image_hash, session=session
+            input_text=text,
+            image_hash=data.image_hash,
+            session=session,
+            text_cache=text_cache,
+            image_cache=image_cache,
         )
         if cached_pdf_url:
             await send_pusher_message(
                 job_uuid=data.job_uuid, pdf_url_cache=cached_pdf_url
             )
+            await notify_subscribers(
+                redis=redis, image_hash=data.image_hash, pdf_url=cached_pdf_url
+            )
         else:
             # publish the result to RabbitMQ
             data.encoded_text = encoded_text
             data.text_to_translate = text
+            # Recorded first, the translation may start as soon as it's published
+            await record_job(
+                job_uuid=data.job_uuid,
+                event=JobEvent.FINISHED,
+                next_stage=JobStage.TRANSLATION,
+            )
             await publish_message(message=json.dumps(data.model_dump()))
 
-    except NotImplementedError:
-        pass
+    except NotImplementedError as e:
+        await record_job(job_uuid=data.job_uuid, event=JobEvent.FAILED, error=str(e))
+        await fail_subscribers(image_hash=data.image_hash, error=str(e))
     except Exception as e:
         await create_retry_job(
             session=session,
@@ -244,32 +401,103 @@ async def handle_normal_flow(session: AsyncSession, data: dict, redis: Redis):
                 "job_uuid": data.job_uuid,
             },
         )
+        await record_job(job_uuid=data.job_uuid, event=JobEvent.FAILED, error=str(e))
+        await fail_subscribers(image_hash=data.image_hash, error=str(e))
 
 
-async def handle_message(message: aio_pika.IncomingMessage, redis: Redis):
-    async with message.process():
-        data = message.body.decode()
-        data = json.loads(data)
-        async for session in get_db_session():
-            if not (job_ids := data.get("job_ids")):
-                await handle_normal_flow(data=data, redis=redis, session=session)
-            else:
-                await handle_retry_flow(redis=redis, session=session, job_ids=job_ids)
+async def handle_message(
+    message: aio_pika.IncomingMessage,
+    redis: Redis,
+    text_cache: TieredCache,
+    image_cache: TieredCache,
+):
+    data = message.body.decode()
+    data = json.loads(data)
+    async for session in get_db_session():
+        if not (job_ids := data.get("job_ids")):
+            await handle_normal_flow(
+                data=data,
+                redis=redis,
+                session=session,
+                text_cache=text_cache,
+                image_cache=image_cache,
+            )
+        else:
+            await handle_retry_flow(
+                redis=redis,
+                session=session,
+                job_ids=job_ids,
+                text_cache=text_cache,
+                image_cache=image_cache,
+            )
 
 
 async def main():
-    redis = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, decode_responses=True)
+    # Fork the OCR workers before any connection is opened
+    await ocr_pool.start(
+        max_workers=config.OCR_POOL_WORKERS or available_cpus(),
+        task_timeout=config.OCR_TASK_TIMEOUT,
+        max_pending=config.OCR_MAX_PENDING,
+        engine=config.OCR_ENGINE,
+        lang=config.OCR_LANG,
+        tessdata_path=config.OCR_TESSDATA_PATH,
+    )
 
-    connection = await aio_pika.connect_robust(config.RABBITMQ_CONNECTION)
-    channel = await connection.channel(publisher_confirms=True, on_return_raises=True)
-    queue = await channel.declare_queue(
-        config.RABBITMQ_QUEUE_GATEWAY_TO_OCR, durable=True
+    await storage_client.start(
+        backend=create_backend(
+            config.STORAGE_BACKEND,
+            local_root=config.STORAGE_LOCAL_ROOT,
+            connection_limit=config.GCS_CONNECTION_LIMIT,
+            limit_per_host=config.GCS_CONNECTION_LIMIT_PER_HOST,
+            dns_cache_ttl=config.GCS_DNS_CACHE_TTL,
+            keepalive_timeout=config.GCS_KEEPALIVE_TIMEOUT,
+            download_timeout=config.GCS_DOWNLOAD_TIMEOUT,
+        ),
+        max_download_size=config.GCS_MAX_DOWNLOAD_SIZE,
     )
 
-    handler = partial(handle_message, redis=redis)
-    await queue.consume(handler)
+    # text key -> pdf url
+    text_cache = TieredCache(
+        name="text_cache",
+        redis=redis,
+        loader=get_cached_pdf_urls,
+        local_maxsize=config.CACHE_LOCAL_MAXSIZE,
+        local_ttl=config.CACHE_LOCAL_TTL,
+    )
+    # image hash -> pdf url
+    image_cache = TieredCache(
+        name="image_cache",
+        redis=redis,
+        writer=handle_add_new_cache,
+        local_maxsize=config.CACHE_LOCAL_MAXSIZE,
+        local_ttl=config.CACHE_LOCAL_TTL,
+    )
+    await text_cache.start()
+    await image_cache.start()
+    await publisher.start()
+    await notifier.start()
+
+    consumer = Consumer(
+        url=config.RABBITMQ_CONNECTION,
+        queue_name=config.RABBITMQ_QUEUE_GATEWAY_TO_OCR,
+        handler=partial(
+            handle_message, redis=redis, text_cache=text_cache, image_cache=image_cache
+        ),
+        concurrency=config.WORKER_CONCURRENCY or ocr_pool.max_workers * 2,
+        prefetch_count=config.RABBITMQ_PREFETCH_COUNT,
+        message_timeout=config.WORKER_MESSAGE_TIMEOUT,
+        on_reject=handle_rejected_message,
+    )
 
-    await asyncio.Future()  # keep the script alive
+    try:
+        await consumer.run()
+    finally:
+        await publisher.close()
+        await notifier.close()
+        await storage_client.close()
+        await text_cache.close()
+        await image_cache.close()
+        await ocr_pool.close()
 
 
 if __name__ == "__main__":
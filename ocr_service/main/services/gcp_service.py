@@ -1,4 +1,4 @@
-import aiohttp
+from .storage_client import storage_client
 
 
 async def download_image_from_gcs_to_memory(public_url: str) -> bytes:
@@ -10,13 +10,4 @@ async def download_image_from_gcs_to_memory(public_url: str) -> bytes:
     :return: Image content as bytes
     :raises: Exception if file is not an image
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(public_url) as response:
-            if response.status != 200:
-                raise IOError("Failed to download file")
-
-            # content_type = response.headers.get("Content-Type", "")
-            # if not content_type.startswith("image/"):
-            #     raise NotImplementedError("File is not an image")
-
-            return await response.read()
+    return await storage_client.download(public_url)
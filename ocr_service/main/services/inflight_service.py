@@ -0,0 +1,65 @@
+from redis.asyncio import Redis
+
+from . import job_service
+from .job_service import JobEvent
+
+# Registry of the images currently in flight, filled by the gateway: the
+# first request for an image holds the lease, the following ones wait in the
+# subscribers set for the result of that job.
+INFLIGHT_KEY = "inflight:{image_hash}"
+SUBSCRIBERS_KEY = "inflight:{image_hash}:subscribers"
+
+_RELEASE_SCRIPT = """
+local subscribers = redis.call('SMEMBERS', KEYS[2])
+redis.call('DEL', KEYS[1], KEYS[2])
+return subscribers
+"""
+
+
+async def release(redis: Redis, image_hash: str) -> list[str]:
+    """
+    Mark the job of an image as finished.
+
+    :param redis: Redis connection
+    :param image_hash: Hash of the image
+    :return: Jobs that were waiting for the result and must be notified
+    """
+    script = redis.register_script(_RELEASE_SCRIPT)
+    return await script(
+        keys=[
+            INFLIGHT_KEY.format(image_hash=image_hash),
+            SUBSCRIBERS_KEY.format(image_hash=image_hash),
+        ]
+    )
+
+
+async def fail(
+    redis: Redis,
+    image_hash: str,
+    stage: str,
+    error: str,
+    ttl: int = job_service.JOB_TTL,
+) -> list[str]:
+    """
+    Release the job of an image that failed, and mark every request that
+    was attached to it as failed too, instead of leaving them waiting for
+    a result until the lease expires.
+
+    :param redis: Redis connection
+    :param image_hash: Hash of the image
+    :param stage: Stage the job failed in, one of JobStage
+    :param error: Why it failed
+    :param ttl: Seconds the failed jobs' state is kept
+    :return: Jobs that were waiting for the result
+    """
+    subscribers = await release(redis=redis, image_hash=image_hash)
+    for job_uuid in subscribers:
+        await job_service.record(
+            redis=redis,
+            job_uuid=job_uuid,
+            stage=stage,
+            event=JobEvent.FAILED,
+            error=error,
+            ttl=ttl,
+        )
+    return subscribers
@@ -0,0 +1,104 @@
+import logging
+from abc import ABC, abstractmethod
+
+import pytesseract
+from PIL import Image
+
+
+class OCREngine(ABC):
+    name: str
+    # Whether image_to_text stops by itself once its timeout is hit
+    enforces_timeout: bool = True
+
+    @abstractmethod
+    def image_to_text(self, image: Image.Image, timeout: float = 0) -> str:
+        """
+        Convert an image to text.
+
+        :param image: Image to recognize
+        :param timeout: Seconds allowed for the image, 0 means no limit
+        """
+
+    def close(self) -> None:
+        pass
+
+
+class PytesseractEngine(OCREngine):
+    """
+    Runs the tesseract binary once per image: the image goes through a temp
+    file and the traineddata is reloaded every time.
+    """
+
+    name = "pytesseract"
+
+    def __init__(self, lang: str = "eng", tessdata_path: str | None = None):
+        self.lang = lang
+        self.config = f'--tessdata-dir "{tessdata_path}"' if tessdata_path else ""
+
+    def image_to_text(self, image: Image.Image, timeout: float = 0) -> str:
+        # pytesseract kills the tesseract subprocess itself once timeout is hit
+        return pytesseract.image_to_string(
+            image, lang=self.lang, config=self.config, timeout=timeout
+        )
+
+
+class TesserocrEngine(OCREngine):
+    """
+    Keeps one initialized tesseract API handle alive and passes images to it
+    in memory, with no temp files or fork/exec per image.
+
+    The handle isn't thread safe, so there should be one engine per process.
+    The timeout is ignored: a recognition can't be interrupted from here, so
+    it's up to the caller to kill the process once it's hit (see
+    ``OCRProcessPool``).
+    """
+
+    name = "tesserocr"
+    enforces_timeout = False
+
+    def __init__(self, lang: str = "eng", tessdata_path: str | None = None):
+        import tesserocr
+
+        kwargs = {"lang": lang}
+        if tessdata_path:
+            kwargs["path"] = tessdata_path
+        self._api = tesserocr.PyTessBaseAPI(**kwargs)
+
+    def image_to_text(self, image: Image.Image, timeout: float = 0) -> str:
+        self._api.SetImage(image)
+        try:
+            return self._api.GetUTF8Text()
+        finally:
+            self._api.Clear()
+
+    def close(self) -> None:
+        self._api.End()
+
+
+ENGINES: dict[str, type[OCREngine]] = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+}
+
+
+def create_engine(
+    name: str, lang: str = "eng", tessdata_path: str | None = None
+) -> OCREngine:
+    """
+    Create the OCR engine registered under ``name``.
+
+    Falls back to pytesseract if the engine is unknown or can't be
+    initialized, e.g. tesserocr is not installed.
+    """
+    engine_class = ENGINES.get(name)
+    if engine_class is None:
+        logging.warning(f"OCR: Unknown engine {name}, falling back to pytesseract")
+        engine_class = PytesseractEngine
+
+    try:
+        return engine_class(lang=lang, tessdata_path=tessdata_path)
+    except (ImportError, RuntimeError) as e:
+        if engine_class is PytesseractEngine:
+            raise
+        logging.warning(f"OCR: Can't start {name} engine ({e}), using pytesseract")
+        return PytesseractEngine(lang=lang, tessdata_path=tessdata_path)
@@ -0,0 +1,96 @@
+import os
+
+from PIL import Image
+
+from .ocr_engines import ENGINES, OCREngine, PytesseractEngine, create_engine
+from .process_pool import WarmProcessPool
+
+# Extra time given to a worker after the tesseract timeout before the
+# worker process itself is considered hung and gets killed, for engines
+# stopping by themselves at the timeout. The others are killed right away.
+KILL_GRACE_SECONDS = 5
+
+# Engine of the current worker process, set up by _init_worker
+_engine: OCREngine | None = None
+
+
+def _init_worker(engine: str, lang: str, tessdata_path: str | None) -> None:
+    global _engine
+    _engine = create_engine(name=engine, lang=lang, tessdata_path=tessdata_path)
+
+
+def _warm_up() -> int:
+    """
+    Runs once in every worker so the first real job doesn't pay for
+    starting the process and loading the engine.
+    """
+    _engine.image_to_text(Image.new("L", (32, 32), color=255))
+    return os.getpid()
+
+
+def _image_to_text(image: Image.Image, timeout: float) -> str:
+    return _engine.image_to_text(image, timeout=timeout)
+
+
+def get_kill_grace(engine: str) -> float:
+    """
+    Seconds a job of the engine may run past the task timeout before its
+    worker is killed.
+    """
+    if ENGINES.get(engine, PytesseractEngine).enforces_timeout:
+        return KILL_GRACE_SECONDS
+    return 0
+
+
+class OCRProcessPool(WarmProcessPool):
+    """
+    Pool of pre-started worker processes running OCR off the event loop,
+    each keeping its own OCR engine loaded.
+    """
+
+    def __init__(self):
+        super().__init__(
+            name="OCR",
+            initializer=_init_worker,
+            warm_up=_warm_up,
+            task_timeout=30.0,
+            kill_grace=KILL_GRACE_SECONDS,
+        )
+
+    async def start(
+        self,
+        max_workers: int,
+        task_timeout: float,
+        max_pending: int = 0,
+        engine: str = "pytesseract",
+        lang: str = "eng",
+        tessdata_path: str | None = None,
+    ) -> None:
+        """
+        Start and warm up the worker processes.
+
+        :param max_workers: Number of worker processes
+        :param task_timeout: Seconds allowed for a single image
+        :param max_pending: Max images queued or running, defaults to 2 per worker
+        :param engine: Name of the OCR engine each worker keeps loaded
+        :param lang: Tesseract language
+        :param tessdata_path: Directory of the traineddata files, if not the default
+        """
+        self.kill_grace = get_kill_grace(engine)
+        await super().start(
+            max_workers=max_workers,
+            task_timeout=task_timeout,
+            max_pending=max_pending,
+            initargs=(engine, lang, tessdata_path),
+        )
+
+    async def image_to_text(self, image: Image.Image) -> str:
+        """
+        Run OCR on the image in one of the worker processes.
+
+        :raises TimeoutError: if the image took longer than the task timeout
+        """
+        return await self.run(_image_to_text, image, self.task_timeout)
+
+
+ocr_pool = OCRProcessPool()
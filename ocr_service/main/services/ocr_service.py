@@ -1,13 +1,22 @@
-import pytesseract
+import asyncio
+
 from PIL import ImageFile
 
+from .ocr_engines import PytesseractEngine
+from .ocr_pool import ocr_pool
+
+# Used when the process pool is not started, safe to share between threads
+_fallback_engine = PytesseractEngine()
+
 
 async def image_to_text(image: ImageFile.ImageFile) -> str:
     """
     Convert an image to text using OCR.
-    """
 
-    # Use pytesseract to do OCR on the image
-    text = pytesseract.image_to_string(image)
+    Runs in the OCR process pool when it's started, otherwise in a thread,
+    so the event loop is never blocked by tesseract.
+    """
+    if ocr_pool.is_running:
+        return await ocr_pool.image_to_text(image=image)
 
-    return text
+    return await asyncio.to_thread(_fallback_engine.image_to_text, image)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+
+class WarmProcessPool:
+    """
+    Pool of pre-started worker processes running jobs off the event loop.
+
+    Every worker is set up by ``initializer`` and runs ``warm_up`` once when
+    the pool starts, so the first real job doesn't pay for either.
+
+    Submissions are bounded by ``max_pending``: once that many jobs are
+    queued or running, callers wait for a free slot instead of piling more
+    jobs into memory. A job that outlives its timeout gets the whole pool
+    killed and re-created, so a hung worker can't hold a slot forever.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initializer: Callable[..., None],
+        warm_up: Callable[[], Any],
+        task_timeout: float = 30.0,
+        kill_grace: float = 0,
+    ):
+        """
+        :param name: Name of the pool in logs and errors
+        :param initializer: Sets a worker process up, given ``initargs``
+        :param warm_up: Runs once in every worker when the pool starts
+        :param task_timeout: Seconds allowed for a single job
+        :param kill_grace: Extra seconds given to a job with a timeout of its
+            own before its worker is considered hung
+        """
+        self.name = name
+        self.initializer = initializer
+        self.warm_up = warm_up
+        self.task_timeout = task_timeout
+        self.kill_grace = kill_grace
+        self.max_workers = 1
+        self.initargs: tuple = ()
+
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._restart_lock = asyncio.Lock()
+        self._generation = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    async def start(
+        self,
+        max_workers: int,
+        task_timeout: float,
+        max_pending: int = 0,
+        initargs: tuple = (),
+    ) -> None:
+        """
+        Start and warm up the worker processes.
+
+        Must be called before any broker/database connection is opened,
+        since workers are forked from the current process.
+
+        :param max_workers: Number of worker processes
+        :param task_timeout: Seconds allowed for a single job
+        :param max_pending: Max jobs queued or running, defaults to 2 per worker
+        :param initargs: Arguments of the initializer
+        """
+        self.max_workers = max_workers
+        self.task_timeout = task_timeout
+        self.initargs = initargs
+        self._slots = asyncio.Semaphore(max_pending or max_workers * 2)
+
+        await self._spawn()
+        logging.info(f"{self.name}: Started process pool with {max_workers} workers")
+
+    async def _spawn(self) -> None:
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=self.initializer,
+            initargs=self.initargs,
+        )
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *[
+                loop.run_in_executor(self._executor, self.warm_up)
+                for _ in range(self.max_workers)
+            ]
+        )
+
+    def _kill(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+
+        # ProcessPoolExecutor can't cancel a running task, so kill the processes
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _restart(self, generation: int) -> None:
+        async with self._restart_lock:
+            # Another caller already replaced the pool this job ran on
+            if generation != self._generation:
+                return
+
+            self._generation += 1
+            self._kill()
+            await self._spawn()
+            logging.warning(f"{self.name}: Process pool restarted")
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run a job in one of the worker processes.
+
+        :param func: Module-level function, so it can be sent to the workers
+        :raises TimeoutError: if the job took longer than the task timeout
+        """
+        if not self.is_running:
+            raise RuntimeError(f"{self.name} process pool is not started")
+
+        async with self._slots:
+            generation = self._generation
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, func, *args)
+
+            try:
+                return await asyncio.wait_for(
+                    future, timeout=self.task_timeout + self.kill_grace
+                )
+            except asyncio.TimeoutError:
+                logging.error(
+                    f"{self.name}: Worker hung for more than {self.task_timeout}s"
+                )
+                await self._restart(generation)
+                raise TimeoutError(f"{self.name} took more than {self.task_timeout}s")
+            except BrokenProcessPool:
+                logging.error(f"{self.name}: Worker process died unexpectedly")
+                await self._restart(generation)
+                raise
+
+    async def close(self) -> None:
+        self._kill()
@@ -0,0 +1,66 @@
+import shutil
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from main.services import ocr_engines
+from main.services.ocr_engines import (
+    PytesseractEngine,
+    TesserocrEngine,
+    create_engine,
+)
+from main.services.ocr_pool import KILL_GRACE_SECONDS, get_kill_grace
+
+TEXT = "The quick brown fox\njumps over the lazy dog"
+
+needs_tesseract = pytest.mark.skipif(
+    shutil.which("tesseract") is None, reason="tesseract is not installed"
+)
+
+
+def _text_image() -> Image.Image:
+    image = Image.new("L", (900, 200), color=255)
+    draw = ImageDraw.Draw(image)
+    draw.multiline_text(
+        (30, 30), TEXT, fill=0, font=ImageFont.load_default(size=48), spacing=20
+    )
+    return image
+
+
+def test_create_engine_falls_back_to_pytesseract_for_unknown_engines():
+    assert isinstance(create_engine("unknown"), PytesseractEngine)
+
+
+def test_create_engine_falls_back_to_pytesseract_without_tesserocr(monkeypatch):
+    def missing(**kwargs):
+        raise ImportError("No module named 'tesserocr'")
+
+    monkeypatch.setitem(ocr_engines.ENGINES, "tesserocr", missing)
+
+    assert isinstance(create_engine("tesserocr"), PytesseractEngine)
+
+
+def test_workers_of_engines_ignoring_the_timeout_are_killed_right_away():
+    assert get_kill_grace("pytesseract") == KILL_GRACE_SECONDS
+    assert get_kill_grace("tesserocr") == 0
+    assert get_kill_grace("unknown") == KILL_GRACE_SECONDS
+
+
+@needs_tesseract
+def test_pytesseract_engine_reads_text():
+    text = PytesseractEngine().image_to_text(_text_image())
+
+    assert text.split() == TEXT.split()
+
+
+@needs_tesseract
+def test_engines_read_the_same_text():
+    pytest.importorskip("tesserocr")
+    image = _text_image()
+    engine = TesserocrEngine()
+    try:
+        text = engine.image_to_text(image)
+    finally:
+        engine.close()
+
+    assert text.split() == PytesseractEngine().image_to_text(image).split()
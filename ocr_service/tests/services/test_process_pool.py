@@ -0,0 +1,103 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from main.services.process_pool import WarmProcessPool
+
+# Set up by _init_worker in every worker process
+_value: str | None = None
+
+
+def _init_worker(value: str) -> None:
+    global _value
+    _value = value
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def _get_value() -> str:
+    return _value
+
+
+def _get_pid() -> int:
+    return os.getpid()
+
+
+def _sleep(seconds: float) -> int:
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def _die() -> None:
+    os._exit(1)
+
+
+async def _start(
+    max_workers: int = 1, task_timeout: float = 5, max_pending: int = 0
+) -> WarmProcessPool:
+    pool = WarmProcessPool(name="Test", initializer=_init_worker, warm_up=_warm_up)
+    await pool.start(
+        max_workers=max_workers,
+        task_timeout=task_timeout,
+        max_pending=max_pending,
+        initargs=("ready",),
+    )
+    return pool
+
+
+async def test_pool_runs_jobs_in_initialized_workers():
+    pool = await _start()
+    try:
+        assert pool.is_running
+        assert await pool.run(_get_value) == "ready"
+        assert await pool.run(_get_pid) != os.getpid()
+    finally:
+        await pool.close()
+
+    assert not pool.is_running
+    with pytest.raises(RuntimeError):
+        await pool.run(_get_value)
+
+
+async def test_pool_kills_a_hung_worker_and_recovers():
+    pool = await _start(task_timeout=0.2)
+    try:
+        hung_pid = await pool.run(_get_pid)
+        with pytest.raises(TimeoutError):
+            await pool.run(_sleep, 30)
+
+        # The pool was re-created, with a new initialized worker
+        assert pool.is_running
+        assert await pool.run(_get_value) == "ready"
+        assert await pool.run(_get_pid) != hung_pid
+    finally:
+        await pool.close()
+
+
+async def test_pool_recovers_from_a_dead_worker():
+    pool = await _start()
+    try:
+        with pytest.raises(BrokenProcessPool):
+            await pool.run(_die)
+
+        assert await pool.run(_get_value) == "ready"
+    finally:
+        await pool.close()
+
+
+async def test_pool_bounds_the_pending_jobs():
+    pool = await _start(max_workers=2, max_pending=1)
+    try:
+        started = time.monotonic()
+        await asyncio.gather(pool.run(_sleep, 0.2), pool.run(_sleep, 0.2))
+        elapsed = time.monotonic() - started
+    finally:
+        await pool.close()
+
+    # Two workers, but only one job at a time was let through
+    assert elapsed >= 0.4
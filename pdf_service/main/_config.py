@@ -16,6 +16,11 @@ class Config(BaseSettings):
     # RabbitMQ settings
     RABBITMQ_CONNECTION: str
     RABBITMQ_QUEUE_TRANSLATE_TO_PDF: str
+    # Consumer: messages handled at once, unacknowledged messages sent by
+    # the broker (0 means twice the concurrency), seconds allowed per message
+    WORKER_CONCURRENCY: int = 4
+    RABBITMQ_PREFETCH_COUNT: int = 0
+    WORKER_MESSAGE_TIMEOUT: float = 300
 
     model_config = SettingsConfigDict(
         case_sensitive=True,
@@ -27,13 +32,62 @@ class Config(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
 
+    # Process-local tier of the caches
+    CACHE_LOCAL_MAXSIZE: int = 10_000
+    CACHE_LOCAL_TTL: float = 300
+
     GCS_BUCKET_NAME: str
 
+    # Seconds a job's state and result are kept after its last update
+    JOB_TTL: int = 86400
+
+    # Object storage: "gcs", or "local" keeping the files under
+    # STORAGE_LOCAL_ROOT, for tests and benchmarks
+    STORAGE_BACKEND: str = "gcs"
+    STORAGE_LOCAL_ROOT: str = "storage"
+    # Storage client shared by the process: max connections open at once, in
+    # total and per host, seconds DNS lookups are cached and idle connections
+    # kept open, seconds allowed per download and per upload request, max
+    # bytes of a download, size in bytes above which PDFs are sent with a
+    # resumable upload
+    GCS_CONNECTION_LIMIT: int = 100
+    GCS_CONNECTION_LIMIT_PER_HOST: int = 32
+    GCS_DNS_CACHE_TTL: int = 300
+    GCS_KEEPALIVE_TIMEOUT: float = 30
+    GCS_DOWNLOAD_TIMEOUT: float = 30
+    GCS_UPLOAD_TIMEOUT: float = 60
+    GCS_MAX_DOWNLOAD_SIZE: int = 10 * 1024 * 1024
+    GCS_RESUMABLE_THRESHOLD: int = 5 * 1024 * 1024
+
+    # TrueType font of the PDFs, the bundled Roboto if not set
+    PDF_FONT_PATH: str | None = None
+    # Texts without markup are drawn straight on the canvas, with the same
+    # layout as platypus, several times faster
+    PDF_FAST_PATH: bool = True
+    # "thread" renders PDFs in threads of the worker, sharing one core,
+    # "process" in a pool of processes, one core each
+    PDF_RENDER_MODE: str = "thread"
+    # PDF process pool settings, 0 means derived from the container CPU quota
+    PDF_POOL_WORKERS: int = 0
+    PDF_TASK_TIMEOUT: float = 60.0
+    PDF_MAX_PENDING: int = 0
+
     # Pusher settings
     PUSHER_APP_ID: str
     PUSHER_KEY: str
     PUSHER_SECRET: str
     PUSHER_CLUSTER: str
+    # Notifications are sent in the background, in batches of at most
+    # PUSHER_BATCH_SIZE events (10 at most) waiting up to PUSHER_BATCH_DELAY
+    # seconds to fill up. A failed batch is retried PUSHER_MAX_RETRIES times
+    # with backoff, then kept in Redis and sent again every
+    # PUSHER_REPLAY_INTERVAL seconds
+    PUSHER_BATCH_SIZE: int = 10
+    PUSHER_BATCH_DELAY: float = 0.05
+    PUSHER_MAX_QUEUED: int = 10_000
+    PUSHER_MAX_RETRIES: int = 3
+    PUSHER_RETRY_DELAY: float = 0.5
+    PUSHER_REPLAY_INTERVAL: float = 30
 
     SENTRY_DSN: str
 
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import suppress
+from typing import Protocol
+
+from pusher.errors import PusherBadRequest
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+# Events that couldn't be delivered, sent again once the provider is back
+SPILL_KEY = "notifications:spill"
+
+# Most events Pusher accepts in a single batch call
+MAX_BATCH_SIZE = 10
+
+
+class BatchClient(Protocol):
+    def trigger_batch(self, batch: list[dict]) -> dict: ...
+
+
+class Notifier:
+    """
+    Sends events to the clients in the background, so callers only enqueue
+    them and never wait for the provider.
+
+    Queued events are sent in batches through one long-lived client. A batch
+    that keeps failing is retried with exponential backoff, then pushed to a
+    Redis list and sent again later by whichever replica gets to it first.
+    """
+
+    def __init__(
+        self,
+        client: BatchClient,
+        redis: Redis | None = None,
+        batch_size: int = MAX_BATCH_SIZE,
+        batch_delay: float = 0.05,
+        max_queued: int = 10_000,
+        max_retries: int = 3,
+        retry_delay: float = 0.5,
+        replay_interval: float = 30,
+        spill_key: str = SPILL_KEY,
+    ):
+        """
+        :param client: Provider client, e.g. ``pusher.Pusher``, whose blocking
+            calls are made in a thread
+        :param redis: Redis connection keeping the undelivered events, they
+            are dropped if None
+        :param batch_size: Max events sent in a single call
+        :param batch_delay: Seconds to wait for a batch to fill up
+        :param max_queued: Max events waiting to be sent, the next ones are
+            pushed to Redis straight away
+        :param max_retries: Retries of a failed batch before pushing it to Redis
+        :param retry_delay: Seconds before the first retry, doubled every time
+        :param replay_interval: Seconds between two looks at the events in Redis
+        """
+        self.client = client
+        self.redis = redis
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.batch_delay = batch_delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.replay_interval = replay_interval
+        self.spill_key = spill_key
+
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=max_queued)
+        self._sender: asyncio.Task | None = None
+        self._replayer: asyncio.Task | None = None
+        self._spills: set[asyncio.Task] = set()
+
+        self.stats = {
+            "events": 0,
+            "sent": 0,
+            "batches": 0,
+            "retries": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "dropped": 0,
+        }
+
+    def notify(self, channel: str, event: str, data: dict) -> None:
+        """
+        Queue an event, without waiting for it to be sent.
+        """
+        self.stats["events"] += 1
+        event = {"channel": channel, "name": event, "data": data}
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            task = asyncio.create_task(self._spill([event]))
+            self._spills.add(task)
+            task.add_done_callback(self._spills.discard)
+
+    async def start(self) -> None:
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_forever())
+        if self._replayer is None and self.redis is not None:
+            self._replayer = asyncio.create_task(self._replay_forever())
+
+    async def close(self, timeout: float = 5) -> None:
+        """
+        Stop sending, after giving the queued events ``timeout`` seconds to
+        go out. The ones still queued are pushed to Redis.
+        """
+        if self._replayer is not None:
+            self._replayer.cancel()
+            self._replayer = None
+
+        if self._sender is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._sender.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sender
+            self._sender = None
+
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+            self._queue.task_done()
+        await self._spill(remaining)
+        if self._spills:
+            await asyncio.gather(*self._spills)
+
+    async def _next_batch(self, batch: list[dict]) -> None:
+        batch.append(await self._queue.get())
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _send_forever(self) -> None:
+        while True:
+            batch = []
+            try:
+                await self._next_batch(batch)
+                if not await self._send(batch):
+                    await self._spill(batch)
+            except asyncio.CancelledError:
+                # Closing while the batch was on its way
+                await self._spill(batch)
+                raise
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send(self, batch: list[dict]) -> bool:
+        """
+        :return: True if the batch was delivered, or can't ever be
+        """
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                # The client encodes the events' data in place
+                await asyncio.to_thread(
+                    self.client.trigger_batch, [dict(event) for event in batch]
+                )
+            except (ValueError, PusherBadRequest) as e:
+                # Invalid event, e.g. too much data, retrying won't help
+                logging.error(f"Notifier: Dropped {len(batch)} events {e}")
+                self.stats["dropped"] += len(batch)
+                return True
+            except Exception as e:
+                logging.warning(f"Notifier: Failed to send {len(batch)} events {e}")
+            else:
+                self.stats["batches"] += 1
+                self.stats["sent"] += len(batch)
+                return True
+        return False
+
+    async def _spill(self, events: list[dict]) -> None:
+        if not events:
+            return
+        if self.redis is not None:
+            try:
+                await self.redis.rpush(
+                    self.spill_key, *(json.dumps(event) for event in events)
+                )
+                self.stats["spilled"] += len(events)
+                return
+            except RedisError as e:
+                logging.error(f"Notifier: Failed to keep events in Redis {e}")
+        logging.error(f"Notifier: Dropped {len(events)} events")
+        self.stats["dropped"] += len(events)
+
+    async def replay(self) -> int:
+        """
+        Send the events kept in Redis, until there are none left or the
+        provider fails again.
+
+        :return: Number of events sent
+        """
+        replayed = 0
+        while True:
+            values = await self.redis.lpop(self.spill_key, self.batch_size)
+            if not values:
+                return replayed
+
+            batch = [json.loads(value) for value in values]
+            if not await self._send(batch):
+                # Still down, back they go for the next replay
+                await self._spill(batch)
+                return replayed
+            replayed += len(batch)
+            self.stats["replayed"] += len(batch)
+
+    async def _replay_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            try:
+                if replayed := await self.replay():
+                    logging.info(f"Notifier: Sent {replayed} events kept in Redis")
+            except RedisError as e:
+                logging.error(f"Notifier: Failed to replay events {e}")
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "queued": self._queue.qsize()}
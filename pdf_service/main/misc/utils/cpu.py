@@ -0,0 +1,51 @@
+import math
+import os
+from pathlib import Path
+
+CGROUP_V2_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+CGROUP_V1_CPU_QUOTA = Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+CGROUP_V1_CPU_PERIOD = Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+
+
+def _read_cgroup_quota() -> float | None:
+    """
+    Read the CPU quota of the current container, in cores.
+
+    :return: Number of cores allowed by the cgroup, None if unlimited or unknown
+    """
+    try:
+        if CGROUP_V2_CPU_MAX.exists():
+            quota, period = CGROUP_V2_CPU_MAX.read_text().split()
+            if quota == "max":
+                return None
+            return int(quota) / int(period)
+
+        if CGROUP_V1_CPU_QUOTA.exists():
+            quota = int(CGROUP_V1_CPU_QUOTA.read_text())
+            period = int(CGROUP_V1_CPU_PERIOD.read_text())
+            if quota <= 0:
+                return None
+            return quota / period
+    except (OSError, ValueError):
+        return None
+
+    return None
+
+
+def available_cpus() -> int:
+    """
+    Number of CPUs this process may actually use.
+
+    Takes the CPU affinity mask and the container's cgroup CPU quota into
+    account, so a container limited to 0.5 CPU on a 16 core host gets 1.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = _read_cgroup_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+
+    return max(1, cpus)
@@ -1,4 +1,4 @@
-from sqlalchemy import Text
+from sqlalchemy import String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import BaseModel, TimestampMixin, DeleteMark
@@ -8,5 +8,8 @@ class TextCacheModel(BaseModel, TimestampMixin, DeleteMark):
     __tablename__ = "text_cache"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    text_encode: Mapped[str] = mapped_column(Text)
+    # Versioned digest of the text, see misc/utils/encoder.py
+    text_key: Mapped[str] = mapped_column(String(128), nullable=True, index=True)
+    # Legacy key, the whole text base64-encoded
+    text_encode: Mapped[str] = mapped_column(Text, nullable=True)
     pdf_url: Mapped[str] = mapped_column(Text)
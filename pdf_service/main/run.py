@@ -8,13 +8,22 @@ from pathlib import Path
 import aio_pika
 from pusher import pusher
 from redis.asyncio import Redis
-from sqlalchemy import select
+from redis.exceptions import RedisError
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from _config import config
+from libs.consumer import Consumer
+from libs.notifier import Notifier
+from libs.tiered_cache import TieredCache
+from misc.utils.cpu import available_cpus
+from misc.utils.encoder import is_text_cache_key, text_cache_key
 from schemas.message import MessageSchema
-from services import pdf_service, gcp_service
+from services import pdf_service, gcp_service, inflight_service, job_service
+from services.job_service import JobEvent, JobStage
+from services.pdf_pool import pdf_pool
+from services.storage_client import create_backend, storage_client
 from models.text_cache import TextCacheModel
 from models.image_cache import ImageCacheModel
 
@@ -42,6 +51,25 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+redis = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, decode_responses=True)
+
+notifier = Notifier(
+    client=pusher.Pusher(
+        app_id=config.PUSHER_APP_ID,
+        key=config.PUSHER_KEY,
+        secret=config.PUSHER_SECRET,
+        cluster=config.PUSHER_CLUSTER,
+        ssl=True,
+    ),
+    redis=redis,
+    batch_size=config.PUSHER_BATCH_SIZE,
+    batch_delay=config.PUSHER_BATCH_DELAY,
+    max_queued=config.PUSHER_MAX_QUEUED,
+    max_retries=config.PUSHER_MAX_RETRIES,
+    retry_delay=config.PUSHER_RETRY_DELAY,
+    replay_interval=config.PUSHER_REPLAY_INTERVAL,
+)
+
 
 async def get_db_session():
     async with AsyncSessionLocal() as session:
@@ -51,15 +79,44 @@ async def get_db_session():
 PHASE = 3
 
 
-async def save_to_cache(encoded_text: str, image_hash: str, pdf_url: str, redis: Redis):
-    async for session in get_db_session():
-        # Here you would save the PDF URL to your database
-        session.add(TextCacheModel(**{"pdf_url": pdf_url, "text_encode": encoded_text}))
-        session.add(ImageCacheModel(**{"pdf_url": pdf_url, "hash_id": image_hash}))
-        await session.commit()
+async def save_text_cache(session: AsyncSession, pdf_urls: dict[str, str]):
+    session.add_all(
+        TextCacheModel(text_key=text_key, pdf_url=pdf_url)
+        for text_key, pdf_url in pdf_urls.items()
+    )
+    await session.commit()
 
-        await redis.set(encoded_text, pdf_url)
-        await redis.set(image_hash, pdf_url)
+
+async def save_image_cache(session: AsyncSession, pdf_urls: dict[str, str]):
+    # The image may have been cached by another job in the meantime
+    stmt = insert(ImageCacheModel).prefix_with("IGNORE")
+    await session.execute(
+        stmt,
+        [
+            {"hash_id": image_hash, "pdf_url": pdf_url}
+            for image_hash, pdf_url in pdf_urls.items()
+        ],
+    )
+    await session.commit()
+
+
+async def save_to_cache(
+    encoded_text: str,
+    text_to_translate: str,
+    image_hash: str,
+    pdf_url: str,
+    text_cache: TieredCache,
+    image_cache: TieredCache,
+):
+    # Jobs queued before the digest keys still carry the legacy base64 key
+    if is_text_cache_key(encoded_text):
+        text_key = encoded_text
+    else:
+        text_key = text_cache_key(input_text=text_to_translate)
+
+    async for session in get_db_session():
+        await text_cache.set(text_key, pdf_url, session=session)
+        await image_cache.set(image_hash, pdf_url, session=session)
 
 
 async def create_retry_job(session: AsyncSession, data: dict) -> RetryJobModel:
@@ -70,33 +127,101 @@ async def create_retry_job(session: AsyncSession, data: dict) -> RetryJobModel:
 
 
 async def send_pusher_message(job_uuid: str, pdf_url_cache: str) -> None:
-    pusher_client = pusher.Pusher(
-        app_id=config.PUSHER_APP_ID,
-        key=config.PUSHER_KEY,
-        secret=config.PUSHER_SECRET,
-        cluster=config.PUSHER_CLUSTER,
-        ssl=True,
+    """
+    Send the result of a job to its client, through Pusher and through the
+    gateways' job events.
+    """
+    # Sent in the background, see Notifier
+    notifier.notify(channel=job_uuid, event="message", data={"file_url": pdf_url_cache})
+    await job_service.publish_result(
+        redis=redis,
+        job_uuid=job_uuid,
+        pdf_url=pdf_url_cache,
+        ttl=config.JOB_TTL,
     )
 
-    message = {"file_url": pdf_url_cache}
-    EVENT_NAME = "message"
-    pusher_client.trigger(job_uuid, EVENT_NAME, message)
-
 
-async def handle_normal_flow(session: AsyncSession, data: dict, redis: Redis):
+async def record_job(job_uuid: str, event: str, **kwargs) -> None:
+    # The job's state is only informative, failing to record it mustn't fail
+    # the job
+    try:
+        await job_service.record(
+            redis=redis,
+            job_uuid=job_uuid,
+            stage=JobStage.PDF,
+            event=event,
+            ttl=config.JOB_TTL,
+            **kwargs,
+        )
+    except RedisError as e:
+        logging.warning(f"PDF: Failed to record the state of job {job_uuid} {e}")
+
+
+async def notify_subscribers(redis: Redis, image_hash: str, pdf_url: str) -> None:
+    """
+    Release the image's in-flight job and send its result to every request
+    that was attached to it.
+    """
+    subscribers = await inflight_service.release(redis=redis, image_hash=image_hash)
+    for job_uuid in subscribers:
+        await send_pusher_message(job_uuid=job_uuid, pdf_url_cache=pdf_url)
+
+
+async def fail_subscribers(image_hash: str, error: str) -> None:
+    """
+    Release the image's in-flight job after it failed, and fail every
+    request that was attached to it instead of leaving it waiting.
+    """
+    # Like the job's state, this mustn't hide the failure being handled
+    try:
+        subscribers = await inflight_service.fail(
+            redis=redis,
+            image_hash=image_hash,
+            stage=JobStage.PDF,
+            error=error,
+            ttl=config.JOB_TTL,
+        )
+    except RedisError as e:
+        logging.warning(f"PDF: Failed to release the job of image {image_hash} {e}")
+        return
+    for job_uuid in subscribers:
+        # Sent in the background, see Notifier
+        notifier.notify(channel=job_uuid, event="failed", data={"error": error})
+
+
+async def handle_rejected_message(message: aio_pika.IncomingMessage, error: str):
+    """
+    Fail the job of a message dead-lettered by the consumer, and its
+    subscribers.
+    """
+    data = json.loads(message.body.decode())
+    # A retried job released its image when it first failed
+    if not data.get("job_ids"):
+        await record_job(job_uuid=data["job_uuid"], event=JobEvent.FAILED, error=error)
+        await fail_subscribers(image_hash=data["image_hash"], error=error)
+
+
+async def handle_normal_flow(
+    session: AsyncSession,
+    data: dict,
+    redis: Redis,
+    text_cache: TieredCache,
+    image_cache: TieredCache,
+):
     data = MessageSchema(**data)
     logging.info(f"PDF: Received message from RabbitMQ, processing content {data}")
     # your business logic here, use shared functions or DB access
     translated_text = data.translated_text
 
     try:
+        await record_job(job_uuid=data.job_uuid, event=JobEvent.STARTED)
         if data.is_file_from_gcs:
-            pdf_file = await pdf_service.text_to_pdf_in_memory(text=translated_text)
-            pdf_url = await gcp_service.upload_pdf_from_memory(
-                bucket_name=config.GCS_BUCKET_NAME,
-                blob_name=f"{data.job_uuid}.pdf",
-                pdf_bytes=pdf_file.getvalue(),
-            )
+            async with pdf_service.open_pdf(text=translated_text) as pdf_file:
+                pdf_url = await gcp_service.upload_pdf(
+                    bucket_name=config.GCS_BUCKET_NAME,
+                    blob_name=f"{data.job_uuid}.pdf",
+                    pdf_file=pdf_file,
+                )
         else:
             image_file_url = Path(data.file_url)
             file_uuid = image_file_url.with_suffix("")
@@ -107,10 +232,16 @@ async def handle_normal_flow(session: AsyncSession, data: dict, redis: Redis):
         await save_to_cache(
             image_hash=data.image_hash,
             encoded_text=data.encoded_text,
+            text_to_translate=data.text_to_translate,
             pdf_url=pdf_url,
-            redis=redis,
+            text_cache=text_cache,
+            image_cache=image_cache,
         )
+        await record_job(job_uuid=data.job_uuid, event=JobEvent.FINISHED)
         await send_pusher_message(job_uuid=data.job_uuid, pdf_url_cache=pdf_url)
+        await notify_subscribers(
+            redis=redis, image_hash=data.image_hash, pdf_url=pdf_url
+        )
 
     except Exception as e:
         await create_retry_job(
@@ -129,6 +260,8 @@ async def handle_normal_flow(session: AsyncSession, data: dict, redis: Redis):
                 "job_uuid": data.job_uuid,
             },
         )
+        await record_job(job_uuid=data.job_uuid, event=JobEvent.FAILED, error=str(e))
+        await fail_subscribers(image_hash=data.image_hash, error=str(e))
 
 
 async def get_failed_jobs(
@@ -144,20 +277,27 @@ async def get_failed_jobs(
     return list(result.scalars().all())
 
 
-async def handle_retry_flow(redis: Redis, session: AsyncSession, job_ids: list[int]):
+async def handle_retry_flow(
+    redis: Redis,
+    session: AsyncSession,
+    job_ids: list[int],
+    text_cache: TieredCache,
+    image_cache: TieredCache,
+):
     failed_jobs = await get_failed_jobs(session=session, job_ids=job_ids)
     if failed_jobs:
         for job in failed_jobs:
             try:
+                await record_job(job_uuid=job.job_uuid, event=JobEvent.STARTED)
                 if job.is_file_from_gcs:
-                    pdf_file = await pdf_service.text_to_pdf_in_memory(
+                    async with pdf_service.open_pdf(
                         text=job.translated_text
-                    )
-                    pdf_url = await gcp_service.upload_pdf_from_memory(
-                        bucket_name=config.GCS_BUCKET_NAME,
-                        blob_name=f"{job.job_uuid}.pdf",
-                        pdf_bytes=pdf_file.getvalue(),
-                    )
+                    ) as pdf_file:
+                        pdf_url = await gcp_service.upload_pdf(
+                            bucket_name=config.GCS_BUCKET_NAME,
+                            blob_name=f"{job.job_uuid}.pdf",
+                            pdf_file=pdf_file,
+                        )
                 else:
                     image_file_url = Path(job.file_url)
                     file_uuid = image_file_url.with_suffix("")
@@ -169,11 +309,17 @@ async def handle_retry_flow(redis: Redis, session: AsyncSession, job_ids: list[i
                 await save_to_cache(
                     image_hash=job.image_hash,
                     encoded_text=job.encoded_text,
+                    text_to_translate=job.text_to_translate,
                     pdf_url=pdf_url,
-                    redis=redis,
+                    text_cache=text_cache,
+                    image_cache=image_cache,
                 )
 
+                await record_job(job_uuid=job.job_uuid, event=JobEvent.FINISHED)
                 await send_pusher_message(job_uuid=job.job_uuid, pdf_url_cache=pdf_url)
+                await notify_subscribers(
+                    redis=redis, image_hash=job.image_hash, pdf_url=pdf_url
+                )
 
                 # Remove the job from the retry queue, since all the flow has been completed
                 job.is_deleted = True
@@ -182,34 +328,107 @@ async def handle_retry_flow(redis: Redis, session: AsyncSession, job_ids: list[i
                 job.job_metadata = json.dumps(
                     {"error": str(e), "trace": traceback.format_exc()}
                 )
+                await record_job(
+                    job_uuid=job.job_uuid, event=JobEvent.FAILED, error=str(e)
+                )
 
     await session.commit()
 
 
-async def handle_message(message: aio_pika.IncomingMessage, redis: Redis):
-    async with message.process():
-        data = message.body.decode()
-        data = json.loads(data)
-        async for session in get_db_session():
-            if not (job_ids := data.get("job_ids")):
-                await handle_normal_flow(session=session, data=data, redis=redis)
-            else:
-                await handle_retry_flow(redis=redis, session=session, job_ids=job_ids)
+async def handle_message(
+    message: aio_pika.IncomingMessage,
+    redis: Redis,
+    text_cache: TieredCache,
+    image_cache: TieredCache,
+):
+    data = message.body.decode()
+    data = json.loads(data)
+    async for session in get_db_session():
+        if not (job_ids := data.get("job_ids")):
+            await handle_normal_flow(
+                session=session,
+                data=data,
+                redis=redis,
+                text_cache=text_cache,
+                image_cache=image_cache,
+            )
+        else:
+            await handle_retry_flow(
+                redis=redis,
+                session=session,
+                job_ids=job_ids,
+                text_cache=text_cache,
+                image_cache=image_cache,
+            )
 
 
 async def main():
-    redis = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, decode_responses=True)
+    # Fonts and styles are loaded once, before the first job comes in
+    pdf_service.init_renderer(
+        font_path=config.PDF_FONT_PATH, fast_path=config.PDF_FAST_PATH
+    )
+    if config.PDF_RENDER_MODE == "process":
+        # Fork the PDF workers before any connection is opened
+        await pdf_pool.start(
+            max_workers=config.PDF_POOL_WORKERS or available_cpus(),
+            task_timeout=config.PDF_TASK_TIMEOUT,
+            max_pending=config.PDF_MAX_PENDING,
+            font_path=config.PDF_FONT_PATH,
+            fast_path=config.PDF_FAST_PATH,
+        )
+
+    await storage_client.start(
+        backend=create_backend(
+            config.STORAGE_BACKEND,
+            local_root=config.STORAGE_LOCAL_ROOT,
+            connection_limit=config.GCS_CONNECTION_LIMIT,
+            limit_per_host=config.GCS_CONNECTION_LIMIT_PER_HOST,
+            dns_cache_ttl=config.GCS_DNS_CACHE_TTL,
+            keepalive_timeout=config.GCS_KEEPALIVE_TIMEOUT,
+            download_timeout=config.GCS_DOWNLOAD_TIMEOUT,
+            upload_timeout=config.GCS_UPLOAD_TIMEOUT,
+            resumable_threshold=config.GCS_RESUMABLE_THRESHOLD,
+        ),
+        max_download_size=config.GCS_MAX_DOWNLOAD_SIZE,
+    )
 
-    connection = await aio_pika.connect_robust(config.RABBITMQ_CONNECTION)
-    channel = await connection.channel(publisher_confirms=True, on_return_raises=True)
-    queue = await channel.declare_queue(
-        config.RABBITMQ_QUEUE_TRANSLATE_TO_PDF, durable=True
+    # text key -> pdf url
+    text_cache = TieredCache(
+        name="text_cache",
+        redis=redis,
+        writer=save_text_cache,
+        local_maxsize=config.CACHE_LOCAL_MAXSIZE,
+        local_ttl=config.CACHE_LOCAL_TTL,
+    )
+    # image hash -> pdf url
+    image_cache = TieredCache(
+        name="image_cache",
+        redis=redis,
+        writer=save_image_cache,
+        local_maxsize=config.CACHE_LOCAL_MAXSIZE,
+        local_ttl=config.CACHE_LOCAL_TTL,
     )
 
-    handler = partial(handle_message, redis=redis)
-    await queue.consume(handler)
+    await notifier.start()
+
+    consumer = Consumer(
+        url=config.RABBITMQ_CONNECTION,
+        queue_name=config.RABBITMQ_QUEUE_TRANSLATE_TO_PDF,
+        handler=partial(
+            handle_message, redis=redis, text_cache=text_cache, image_cache=image_cache
+        ),
+        concurrency=config.WORKER_CONCURRENCY,
+        prefetch_count=config.RABBITMQ_PREFETCH_COUNT,
+        message_timeout=config.WORKER_MESSAGE_TIMEOUT,
+        on_reject=handle_rejected_message,
+    )
 
-    await asyncio.Future()  # keep the script alive
+    try:
+        await consumer.run()
+    finally:
+        await notifier.close()
+        await storage_client.close()
+        await pdf_pool.close()
 
 
 if __name__ == "__main__":
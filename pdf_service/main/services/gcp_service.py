@@ -1,8 +1,6 @@
-import io
+from typing import BinaryIO
 
-import aiohttp
-
-from gcloud.aio.storage import Storage
+from .storage_client import storage_client
 
 
 async def download_image_from_gcs_to_memory(public_url: str) -> bytes:
@@ -14,32 +12,22 @@ async def download_image_from_gcs_to_memory(public_url: str) -> bytes:
     :return: Image content as bytes
     :raises: Exception if file is not an image
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(public_url) as response:
-            if response.status != 200:
-                raise IOError("Failed to download file")
-
-            # content_type = response.headers.get("Content-Type", "")
-            # if not content_type.startswith("image/"):
-            #     raise NotImplementedError("File is not an image")
-
-            return await response.read()
+    return await storage_client.download(public_url)
 
 
-async def upload_pdf_from_memory(
-    bucket_name: str, blob_name: str, pdf_bytes: bytes
-) -> str:
-    async with aiohttp.ClientSession() as session:
-        storage = Storage(session=session)
-
-        # Upload from memory
-        await storage.upload(
-            bucket=bucket_name,
-            object_name=blob_name,
-            file_data=io.BytesIO(pdf_bytes),
-            content_type="application/pdf",
-        )
+async def upload_pdf(bucket_name: str, blob_name: str, pdf_file: BinaryIO) -> str:
+    """
+    Upload a PDF from a seekable stream, sent in chunks as it is read rather
+    than copied into a request body first.
 
-        # Return public URL
-        public_url = f"https://storage.googleapis.com/{bucket_name}/{blob_name}"
-        return public_url
+    :param bucket_name: Bucket to upload to
+    :param blob_name: Name of the object
+    :param pdf_file: Seekable binary stream, e.g. from pdf_service.open_pdf
+    :return: Public URL of the PDF
+    """
+    return await storage_client.upload(
+        bucket_name=bucket_name,
+        blob_name=blob_name,
+        file=pdf_file,
+        content_type="application/pdf",
+    )
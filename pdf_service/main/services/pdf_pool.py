@@ -0,0 +1,184 @@
+import asyncio
+import io
+import os
+from contextlib import asynccontextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from .pdf_renderer import PDFRenderer
+from .process_pool import WarmProcessPool
+
+# Renderer of the current worker process, set up by _init_worker
+_renderer: PDFRenderer | None = None
+
+
+def _init_worker(font_path: str | None, fast_path: bool) -> None:
+    global _renderer
+    _renderer = PDFRenderer(font_path=font_path, fast_path=fast_path)
+
+
+def _warm_up() -> int:
+    """
+    Runs once in every worker so the first real job doesn't pay for
+    starting the process and loading the font.
+    """
+    _renderer.warm_up()
+    return os.getpid()
+
+
+def _render_to_file(text: str, output_filename: str) -> str:
+    _renderer.render(text, output_filename)
+    return output_filename
+
+
+def _render_to_shared_memory(text: str) -> tuple[str, int]:
+    """
+    Render a PDF into a new shared memory block, handed over to the parent
+    which has to unlink it.
+
+    :return: Name and size of the block
+    """
+    pdf = _renderer.render_bytes(text)
+    block = SharedMemory(create=True, size=max(len(pdf), 1))
+    block.buf[: len(pdf)] = pdf
+    block.close()
+    # The parent owns the block from now on, this process mustn't unlink it
+    # when exiting
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block.name, len(pdf)
+
+
+def _discard_shared_memory(future: asyncio.Future) -> None:
+    # The job finished after its caller went away, nobody will read the block
+    if not future.cancelled() and future.exception() is None:
+        name, _ = future.result()
+        block = SharedMemory(name=name)
+        block.close()
+        block.unlink()
+
+
+class SharedMemoryReader(io.RawIOBase):
+    """
+    Seekable binary stream over a memoryview, read in chunks without ever
+    copying the whole buffer.
+    """
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = max(min(len(buffer), len(self._view) - self._position), 0)
+        buffer[:size] = self._view[self._position : self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class PDFProcessPool(WarmProcessPool):
+    """
+    Pool of pre-started worker processes rendering PDFs, so concurrent jobs
+    use as many cores as there are workers instead of taking turns on the
+    GIL.
+
+    Each worker keeps its own warmed-up ``PDFRenderer``. In-memory PDFs come
+    back through shared memory rather than being pickled through the pool's
+    pipe.
+    """
+
+    def __init__(self):
+        super().__init__(
+            name="PDF", initializer=_init_worker, warm_up=_warm_up, task_timeout=60.0
+        )
+
+    async def start(
+        self,
+        max_workers: int,
+        task_timeout: float,
+        max_pending: int = 0,
+        font_path: str | None = None,
+        fast_path: bool = True,
+    ) -> None:
+        """
+        Start and warm up the worker processes.
+
+        :param max_workers: Number of worker processes
+        :param task_timeout: Seconds allowed for a single PDF
+        :param max_pending: Max PDFs queued or running, defaults to 2 per worker
+        :param font_path: TrueType font to use instead of the bundled Roboto
+        :param fast_path: Draw texts without markup straight on the canvas
+        """
+        await super().start(
+            max_workers=max_workers,
+            task_timeout=task_timeout,
+            max_pending=max_pending,
+            initargs=(font_path, fast_path),
+        )
+
+    async def render_to_file(self, text: str, output_filename: str) -> str:
+        """
+        Render a PDF file in one of the worker processes.
+
+        :raises TimeoutError: if the PDF took longer than the task timeout
+        """
+        return await self.run(_render_to_file, text, output_filename)
+
+    async def render_bytes(self, text: str) -> bytes:
+        """
+        Render a PDF in one of the worker processes and return its content.
+
+        :raises TimeoutError: if the PDF took longer than the task timeout
+        """
+        async with self.open_pdf(text) as stream:
+            return stream.read()
+
+    @asynccontextmanager
+    async def open_pdf(self, text: str):
+        """
+        Render a PDF in one of the worker processes and read it straight
+        from shared memory, freed when leaving the context.
+
+        :return: Seekable binary stream over the PDF
+        :raises TimeoutError: if the PDF took longer than the task timeout
+        """
+        task = asyncio.ensure_future(self.run(_render_to_shared_memory, text))
+        try:
+            name, size = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.add_done_callback(_discard_shared_memory)
+            raise
+
+        block = SharedMemory(name=name)
+        stream = SharedMemoryReader(block.buf[:size])
+        try:
+            yield stream
+        finally:
+            stream.close()
+            block.close()
+            block.unlink()
+
+
+pdf_pool = PDFProcessPool()
@@ -0,0 +1,229 @@
+import io
+import os
+import re
+from functools import lru_cache
+from typing import BinaryIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+DEFAULT_FONT_NAME = "Roboto-Regular"
+DEFAULT_FONT_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "commons", "Roboto-Regular.ttf"
+)
+
+# Space between two paragraphs, in points
+PARAGRAPH_SPACING = 12
+# Page margin of SimpleDocTemplate plus the padding of its frame, in points
+MARGIN = 72
+PADDING = 6
+
+# Tags or entities only the platypus path understands
+_MARKUP_PATTERN = re.compile(r"<\s*/?\s*[a-zA-Z][^>]*>|&(#\d+|#x[0-9a-fA-F]+|\w+);")
+
+_WARM_UP_TEXT = "Xin chào thế giới.\nTiếng Việt có dấu.\n\nĐoạn thứ hai."
+
+
+class PDFRenderer:
+    """
+    Renders texts to PDF with everything that doesn't depend on the text
+    prepared once: the font is parsed and registered, the paragraph style
+    built, and the font's glyph widths kept in a table.
+
+    A renderer is meant to live as long as the worker and be shared by
+    every job, from any thread.
+    """
+
+    def __init__(
+        self,
+        font_path: str | None = None,
+        font_name: str = DEFAULT_FONT_NAME,
+        pagesize: tuple[float, float] = letter,
+        fast_path: bool = True,
+    ):
+        """
+        :param font_path: TrueType font with Vietnamese glyphs, the bundled
+            Roboto if not set
+        :param font_name: Name the font is registered under
+        :param pagesize: Width and height of the pages, in points
+        :param fast_path: Draw texts without markup straight on the canvas
+        """
+        if font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(font_name, font_path or DEFAULT_FONT_PATH))
+        self.font_name = font_name
+        self.pagesize = pagesize
+        self.fast_path = fast_path
+
+        self.style = ParagraphStyle(
+            "Body", parent=getSampleStyleSheet()["Normal"], fontName=font_name
+        )
+
+        # Code point -> width of the glyph at size 1000
+        face = pdfmetrics.getFont(font_name).face
+        self.glyph_widths: dict[int, float] = dict(face.charWidths)
+        self.default_width: float = face.defaultWidth
+        # Texts repeat the same words over and over
+        self._word_width = lru_cache(maxsize=100_000)(self._measure)
+
+    def string_width(self, text: str, font_size: float) -> float:
+        """
+        Width of a single-line text, in points.
+        """
+        return self._measure(text) * font_size / 1000
+
+    def _measure(self, text: str) -> float:
+        widths = self.glyph_widths
+        default = self.default_width
+        return sum(widths.get(ord(char), default) for char in text)
+
+    def render(self, text: str, output: str | BinaryIO) -> None:
+        """
+        Render a text to PDF, one paragraph per block separated by a blank
+        line, keeping the line breaks within paragraphs.
+
+        Texts without markup are laid out by ``render_plain``, others by
+        platypus.
+
+        :param output: Path of the PDF file, or a binary file to write it to
+        """
+        if self.fast_path and not _MARKUP_PATTERN.search(text):
+            self.render_plain(text, output)
+        else:
+            self.render_story(text, output)
+
+    def render_story(self, text: str, output: str | BinaryIO) -> None:
+        """
+        Render a text, which may contain markup, with platypus.
+        """
+        story = []
+        for paragraph in text.split("\n\n"):
+            story.append(Paragraph(paragraph.replace("\n", "<br/>"), self.style))
+            story.append(Spacer(1, PARAGRAPH_SPACING))
+
+        SimpleDocTemplate(output, pagesize=self.pagesize).build(story)
+
+    def render_plain(self, text: str, output: str | BinaryIO) -> None:
+        """
+        Render a plain text with the same layout as ``render_story``, drawing
+        the lines straight on the canvas instead of going through platypus.
+        """
+        width, height = self.pagesize
+        left = MARGIN + PADDING
+        top = height - MARGIN - PADDING
+        bottom = MARGIN + PADDING
+        font_size = self.style.fontSize
+        leading = self.style.leading
+
+        canvas = Canvas(output, pagesize=self.pagesize)
+        y = top
+        for paragraph in text.split("\n\n"):
+            lines = self._wrap(
+                paragraph, max_width=width - 2 * left, font_size=font_size
+            )
+            while lines:
+                fitting = int((y - bottom) // leading)
+                # Like platypus, never leave the first line of a paragraph alone
+                # at the bottom of a page
+                if fitting < len(lines) and (fitting < 2 and y < top):
+                    fitting = 0
+                if fitting == 0:
+                    canvas.showPage()
+                    y = top
+                    continue
+
+                text_object = canvas.beginText(left, y - font_size)
+                text_object.setFont(self.font_name, font_size, leading)
+                for line, _ in lines[:fitting]:
+                    text_object.textLine(line)
+                canvas.drawText(text_object)
+                y -= leading * min(fitting, len(lines))
+                lines = lines[fitting:]
+                # Like platypus, a paragraph split at a line break goes on
+                # with an empty line on the next page
+                if lines and lines[0][1]:
+                    lines.insert(0, ("", False))
+
+            # A spacer that doesn't fit still takes space on the next page
+            if y - PARAGRAPH_SPACING < bottom:
+                canvas.showPage()
+                y = top
+            y -= PARAGRAPH_SPACING
+
+        canvas.showPage()
+        canvas.save()
+
+    def wrap(self, paragraph: str, max_width: float, font_size: float) -> list[str]:
+        """
+        Break a paragraph into lines of at most ``max_width`` points, between
+        words, or within words too long for a line. Line breaks are kept and
+        runs of spaces collapsed, as platypus does.
+        """
+        return [line for line, _ in self._wrap(paragraph, max_width, font_size)]
+
+    def _wrap(
+        self, paragraph: str, max_width: float, font_size: float
+    ) -> list[tuple[str, bool]]:
+        """
+        :return: Lines, and whether each follows a line break of the text
+        """
+        space_width = self.string_width(" ", font_size)
+        # Spaces may shrink a little to fit one more word, as in platypus
+        space_shrinkage = self.style.spaceShrinkage * space_width
+        lines = []
+        source_lines = paragraph.split("\n")
+        for number, source_line in enumerate(source_lines):
+            after_break = number > 0
+            line, line_width = [], 0.0
+            for word in source_line.split():
+                word_width = self._word_width(word) * font_size / 1000
+                start = line_width + space_width if line else 0.0
+                if start + word_width <= max_width + space_shrinkage * len(line):
+                    line.append(word)
+                    line_width = start + word_width
+                    continue
+                if word_width <= max_width:
+                    lines.append((" ".join(line), after_break))
+                    after_break = False
+                    line, line_width = [word], word_width
+                    continue
+
+                # Cut the word, filling what's left of the current line first
+                piece, piece_start = "", start
+                for char in word:
+                    char_width = self.string_width(char, font_size)
+                    if piece_start + char_width > max_width and (piece or line):
+                        lines.append(
+                            (" ".join(line + [piece] if piece else line), after_break)
+                        )
+                        after_break = False
+                        line, piece, piece_start = [], "", 0.0
+                    piece += char
+                    piece_start += char_width
+                line.append(piece)
+                line_width = piece_start
+            if line or len(source_lines) > 1:
+                lines.append((" ".join(line), after_break))
+
+        # As in platypus, a blank paragraph takes no space and the break at
+        # the end of a paragraph is dropped
+        if not paragraph.strip():
+            return []
+        if lines and not lines[-1][0]:
+            lines.pop()
+        return lines
+
+    def render_bytes(self, text: str) -> bytes:
+        buffer = io.BytesIO()
+        self.render(text, buffer)
+        return buffer.getvalue()
+
+    def warm_up(self) -> None:
+        """
+        Render a small document, so the first job doesn't pay for the lazy
+        initialization done by reportlab on first use.
+        """
+        self.render_bytes(_WARM_UP_TEXT)
@@ -1,12 +1,32 @@
 import asyncio
 import io
+from contextlib import asynccontextmanager
 
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import os
+from .pdf_pool import pdf_pool
+from .pdf_renderer import PDFRenderer
+
+_renderer: PDFRenderer | None = None
+
+
+def init_renderer(font_path: str | None = None, fast_path: bool = True) -> PDFRenderer:
+    """
+    Create the renderer shared by every job, meant to be called once at
+    worker startup.
+
+    :param font_path: TrueType font to use instead of the bundled Roboto
+    :param fast_path: Draw texts without markup straight on the canvas
+    """
+    global _renderer
+    renderer = PDFRenderer(font_path=font_path, fast_path=fast_path)
+    renderer.warm_up()
+    _renderer = renderer
+    return renderer
+
+
+def get_renderer() -> PDFRenderer:
+    if _renderer is None:
+        return init_renderer()
+    return _renderer
 
 
 async def text_to_pdf(text, output_filename="output.pdf"):
@@ -20,44 +40,13 @@ async def text_to_pdf(text, output_filename="output.pdf"):
     Returns:
         str: Path to the saved PDF file.
     """
+    if pdf_pool.is_running:
+        return await pdf_pool.render_to_file(text, output_filename)
 
-    # Define a coroutine that does the actual PDF creation work
-    async def create_pdf():
-        # This is a CPU-bound task, so we'll run it in a thread pool
-        return await asyncio.to_thread(_create_pdf_sync, text, output_filename)
-
-    # Actual PDF creation function that will run in a thread pool
-    def _create_pdf_sync(text, filename):
-        # Register DejaVu Sans font which has good Unicode support
-        font_path = os.path.join(os.getcwd(), "main", "commons", "Roboto-Regular.ttf")
-
-        # Register the font if the file exists
-        pdfmetrics.registerFont(TTFont("Roboto-Regular", font_path))
-        font_name = "Roboto-Regular"
-
-        # Set up the document with letter page size
-        doc = SimpleDocTemplate(filename, pagesize=letter)
-        story = []
-
-        # Use default style for paragraphs with Unicode font
-        styles = getSampleStyleSheet()
-        style = styles["Normal"]
-        style.fontName = "Roboto-Regular"  # Use the registered Unicode font
-
-        # Split the text into paragraphs and add them to the story
-        paragraphs = text.split("\n\n")
-        for para in paragraphs:
-            p = Paragraph(para.replace("\n", "<br/>"), style)
-            story.append(p)
-            story.append(Spacer(1, 12))  # Add some space between paragraphs
-
-        # Build the PDF
-        doc.build(story)
-        return filename
-
-    # Execute the coroutine and return the result
-    result = await create_pdf()
-    return result
+    renderer = get_renderer()
+    # This is a CPU-bound task, so we'll run it in a thread pool
+    await asyncio.to_thread(renderer.render, text, output_filename)
+    return output_filename
 
 
 async def text_to_pdf_in_memory(text: str) -> io.BytesIO:
@@ -70,26 +59,26 @@ async def text_to_pdf_in_memory(text: str) -> io.BytesIO:
     Returns:
         io.BytesIO: In-memory PDF file.
     """
+    if pdf_pool.is_running:
+        return io.BytesIO(await pdf_pool.render_bytes(text))
 
-    def _create_pdf_bytes():
-        buffer = io.BytesIO()
+    renderer = get_renderer()
+    buffer = io.BytesIO()
+    await asyncio.to_thread(renderer.render, text, buffer)
+    buffer.seek(0)  # rewind to the beginning
+    return buffer
 
-        # Register Unicode-supporting font (Roboto or DejaVu)
-        font_path = os.path.join(os.getcwd(), "main", "commons", "Roboto-Regular.ttf")
-        pdfmetrics.registerFont(TTFont("Roboto-Regular", font_path))
 
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        style = styles["Normal"]
-        style.fontName = "Roboto-Regular"
-
-        story = []
-        for para in text.split("\n\n"):
-            story.append(Paragraph(para.replace("\n", "<br/>"), style))
-            story.append(Spacer(1, 12))
-
-        doc.build(story)
-        buffer.seek(0)  # rewind to the beginning
-        return buffer
+@asynccontextmanager
+async def open_pdf(text: str):
+    """
+    Generate a PDF in memory and give it as a stream, without copying it:
+    straight from the shared memory of the process pool when it is running.
 
-    return await asyncio.to_thread(_create_pdf_bytes)
+    :return: Seekable binary stream over the PDF, valid inside the context
+    """
+    if pdf_pool.is_running:
+        async with pdf_pool.open_pdf(text) as stream:
+            yield stream
+    else:
+        yield await text_to_pdf_in_memory(text)
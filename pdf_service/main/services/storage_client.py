@@ -0,0 +1,319 @@
+import asyncio
+import io
+import logging
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO
+
+import aiohttp
+
+GCS_PUBLIC_URL = "https://storage.googleapis.com"
+
+
+class StorageError(IOError):
+    """
+    An object couldn't be downloaded or uploaded.
+    """
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class ObjectTooLarge(StorageError):
+    """
+    An object is larger than the size allowed for its download.
+    """
+
+
+class StorageBackend(ABC):
+    """
+    Object storage the files are downloaded from and uploaded to, by public URL.
+    """
+
+    name: str
+
+    def __init__(self, public_url: str = GCS_PUBLIC_URL):
+        """
+        :param public_url: URL the public URLs of the objects start with
+        """
+        self.public_url = public_url.rstrip("/")
+
+    def get_public_url(self, bucket_name: str, blob_name: str) -> str:
+        return f"{self.public_url}/{bucket_name}/{blob_name}"
+
+    async def start(self) -> None:
+        pass
+
+    @abstractmethod
+    async def download(self, url: str, max_size: int | None = None) -> bytes:
+        """
+        :raises ObjectTooLarge: if the object is larger than ``max_size`` bytes
+        :raises StorageError: if the object couldn't be downloaded
+        """
+
+    @abstractmethod
+    async def upload(
+        self, bucket_name: str, blob_name: str, file: BinaryIO, content_type: str
+    ) -> str:
+        """
+        Upload an object from a seekable binary stream.
+
+        :return: Public URL of the object
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class GCSBackend(StorageBackend):
+    """
+    Google Cloud Storage, over one HTTP session whose connections are kept
+    alive and reused by every download and upload of the process.
+    """
+
+    name = "gcs"
+
+    def __init__(
+        self,
+        connection_limit: int = 100,
+        limit_per_host: int = 32,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30,
+        download_timeout: float = 30,
+        upload_timeout: float = 60,
+        resumable_threshold: int = 5 * 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+        public_url: str = GCS_PUBLIC_URL,
+    ):
+        """
+        :param connection_limit: Max connections open at once
+        :param limit_per_host: Max connections open at once to the same host
+        :param dns_cache_ttl: Seconds a DNS lookup is cached
+        :param keepalive_timeout: Seconds an idle connection is kept open
+        :param download_timeout: Seconds allowed per download
+        :param upload_timeout: Seconds allowed per upload request
+        :param resumable_threshold: Objects larger than this many bytes are
+            sent with a resumable upload, retried from where it stopped
+        :param chunk_size: Bytes read at once from a download
+        """
+        super().__init__(public_url=public_url)
+        self.connection_limit = connection_limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.download_timeout = download_timeout
+        self.upload_timeout = upload_timeout
+        self.resumable_threshold = resumable_threshold
+        self.chunk_size = chunk_size
+
+        self._session: aiohttp.ClientSession | None = None
+        self._storage = None
+
+    async def start(self) -> None:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.connection_limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    keepalive_timeout=self.keepalive_timeout,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.download_timeout),
+            )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            raise RuntimeError("GCS backend is not started")
+        return self._session
+
+    async def download(self, url: str, max_size: int | None = None) -> bytes:
+        try:
+            return await self._download(url, max_size=max_size)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise StorageError(f"Failed to download file: {e!r}") from e
+
+    async def _download(self, url: str, max_size: int | None) -> bytes:
+        async with self._get_session().get(url) as response:
+            if response.status != 200:
+                raise StorageError(
+                    f"Failed to download file: HTTP {response.status}",
+                    status=response.status,
+                )
+            if max_size is not None and (response.content_length or 0) > max_size:
+                raise ObjectTooLarge(f"File is larger than {max_size} bytes")
+
+            # Read in chunks so a file without Content-Length can't go over
+            # the limit either
+            content = bytearray()
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                content += chunk
+                if max_size is not None and len(content) > max_size:
+                    raise ObjectTooLarge(f"File is larger than {max_size} bytes")
+            return bytes(content)
+
+    async def upload(
+        self, bucket_name: str, blob_name: str, file: BinaryIO, content_type: str
+    ) -> str:
+        if self._storage is None:
+            # Only the services uploading files depend on gcloud-aio-storage
+            from gcloud.aio.storage import Storage
+
+            self._storage = Storage(session=self._get_session())
+
+        size = file.seek(0, io.SEEK_END)
+        file.seek(0)
+        await self._storage.upload(
+            bucket=bucket_name,
+            object_name=blob_name,
+            file_data=file,
+            content_type=content_type,
+            force_resumable_upload=size > self.resumable_threshold,
+            timeout=self.upload_timeout,
+        )
+        return self.get_public_url(bucket_name, blob_name)
+
+    async def close(self) -> None:
+        if self._storage is not None:
+            # Leaves the session alone, it was given to the client
+            await self._storage.close()
+            self._storage = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class LocalBackend(StorageBackend):
+    """
+    Stand-in for GCS keeping the objects in a local directory, as
+    ``<root>/<bucket>/<blob>``, for tests and benchmarks. Objects keep the
+    same public URLs as on GCS.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str | Path = "storage", public_url: str = GCS_PUBLIC_URL):
+        """
+        :param root: Directory of the buckets
+        """
+        super().__init__(public_url=public_url)
+        self.root = Path(root).resolve()
+
+    def _get_path(self, url: str) -> Path:
+        prefix = f"{self.public_url}/"
+        path = (self.root / url.removeprefix(prefix)).resolve()
+        if not url.startswith(prefix) or not path.is_relative_to(self.root):
+            raise StorageError(f"Failed to download file: not stored locally {url}")
+        return path
+
+    def _read(self, path: Path, max_size: int | None) -> bytes:
+        try:
+            with path.open("rb") as file:
+                if max_size is not None and path.stat().st_size > max_size:
+                    raise ObjectTooLarge(f"File is larger than {max_size} bytes")
+                return file.read()
+        except FileNotFoundError:
+            raise StorageError("Failed to download file: HTTP 404", status=404)
+
+    def _write(self, path: Path, file: BinaryIO) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file.seek(0)
+        with path.open("wb") as output:
+            shutil.copyfileobj(file, output)
+
+    async def download(self, url: str, max_size: int | None = None) -> bytes:
+        return await asyncio.to_thread(self._read, self._get_path(url), max_size)
+
+    async def upload(
+        self, bucket_name: str, blob_name: str, file: BinaryIO, content_type: str
+    ) -> str:
+        url = self.get_public_url(bucket_name, blob_name)
+        await asyncio.to_thread(self._write, self._get_path(url), file)
+        return url
+
+
+def create_backend(name: str, local_root: str = "storage", **options) -> StorageBackend:
+    """
+    :param name: "gcs" or "local"
+    :param local_root: Directory of the local backend
+    :param options: Options of the GCS backend
+    :raises ValueError: if the backend is unknown
+    """
+    if name == LocalBackend.name:
+        return LocalBackend(root=local_root)
+    if name == GCSBackend.name:
+        return GCSBackend(**options)
+    raise ValueError(f"Unknown storage backend {name}")
+
+
+class StorageClient:
+    """
+    Storage client shared by the whole process, started once with the
+    backend to use and closed on shutdown.
+    """
+
+    def __init__(self):
+        self.backend: StorageBackend | None = None
+        self.max_download_size: int | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.backend is not None
+
+    async def start(
+        self, backend: StorageBackend, max_download_size: int | None = None
+    ) -> None:
+        """
+        :param backend: Storage to use, closed along with the client
+        :param max_download_size: Max bytes of a download, unlimited if None
+        """
+        await self.close()
+        await backend.start()
+        self.backend = backend
+        self.max_download_size = max_download_size
+        logging.info(f"Storage: Client started with the {backend.name} backend")
+
+    def _get_backend(self) -> StorageBackend:
+        if self.backend is None:
+            raise RuntimeError("Storage client is not started")
+        return self.backend
+
+    async def download(self, url: str, max_size: int | None = None) -> bytes:
+        """
+        Download an object into memory, streamed and stopped as soon as it
+        goes over the size limit.
+
+        :param url: Public URL of the object
+        :param max_size: Max bytes of the object, the client's limit if None
+        :raises ObjectTooLarge: if the object is larger than the limit
+        :raises StorageError: if the object couldn't be downloaded
+        """
+        return await self._get_backend().download(
+            url, max_size=self.max_download_size if max_size is None else max_size
+        )
+
+    async def upload(
+        self,
+        bucket_name: str,
+        blob_name: str,
+        file: BinaryIO,
+        content_type: str = "application/octet-stream",
+    ) -> str:
+        """
+        Upload an object from a seekable binary stream, sent in chunks as it
+        is read.
+
+        :return: Public URL of the object
+        """
+        return await self._get_backend().upload(
+            bucket_name, blob_name, file, content_type=content_type
+        )
+
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+            self.backend = None
+
+
+storage_client = StorageClient()
@@ -0,0 +1,62 @@
+"""
+PDFs/sec of the thread and process rendering modes, with jobs rendered
+concurrently as when the worker handles many messages at once.
+
+The process mode only goes beyond the thread mode with as many free cores
+as workers, check ``nproc`` before reading the numbers.
+
+    python scripts/benchmark_render_pool.py --documents 32 --pages 5 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main")
+)
+from misc.utils.cpu import available_cpus  # noqa: E402
+from services import pdf_service  # noqa: E402
+from services.pdf_pool import pdf_pool  # noqa: E402
+
+PARAGRAPH = (
+    "Hôm nay trời đẹp, chúng tôi đi dạo quanh hồ Hoàn Kiếm và ghé thăm "
+    "một quán cà phê nhỏ.\nNgười phục vụ mang ra những tách cà phê sữa đá "
+    "thơm ngon, và chúng tôi ngồi trò chuyện cho đến tận chiều tối."
+)
+# Paragraphs filling about a letter page
+PARAGRAPHS_PER_PAGE = 9
+
+
+async def run(text: str, documents: int) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(pdf_service.text_to_pdf_in_memory(text) for _ in range(documents))
+    )
+    return documents / (time.perf_counter() - started)
+
+
+async def main(args) -> None:
+    text = "\n\n".join([PARAGRAPH] * PARAGRAPHS_PER_PAGE * args.pages)
+    pdf_service.init_renderer()
+    print(f"{available_cpus()} cores available\n")
+
+    print(f"{'mode':>12} {'PDF/s':>8}")
+    print(f"{'thread':>12} {await run(text, args.documents):>8.1f}")
+    for workers in args.workers:
+        await pdf_pool.start(max_workers=workers, task_timeout=300)
+        try:
+            rate = await run(text, args.documents)
+        finally:
+            await pdf_pool.close()
+        print(f"{f'process x{workers}':>12} {rate:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""
+Per-document render latency of a PDF renderer set up once, against the
+former way of registering the font and building the styles for every
+document, then of the canvas fast path for texts without markup.
+
+    python scripts/benchmark_renderer.py --pages 1 5 20 --repeat 20
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main")
+)
+from reportlab.lib.pagesizes import letter  # noqa: E402
+from reportlab.lib.styles import getSampleStyleSheet  # noqa: E402
+from reportlab.pdfbase import pdfmetrics  # noqa: E402
+from reportlab.pdfbase.ttfonts import TTFont  # noqa: E402
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer  # noqa: E402
+from services.pdf_renderer import DEFAULT_FONT_PATH, PDFRenderer  # noqa: E402
+
+PARAGRAPH = (
+    "Hôm nay trời đẹp, chúng tôi đi dạo quanh hồ Hoàn Kiếm và ghé thăm "
+    "một quán cà phê nhỏ.\nNgười phục vụ mang ra những tách cà phê sữa đá "
+    "thơm ngon, và chúng tôi ngồi trò chuyện cho đến tận chiều tối."
+)
+# Paragraphs filling about a letter page
+PARAGRAPHS_PER_PAGE = 9
+
+
+def render_per_document(text: str) -> bytes:
+    """
+    What the worker did for every document before the shared renderer.
+    """
+    buffer = io.BytesIO()
+    pdfmetrics.registerFont(TTFont("Roboto-Regular", DEFAULT_FONT_PATH))
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    style = getSampleStyleSheet()["Normal"]
+    style.fontName = "Roboto-Regular"
+
+    story = []
+    for para in text.split("\n\n"):
+        story.append(Paragraph(para.replace("\n", "<br/>"), style))
+        story.append(Spacer(1, 12))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def measure(render, text: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render(text)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main(args) -> None:
+    started = time.perf_counter()
+    renderer = PDFRenderer()
+    renderer.warm_up()
+    print(f"renderer setup: {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+    def render_story(text: str) -> None:
+        renderer.render_story(text, io.BytesIO())
+
+    def render_plain(text: str) -> None:
+        renderer.render_plain(text, io.BytesIO())
+
+    print(
+        f"{'pages':>6} {'before ms':>10} {'warm ms':>10} {'plain ms':>10} "
+        f"{'speedup':>8}"
+    )
+    for pages in args.pages:
+        text = "\n\n".join([PARAGRAPH] * PARAGRAPHS_PER_PAGE * pages)
+        before = measure(render_per_document, text, args.repeat)
+        warm = measure(render_story, text, args.repeat)
+        plain = measure(render_plain, text, args.repeat)
+        print(
+            f"{pages:>6} {before:>10.1f} {warm:>10.1f} {plain:>10.1f} "
+            f"{before / plain:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,35 @@
+import io
+
+from main.services.pdf_pool import PDFProcessPool
+
+
+async def test_pool_renders_pdfs_through_shared_memory(tmp_path):
+    pool = PDFProcessPool()
+    await pool.start(max_workers=1, task_timeout=30)
+    try:
+        pdf = await pool.render_bytes("Xin chào.\n\nĐoạn thứ hai.")
+        path = await pool.render_to_file("Xin chào.", str(tmp_path / "out.pdf"))
+    finally:
+        await pool.close()
+
+    assert pdf.startswith(b"%PDF")
+    assert (tmp_path / "out.pdf").read_bytes().startswith(b"%PDF")
+    assert path == str(tmp_path / "out.pdf")
+
+
+async def test_pool_opens_pdfs_as_streams_over_shared_memory():
+    pool = PDFProcessPool()
+    await pool.start(max_workers=1, task_timeout=30)
+    try:
+        async with pool.open_pdf("Xin chào.") as stream:
+            size = stream.seek(0, io.SEEK_END)
+            stream.seek(0)
+            header = stream.read(4)
+            stream.seek(0)
+            content = stream.read()
+    finally:
+        await pool.close()
+
+    assert header == b"%PDF"
+    assert len(content) == size
+    assert stream.closed
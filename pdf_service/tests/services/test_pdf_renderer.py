@@ -0,0 +1,51 @@
+from reportlab.platypus import Paragraph
+
+from main.services.pdf_renderer import PDFRenderer
+
+
+def test_renderer_renders_vietnamese_text():
+    renderer = PDFRenderer()
+
+    pdf = renderer.render_bytes("Xin chào.\nTiếng Việt.\n\nĐoạn thứ hai.")
+
+    assert pdf.startswith(b"%PDF")
+    assert b"Roboto-Regular" in pdf
+
+
+def test_renderer_measures_strings_with_its_glyph_widths():
+    renderer = PDFRenderer()
+
+    assert renderer.string_width("Tiếng Việt", 10) > renderer.string_width("Tiếng", 10)
+    assert renderer.string_width("", 10) == 0
+
+
+def test_wrap_breaks_lines_like_platypus():
+    renderer = PDFRenderer()
+    paragraph = " ".join(["Hôm nay trời đẹp, chúng tôi đi dạo quanh hồ."] * 30)
+
+    lines = renderer.wrap(paragraph, max_width=456, font_size=10)
+
+    platypus = Paragraph(paragraph, renderer.style)
+    platypus.wrap(456, 10_000)
+    assert lines == [" ".join(words) for _, words in platypus.blPara.lines]
+
+
+def test_wrap_cuts_words_longer_than_a_line():
+    renderer = PDFRenderer()
+
+    lines = renderer.wrap("a " + "x" * 200, max_width=100, font_size=10)
+
+    assert "".join(lines).replace(" ", "") == "a" + "x" * 200
+    assert all(renderer.string_width(line, 10) <= 100 for line in lines)
+
+
+def test_render_uses_platypus_for_markup(mocker):
+    renderer = PDFRenderer()
+    render_plain = mocker.spy(renderer, "render_plain")
+    render_story = mocker.spy(renderer, "render_story")
+
+    renderer.render_bytes("Plain text.\n\nStill plain, 1 < 2.")
+    renderer.render_bytes("Some <b>bold</b> text.")
+
+    assert render_plain.call_count == 1
+    assert render_story.call_count == 1
@@ -0,0 +1,88 @@
+import io
+
+import pytest
+from aiohttp import web
+
+from main.services.storage_client import (
+    GCSBackend,
+    LocalBackend,
+    ObjectTooLarge,
+    StorageClient,
+    StorageError,
+)
+
+
+async def test_local_backend_keeps_the_gcs_urls(tmp_path):
+    client = StorageClient()
+    await client.start(backend=LocalBackend(root=tmp_path))
+    try:
+        url = await client.upload("bucket", "a.pdf", io.BytesIO(b"%PDF-1.4"))
+        content = await client.download(url)
+    finally:
+        await client.close()
+
+    assert url == "https://storage.googleapis.com/bucket/a.pdf"
+    assert content == b"%PDF-1.4"
+    assert (tmp_path / "bucket" / "a.pdf").read_bytes() == b"%PDF-1.4"
+
+
+async def test_local_backend_refuses_missing_large_and_outside_files(tmp_path):
+    (tmp_path / "secret").write_bytes(b"x")
+    (tmp_path / "bucket").mkdir()
+    (tmp_path / "bucket" / "big.png").write_bytes(b"x" * 100)
+    backend = LocalBackend(root=tmp_path / "bucket")
+
+    with pytest.raises(StorageError):
+        await backend.download("https://storage.googleapis.com/missing.png")
+    with pytest.raises(StorageError):
+        await backend.download("https://storage.googleapis.com/../secret")
+    with pytest.raises(ObjectTooLarge):
+        await backend.download("https://storage.googleapis.com/big.png", max_size=10)
+
+
+async def test_gcs_backend_streams_downloads_up_to_the_limit():
+    async def handle(request: web.Request) -> web.StreamResponse:
+        if request.path == "/missing":
+            return web.Response(status=404)
+        # Chunked, without Content-Length
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for _ in range(10):
+            await response.write(b"x" * 1000)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/{name}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    client = StorageClient()
+    await client.start(backend=GCSBackend(chunk_size=1000), max_download_size=5000)
+    try:
+        assert len(await client.download(f"{url}/file", max_size=20_000)) == 10_000
+        with pytest.raises(ObjectTooLarge):
+            await client.download(f"{url}/file")
+        with pytest.raises(ObjectTooLarge):
+            await client.download(f"{url}/file", max_size=0)
+        with pytest.raises(StorageError) as error:
+            await client.download(f"{url}/missing")
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+    assert error.value.status == 404
+
+
+async def test_gcs_backend_wraps_network_errors():
+    client = StorageClient()
+    await client.start(backend=GCSBackend())
+    try:
+        # Nothing listens on port 1
+        with pytest.raises(StorageError):
+            await client.download("http://127.0.0.1:1/file")
+    finally:
+        await client.close()
@@ -1,8 +1,29 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from ._config import config
 from .middlewares import AccessLogMiddleware, DBSessionMiddleware
+from .services import translation_service
+from .services.translation_backends import create_backends
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    translation_service.translation_router.configure(
+        backends=create_backends(
+            config.TRANSLATION_BACKENDS,
+            dictionary_path=config.TRANSLATION_LOCAL_DICTIONARY_PATH,
+        ),
+        request_timeout=config.TRANSLATION_REQUEST_TIMEOUT,
+        retries=config.TRANSLATION_RETRIES,
+        retry_delay=config.TRANSLATION_RETRY_DELAY,
+    )
+    try:
+        yield
+    finally:
+        await translation_service.translation_router.close()
 
 
 api_docs_enabled = config.ENVIRONMENT == "local"
@@ -10,6 +31,7 @@ api_docs_enabled = config.ENVIRONMENT == "local"
 app = FastAPI(
     redoc_url=None,
     docs_url="/docs" if api_docs_enabled else None,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
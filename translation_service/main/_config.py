@@ -16,9 +16,73 @@ class Config(BaseSettings):
     RABBITMQ_CONNECTION: str
     RABBITMQ_QUEUE_OCR_TO_TRANSLATE: str
     RABBITMQ_QUEUE_TRANSLATE_TO_PDF: str
+    # Long-lived publisher: channel pool size, messages kept while the
+    # broker is unreachable, seconds to wait for a publisher confirm
+    RABBITMQ_PUBLISHER_CHANNELS: int = 4
+    RABBITMQ_PUBLISHER_BUFFER: int = 1000
+    RABBITMQ_PUBLISH_TIMEOUT: float = 10
+    # Consumer: messages handled at once, unacknowledged messages sent by
+    # the broker (0 means twice the concurrency), seconds allowed per message
+    WORKER_CONCURRENCY: int = 32  # enough for translation batches to fill up
+    RABBITMQ_PREFETCH_COUNT: int = 0
+    WORKER_MESSAGE_TIMEOUT: float = 300
+
+    # Redis settings
+    REDIS_HOST: str
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+
+    # Seconds a job's state is kept after its last update
+    JOB_TTL: int = 86400
 
     SENTRY_DSN: str
 
+    # Micro-batching: texts per translation request, milliseconds the first
+    # text waits for others, max characters per request
+    TRANSLATION_BATCH_SIZE: int = 16
+    TRANSLATION_BATCH_WAIT_MS: float = 50
+    TRANSLATION_BATCH_MAX_CHARS: int = 4500
+    # Max translation requests in flight for a batch, long texts included
+    TRANSLATION_MAX_CONCURRENT_REQUESTS: int = 4
+
+    # Translation backends in fallback order, see services/translation_backends.py.
+    # "local" is a word-by-word phrase table meant for tests and benchmarks,
+    # its translations would be cached like the provider's
+    TRANSLATION_BACKENDS: list[str] = ["googletrans"]
+    TRANSLATION_LOCAL_DICTIONARY_PATH: str | None = None
+    TRANSLATION_REQUEST_TIMEOUT: float = 10
+    # Tries per backend before falling back to the next one, seconds before
+    # the first retry, doubled after each
+    TRANSLATION_RETRIES: int = 3
+    TRANSLATION_RETRY_DELAY: float = 1
+    # Requests slower than this latency percentile of their backend are sent
+    # again, 0 disables hedging
+    TRANSLATION_HEDGE_PERCENTILE: float = 0.95
+    TRANSLATION_HEDGE_MIN_DELAY_MS: float = 100
+    # Failures in a row opening a backend's circuit, seconds it stays open
+    TRANSLATION_BREAKER_FAILURES: int = 5
+    TRANSLATION_BREAKER_RESET_SECONDS: float = 30
+
+    # Requests per second to the rate limited backends across every worker,
+    # 0 disables the limit, and seconds a request may wait for its turn
+    TRANSLATION_RATE_LIMIT: float = 5
+    TRANSLATION_RATE_BURST: int = 10
+    TRANSLATION_RATE_MAX_WAIT: float = 30
+    TRANSLATION_RATE_LIMITED_BACKENDS: list[str] = ["googletrans"]
+    # Requests in flight per worker, adjusted between min and max: up while
+    # requests succeed, halved when the provider throttles
+    TRANSLATION_CONCURRENCY_INITIAL: int = 4
+    TRANSLATION_CONCURRENCY_MIN: int = 1
+    TRANSLATION_CONCURRENCY_MAX: int = 32
+    # Seconds between two logs of the backends' stats
+    TRANSLATION_STATS_INTERVAL: float = 60
+
+    # Sentence-level translation memory, kept forever in MySQL
+    TRANSLATION_MEMORY_ENABLED: bool = True
+    TRANSLATION_MEMORY_LOCAL_MAXSIZE: int = 50_000
+    TRANSLATION_MEMORY_LOCAL_TTL: float = 3600
+    TRANSLATION_MEMORY_REDIS_TTL: int = 7 * 24 * 3600
+
     model_config = SettingsConfigDict(
         case_sensitive=True,
         env_file_encoding="utf-8",
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Groups items submitted by concurrent callers into batches handled by a
+    single call of ``func``.
+
+    A batch is sent as soon as it has ``max_size`` items, or ``max_wait``
+    seconds after its first item arrived, whichever comes first. Each caller
+    gets the result of its own item, or the exception the batch failed with.
+
+    A batch failing with a ``translated`` dict of index -> result, like
+    PartialTranslationError, only fails the items missing from it.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[list[T]], Awaitable[list[R]]],
+        max_size: int = 16,
+        max_wait: float = 0.05,
+    ):
+        """
+        :param func: Handles a batch, returns one result per item, in order
+        :param max_size: Max items in a batch
+        :param max_wait: Max seconds the first item of a batch waits for others
+        """
+        self.func = func
+        self.max_size = max_size
+        self.max_wait = max_wait
+
+        self._queue: asyncio.Queue[tuple[T, asyncio.Future]] = asyncio.Queue()
+        self._collector: asyncio.Task | None = None
+        self._batches: set[asyncio.Task] = set()
+
+        self.stats = {"batches": 0, "items": 0}
+
+    async def submit(self, item: T) -> R:
+        if self._collector is None:
+            raise RuntimeError("Batcher is not started")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def start(self) -> None:
+        if self._collector is None:
+            self._collector = asyncio.create_task(self._collect())
+
+    async def close(self) -> None:
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    async def _collect(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Collect the next batch while this one is being handled
+            task = asyncio.create_task(self._run(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run(self, batch: list[tuple[T, asyncio.Future]]) -> None:
+        self.stats["batches"] += 1
+        self.stats["items"] += len(batch)
+        try:
+            results = await self.func([item for item, _ in batch])
+        except Exception as e:
+            done = getattr(e, "translated", None) or {}
+            logging.error(
+                f"Batcher: {len(batch) - len(done)} of {len(batch)} items failed {e!r}"
+            )
+            for i, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if i in done:
+                    future.set_result(done[i])
+                else:
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from collections import deque
+
+import aio_pika
+from aio_pika.abc import AbstractRobustChannel, AbstractRobustConnection
+from aio_pika.exceptions import CONNECTION_EXCEPTIONS, DeliveryError, PublishError
+from aio_pika.pool import Pool
+
+
+class PublisherBufferFull(Exception):
+    pass
+
+
+class Publisher:
+    """
+    Long-lived RabbitMQ publisher shared by every handler of a worker.
+
+    One robust connection is opened at startup and kept for the life of the
+    process, with a small pool of confirm-mode channels on top of it. Each
+    publish waits for its own confirm, but many publishes can wait at once,
+    on the same or different channels, so the confirms are pipelined.
+
+    While the broker is unreachable, messages are kept in a bounded local
+    buffer and published in order once the connection is back. Messages
+    rejected by the broker (nack, unroutable) are never buffered.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        channels: int = 4,
+        max_buffered: int = 1000,
+        publish_timeout: float = 10,
+    ):
+        """
+        :param url: RabbitMQ connection url
+        :param channels: Size of the channel pool
+        :param max_buffered: Max messages kept while the broker is unreachable
+        :param publish_timeout: Seconds to wait for the confirm of a message
+        """
+        self.url = url
+        self.channels = channels
+        self.publish_timeout = publish_timeout
+
+        self._connection: AbstractRobustConnection | None = None
+        self._channel_pool: Pool[AbstractRobustChannel] | None = None
+        self._buffer: deque[tuple[bytes, str]] = deque(maxlen=max_buffered)
+        self._buffer_not_empty = asyncio.Event()
+        self._drainer: asyncio.Task | None = None
+
+        self.stats = {"published": 0, "buffered": 0, "rejected": 0}
+
+    async def start(self) -> None:
+        self._connection = await aio_pika.connect_robust(self.url)
+        self._channel_pool = Pool(self._open_channel, max_size=self.channels)
+        self._drainer = asyncio.create_task(self._drain())
+
+    async def _open_channel(self) -> AbstractRobustChannel:
+        return await self._connection.channel(
+            publisher_confirms=True, on_return_raises=True
+        )
+
+    async def close(self, timeout: float = 10) -> None:
+        """
+        Publish what's left in the buffer, for up to ``timeout`` seconds,
+        then close the connection.
+        """
+        if self._drainer is not None:
+            try:
+                await asyncio.wait_for(self._wait_drained(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logging.error(
+                    f"Publisher: Dropping {len(self._buffer)} unpublished messages"
+                )
+            self._drainer.cancel()
+            self._drainer = None
+
+        if self._channel_pool is not None:
+            await self._channel_pool.close()
+        if self._connection is not None:
+            await self._connection.close()
+
+    async def _wait_drained(self) -> None:
+        while self._buffer:
+            await asyncio.sleep(0.1)
+
+    async def publish(self, body: str | bytes, routing_key: str) -> None:
+        """
+        Publish a message, buffering it if the broker is unreachable.
+
+        :raises PublisherBufferFull: if the broker is unreachable and the
+            buffer is full
+        :raises DeliveryError: if the broker refused the message
+        """
+        if isinstance(body, str):
+            body = body.encode()
+
+        # Keep the order, messages already waiting go first
+        if not self._buffer:
+            try:
+                await self._publish(body, routing_key)
+                return
+            except (DeliveryError, PublishError):
+                self.stats["rejected"] += 1
+                raise
+            except (asyncio.TimeoutError, *CONNECTION_EXCEPTIONS) as e:
+                logging.warning(f"Publisher: Broker unreachable, buffering {e!r}")
+
+        self._enqueue(body, routing_key)
+
+    async def publish_many(self, bodies: list[str | bytes], routing_key: str) -> None:
+        """
+        Publish many messages at once, with their confirms in flight together.
+        """
+        await asyncio.gather(*(self.publish(body, routing_key) for body in bodies))
+
+    async def _publish(self, body: bytes, routing_key: str) -> None:
+        async with self._channel_pool.acquire() as channel:
+            await channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=body, delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+                ),
+                routing_key=routing_key,
+                mandatory=True,
+                timeout=self.publish_timeout,
+            )
+        self.stats["published"] += 1
+
+    def _enqueue(self, body: bytes, routing_key: str) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            raise PublisherBufferFull(
+                f"{len(self._buffer)} messages are already waiting for the broker"
+            )
+        self._buffer.append((body, routing_key))
+        self._buffer_not_empty.set()
+        self.stats["buffered"] += 1
+
+    async def _drain(self) -> None:
+        delay = 0.5
+        while True:
+            await self._buffer_not_empty.wait()
+            while self._buffer:
+                body, routing_key = self._buffer[0]
+                try:
+                    await self._publish(body, routing_key)
+                except (DeliveryError, PublishError) as e:
+                    self.stats["rejected"] += 1
+                    logging.error(f"Publisher: Dropping rejected message {e!r}")
+                except (asyncio.TimeoutError, *CONNECTION_EXCEPTIONS):
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30)
+                    continue
+
+                self._buffer.popleft()
+                delay = 0.5
+            self._buffer_not_empty.clear()
@@ -0,0 +1,280 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+Loader = Callable[[AsyncSession, list[str]], Awaitable[dict[str, str]]]
+Writer = Callable[[AsyncSession, dict[str, str]], Awaitable[None]]
+
+INVALIDATION_CHANNEL = "cache-invalidation:{name}"
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache whose entries expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    Read-through cache looking keys up in a process-local LRU, then Redis,
+    then MySQL, back-filling the faster tiers on the way out.
+
+    Concurrent lookups of the same cold key share a single trip to the
+    slower tiers. Writes go to every tier and tell the other replicas, over
+    Redis pub/sub, to drop the key from their local tier.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis: Redis,
+        loader: Loader | None = None,
+        writer: Writer | None = None,
+        local_maxsize: int = 10_000,
+        local_ttl: float = 300,
+        redis_ttl: int | None = None,
+    ):
+        """
+        :param name: Name of the cache, used for the invalidation channel and stats
+        :param redis: Redis connection
+        :param loader: Loads the given keys from MySQL, returns the ones found
+        :param writer: Saves the given keys to MySQL
+        :param local_maxsize: Max number of keys in the process-local tier
+        :param local_ttl: Seconds a key stays in the process-local tier
+        :param redis_ttl: Seconds a key stays in Redis, forever if None
+        """
+        self.name = name
+        self.redis = redis
+        self.loader = loader
+        self.writer = writer
+        self.redis_ttl = redis_ttl
+
+        self._local = LocalCache(maxsize=local_maxsize, ttl=local_ttl)
+        self._pending: dict[str, asyncio.Future] = {}
+        self._channel = INVALIDATION_CHANNEL.format(name=name)
+        self._instance_id = uuid.uuid4().hex
+        self._listener: asyncio.Task | None = None
+
+        self.stats = {
+            "local_hits": 0,
+            "local_misses": 0,
+            "redis_hits": 0,
+            "redis_misses": 0,
+            "db_hits": 0,
+            "db_misses": 0,
+        }
+
+    async def get(self, key: str, session: AsyncSession | None = None) -> str | None:
+        """
+        Get a value, looking it up in MySQL too if a session is given.
+        """
+        return (await self.get_many([key], session=session)).get(key)
+
+    async def get_many(
+        self, keys: list[str], session: AsyncSession | None = None
+    ) -> dict[str, str]:
+        """
+        Get many values at once, with one Redis and one MySQL round-trip
+        at most.
+
+        :return: Values of the keys that were found
+        """
+        result = {}
+        waiting = {}
+        to_load = []
+
+        for key in dict.fromkeys(keys):
+            value = self._local.get(key)
+            if value is not None:
+                self.stats["local_hits"] += 1
+                result[key] = value
+            elif key in self._pending:
+                waiting[key] = self._pending[key]
+            else:
+                self.stats["local_misses"] += 1
+                to_load.append(key)
+
+        if to_load:
+            result.update(await self._load_coalesced(to_load, session=session))
+
+        for key, future in waiting.items():
+            value = await future
+            if value is not None:
+                result[key] = value
+
+        return result
+
+    async def _load_coalesced(
+        self, keys: list[str], session: AsyncSession | None
+    ) -> dict[str, str]:
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in keys}
+        self._pending.update(futures)
+
+        try:
+            loaded = await self._load(keys, session=session)
+        except asyncio.CancelledError:
+            for future in futures.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in futures.values():
+                future.set_exception(e)
+                # Only the callers waiting on the key should see the error
+                future.exception()
+            raise
+        else:
+            for key, future in futures.items():
+                future.set_result(loaded.get(key))
+            return loaded
+        finally:
+            for key in keys:
+                self._pending.pop(key, None)
+
+    async def _load(
+        self, keys: list[str], session: AsyncSession | None
+    ) -> dict[str, str]:
+        loaded = {}
+
+        values = await self.redis.mget(keys)
+        missing = []
+        for key, value in zip(keys, values):
+            if value is None:
+                missing.append(key)
+            else:
+                loaded[key] = value
+                self._local.set(key, value)
+        self.stats["redis_hits"] += len(loaded)
+        self.stats["redis_misses"] += len(missing)
+
+        if missing and self.loader and session is not None:
+            from_db = await self.loader(session, missing)
+            self.stats["db_hits"] += len(from_db)
+            self.stats["db_misses"] += len(missing) - len(from_db)
+
+            if from_db:
+                await self._set_redis(from_db)
+                for key, value in from_db.items():
+                    self._local.set(key, value)
+                loaded.update(from_db)
+
+        return loaded
+
+    async def set(
+        self, key: str, value: str, session: AsyncSession | None = None
+    ) -> None:
+        """
+        Set a value, saving it to MySQL too if a session is given.
+        """
+        await self.set_many({key: value}, session=session)
+
+    async def set_many(
+        self, mapping: dict[str, str], session: AsyncSession | None = None
+    ) -> None:
+        """
+        Set many values at once, with one Redis round-trip.
+        """
+        if not mapping:
+            return
+
+        if self.writer and session is not None:
+            await self.writer(session, mapping)
+
+        await self._set_redis(mapping)
+        for key, value in mapping.items():
+            self._local.set(key, value)
+
+        await self._publish_invalidation(list(mapping))
+
+    async def invalidate(self, keys: list[str]) -> None:
+        """
+        Drop keys from Redis and from the local tier of every replica.
+        """
+        for key in keys:
+            self._local.delete(key)
+        await self.redis.delete(*keys)
+        await self._publish_invalidation(keys)
+
+    async def _set_redis(self, mapping: dict[str, str]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=self.redis_ttl)
+            await pipe.execute()
+
+    async def _publish_invalidation(self, keys: list[str]) -> None:
+        message = json.dumps({"sender": self._instance_id, "keys": keys})
+        await self.redis.publish(self._channel, message)
+
+    async def start(self) -> None:
+        """
+        Start listening for invalidations sent by the other replicas.
+        """
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self._channel)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+
+                        data = json.loads(message["data"])
+                        if data["sender"] == self._instance_id:
+                            continue
+                        for key in data["keys"]:
+                            self._local.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Entries may be stale until we're back, drop them all
+                logging.error(f"Cache {self.name}: invalidation listener failed {e}")
+                self._local = LocalCache(self._local.maxsize, self._local.ttl)
+                await asyncio.sleep(1)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "local_size": len(self._local)}
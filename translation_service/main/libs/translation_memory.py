@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import logging
+import re
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .tiered_cache import TieredCache
+
+TranslateMany = Callable[[list[str]], Awaitable[list[str]]]
+
+SEGMENT_KEY = "tm:{src}:{dest}:{digest}"
+
+# Text is cut after sentence-ending punctuation and at line breaks, the
+# separators are kept as is so the text can be put back together exactly
+_SEPARATOR_PATTERN = re.compile(r"(\s*\n\s*|(?<=[.!?…])\s+)")
+
+
+def split_segments(text: str) -> list[str]:
+    """
+    Split a text into sentences and the separators between them.
+
+    :return: Sentences at even indices, separators at odd indices
+    """
+    return _SEPARATOR_PATTERN.split(text)
+
+
+def segment_key(segment: str, src: str, dest: str) -> str:
+    digest = hashlib.sha256(segment.encode("utf-8")).hexdigest()
+    return SEGMENT_KEY.format(src=src, dest=dest, digest=digest)
+
+
+class TranslationMemory:
+    """
+    Sentence-level memory of past translations.
+
+    Texts are split into sentences, which are all looked up at once in the
+    memory (local, then Redis with a single MGET, then MySQL). Only the
+    sentences never seen before are sent to the provider, and their
+    translations are saved in the background.
+    """
+
+    def __init__(
+        self,
+        cache: TieredCache,
+        session_factory: Callable[[], AsyncSession],
+        translate_many: TranslateMany,
+        src: str = "en",
+        dest: str = "vi",
+    ):
+        """
+        :param cache: Segment key -> translation cache
+        :param session_factory: Creates the sessions used by the cache
+        :param translate_many: Translates the sentences missing from the memory
+        :param src: Source language
+        :param dest: Target language
+        """
+        self.cache = cache
+        self.session_factory = session_factory
+        self.translate_func = translate_many
+        self.src = src
+        self.dest = dest
+
+        self._saving: set[asyncio.Task] = set()
+        self.stats = {"segments": 0, "hits": 0}
+
+    def key(self, segment: str) -> str:
+        return segment_key(segment, src=self.src, dest=self.dest)
+
+    async def translate_many(self, texts: list[str]) -> list[str]:
+        """
+        Translate texts, sentence by sentence, through the memory.
+
+        :return: Translation of each text, in order
+        """
+        parts = [split_segments(text) for text in texts]
+        keys = {
+            segment: self.key(segment)
+            for text_parts in parts
+            for segment in text_parts[::2]
+            if segment.strip()
+        }
+
+        async with self.session_factory() as session:
+            found = await self.cache.get_many(list(keys.values()), session=session)
+        translations = {
+            segment: found[key] for segment, key in keys.items() if key in found
+        }
+        self.stats["segments"] += len(keys)
+        self.stats["hits"] += len(translations)
+
+        missing = [segment for segment in keys if segment not in translations]
+        if missing:
+            try:
+                translated = await self.translate_func(missing)
+            except Exception as e:
+                # Keep what was translated, a retry only sends the rest
+                if done := getattr(e, "translated", None):
+                    done = {missing[i]: text for i, text in done.items()}
+                    self._save({keys[segment]: text for segment, text in done.items()})
+                    translations.update(done)
+                    # Indexed by text rather than by segment, for the batcher
+                    e.translated = {
+                        i: self._join(text_parts, translations)
+                        for i, text_parts in enumerate(parts)
+                        if all(
+                            segment in translations
+                            for segment in text_parts[::2]
+                            if segment in keys
+                        )
+                    }
+                raise
+
+            translations.update(zip(missing, translated))
+            self._save({keys[segment]: translations[segment] for segment in missing})
+
+        return [self._join(text_parts, translations) for text_parts in parts]
+
+    @staticmethod
+    def _join(text_parts: list[str], translations: dict[str, str]) -> str:
+        return "".join(
+            translations.get(part, part) if i % 2 == 0 else part
+            for i, part in enumerate(text_parts)
+        )
+
+    async def add_many(self, pairs: dict[str, str]) -> None:
+        """
+        Save source -> translation pairs of sentences to the memory.
+        """
+        mapping = {self.key(source): target for source, target in pairs.items()}
+        async with self.session_factory() as session:
+            await self.cache.set_many(mapping, session=session)
+
+    def _save(self, mapping: dict[str, str]) -> None:
+        task = asyncio.create_task(self._save_now(mapping))
+        self._saving.add(task)
+        task.add_done_callback(self._saving.discard)
+
+    async def _save_now(self, mapping: dict[str, str]) -> None:
+        try:
+            async with self.session_factory() as session:
+                await self.cache.set_many(mapping, session=session)
+        except Exception as e:
+            logging.error(f"Translation memory: Failed to save {len(mapping)} {e!r}")
+
+    async def close(self) -> None:
+        if self._saving:
+            await asyncio.gather(*self._saving, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, **self.cache.get_stats()}
@@ -1 +1 @@
-__all__ = ["item", "retry_job"]
+__all__ = ["item", "retry_job", "translation_memory"]
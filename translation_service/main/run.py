@@ -2,16 +2,28 @@
 import asyncio
 import json
 import traceback
+from functools import partial
 
 import aio_pika
-from sqlalchemy import select
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from _config import config
+from libs.batcher import MicroBatcher
+from libs.consumer import Consumer
+from libs.publisher import Publisher
+from libs.tiered_cache import TieredCache
+from libs.translation_memory import TranslationMemory
 from schemas.message import MessageSchema
-from services import translation_service
+from services import inflight_service, job_service, translation_service
+from services.job_service import JobEvent, JobStage
+from services.rate_limiter import AIMDController, RateLimiter
+from services.translation_backends import create_backends
 from models.retry_job import RetryJobModel
+from models.translation_memory import TranslationMemoryModel
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +45,13 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+publisher = Publisher(
+    url=config.RABBITMQ_CONNECTION,
+    channels=config.RABBITMQ_PUBLISHER_CHANNELS,
+    max_buffered=config.RABBITMQ_PUBLISHER_BUFFER,
+    publish_timeout=config.RABBITMQ_PUBLISH_TIMEOUT,
+)
+
 
 # Dependency to get the session
 async def get_db_session():
@@ -40,21 +59,131 @@ async def get_db_session():
         yield session
 
 
+async def get_memory_segments(
+    session: AsyncSession, segment_keys: list[str]
+) -> dict[str, str]:
+    stmt = select(
+        TranslationMemoryModel.segment_key, TranslationMemoryModel.translated_text
+    )
+    stmt = stmt.where(TranslationMemoryModel.segment_key.in_(segment_keys))
+    stmt = stmt.where(TranslationMemoryModel.is_deleted.is_(False))
+    result = await session.execute(stmt)
+    return {segment_key: text for segment_key, text in result.all()}
+
+
+async def save_memory_segments(session: AsyncSession, translations: dict[str, str]):
+    # The sentence may have been translated by another worker in the meantime
+    stmt = insert(TranslationMemoryModel).prefix_with("IGNORE")
+    await session.execute(
+        stmt,
+        [
+            {"segment_key": segment_key, "translated_text": text}
+            for segment_key, text in translations.items()
+        ],
+    )
+    await session.commit()
+
+
+redis = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, decode_responses=True)
+
+
+def create_rate_limiters() -> dict[str, RateLimiter]:
+    """
+    Rate limiters of the backends whose provider limit is shared by every
+    worker.
+    """
+    if not config.TRANSLATION_RATE_LIMIT:
+        return {}
+
+    return {
+        name: RateLimiter(
+            name=name,
+            redis=redis,
+            rate=config.TRANSLATION_RATE_LIMIT,
+            burst=config.TRANSLATION_RATE_BURST,
+            max_wait=config.TRANSLATION_RATE_MAX_WAIT,
+            concurrency=AIMDController(
+                initial=config.TRANSLATION_CONCURRENCY_INITIAL,
+                min_limit=config.TRANSLATION_CONCURRENCY_MIN,
+                max_limit=config.TRANSLATION_CONCURRENCY_MAX,
+            ),
+        )
+        for name in config.TRANSLATION_RATE_LIMITED_BACKENDS
+    }
+
+
+translation_service.translation_router.configure(
+    backends=create_backends(
+        config.TRANSLATION_BACKENDS,
+        dictionary_path=config.TRANSLATION_LOCAL_DICTIONARY_PATH,
+    ),
+    limiters=create_rate_limiters(),
+    request_timeout=config.TRANSLATION_REQUEST_TIMEOUT,
+    retries=config.TRANSLATION_RETRIES,
+    retry_delay=config.TRANSLATION_RETRY_DELAY,
+    hedge_percentile=config.TRANSLATION_HEDGE_PERCENTILE,
+    hedge_min_delay=config.TRANSLATION_HEDGE_MIN_DELAY_MS / 1000,
+    failure_threshold=config.TRANSLATION_BREAKER_FAILURES,
+    reset_timeout=config.TRANSLATION_BREAKER_RESET_SECONDS,
+)
+
+translate_many = partial(
+    translation_service.translate_many,
+    max_chars=config.TRANSLATION_BATCH_MAX_CHARS,
+    max_concurrency=config.TRANSLATION_MAX_CONCURRENT_REQUESTS,
+)
+
+# segment key -> translated sentence
+translation_memory = TranslationMemory(
+    cache=TieredCache(
+        name="translation_memory",
+        redis=redis,
+        loader=get_memory_segments,
+        writer=save_memory_segments,
+        local_maxsize=config.TRANSLATION_MEMORY_LOCAL_MAXSIZE,
+        local_ttl=config.TRANSLATION_MEMORY_LOCAL_TTL,
+        redis_ttl=config.TRANSLATION_MEMORY_REDIS_TTL,
+    ),
+    session_factory=AsyncSessionLocal,
+    translate_many=translate_many,
+)
+
+# Texts of the messages handled at the same time are translated together
+batcher = MicroBatcher(
+    (
+        translation_memory.translate_many
+        if config.TRANSLATION_MEMORY_ENABLED
+        else translate_many
+    ),
+    max_size=config.TRANSLATION_BATCH_SIZE,
+    max_wait=config.TRANSLATION_BATCH_WAIT_MS / 1000,
+)
+
+
 PHASE = 2
 
 
 async def publish_message(message: str):
-    connection = await aio_pika.connect_robust(config.RABBITMQ_CONNECTION)
-    async with connection:
-        channel = await connection.channel(
-            publisher_confirms=True, on_return_raises=True
+    await publisher.publish(message, routing_key=config.RABBITMQ_QUEUE_TRANSLATE_TO_PDF)
+    logging.info(f"Translation: Published message {message} to RabbitMQ")
+
+
+async def record_job(job_uuid: str, event: str, **kwargs) -> None:
+    # The job's state is only informative, failing to record it mustn't fail
+    # the job
+    try:
+        await job_service.record(
+            redis=redis,
+            job_uuid=job_uuid,
+            stage=JobStage.TRANSLATION,
+            event=event,
+            ttl=config.JOB_TTL,
+            **kwargs,
         )
-        await channel.default_exchange.publish(
-            aio_pika.Message(body=message.encode()),
-            routing_key=config.RABBITMQ_QUEUE_TRANSLATE_TO_PDF,
-            mandatory=True,
+    except RedisError as e:
+        logging.warning(
+            f"Translation: Failed to record the state of job {job_uuid} {e}"
         )
-        logging.info(f"Translation: Published message {message} to RabbitMQ")
 
 
 async def create_retry_job(session: AsyncSession, data: dict) -> RetryJobModel:
@@ -64,6 +193,38 @@ async def create_retry_job(session: AsyncSession, data: dict) -> RetryJobModel:
     return job
 
 
+async def fail_subscribers(image_hash: str, error: str) -> None:
+    """
+    Release the image's in-flight job after it failed, and fail every
+    request that was attached to it instead of leaving it waiting.
+    """
+    # Like the job's state, this mustn't hide the failure being handled
+    try:
+        await inflight_service.fail(
+            redis=redis,
+            image_hash=image_hash,
+            stage=JobStage.TRANSLATION,
+            error=error,
+            ttl=config.JOB_TTL,
+        )
+    except RedisError as e:
+        logging.warning(
+            f"Translation: Failed to release the job of image {image_hash} {e}"
+        )
+
+
+async def handle_rejected_message(message: aio_pika.IncomingMessage, error: str):
+    """
+    Fail the job of a message dead-lettered by the consumer, and its
+    subscribers.
+    """
+    data = json.loads(message.body.decode())
+    # A retried job released its image when it first failed
+    if not data.get("job_ids"):
+        await record_job(job_uuid=data["job_uuid"], event=JobEvent.FAILED, error=error)
+        await fail_subscribers(image_hash=data["image_hash"], error=error)
+
+
 async def handle_normal_flow(data: dict, session: AsyncSession):
     data = MessageSchema(**data)
     logging.info(
@@ -72,11 +233,18 @@ async def handle_normal_flow(data: dict, session: AsyncSession):
     # your business logic here, use shared functions or DB access
     text_to_translate = data.text_to_translate
     try:
-        translated_text = await translation_service.translate(text=text_to_translate)
+        await record_job(job_uuid=data.job_uuid, event=JobEvent.STARTED)
+        translated_text = await batcher.submit(text_to_translate)
 
         data.translated_text = translated_text
+        # Recorded first, the PDF may start as soon as it's published
+        await record_job(
+            job_uuid=data.job_uuid,
+            event=JobEvent.FINISHED,
+            next_stage=JobStage.PDF,
+        )
         await publish_message(message=json.dumps(data.model_dump()))
-    except Exception:
+    except Exception as e:
         await create_retry_job(
             session=session,
             data={
@@ -95,6 +263,8 @@ async def handle_normal_flow(data: dict, session: AsyncSession):
                 "job_uuid": data.job_uuid,
             },
         )
+        await record_job(job_uuid=data.job_uuid, event=JobEvent.FAILED, error=str(e))
+        await fail_subscribers(image_hash=data.image_hash, error=str(e))
 
 
 async def get_failed_jobs(
@@ -116,41 +286,69 @@ async def handle_retry_flow(session: AsyncSession, job_ids: list[int]):
     if failed_jobs:
         for job in failed_jobs:
             try:
+                await record_job(job_uuid=job.job_uuid, event=JobEvent.STARTED)
                 text_to_translate = job.text_to_translate
-                translated_text = await translation_service.translate(
-                    text=text_to_translate
-                )
+                translated_text = await batcher.submit(text_to_translate)
                 job.translated_text = translated_text
                 job.step = NEXT_PHASE
+                await record_job(
+                    job_uuid=job.job_uuid,
+                    event=JobEvent.FINISHED,
+                    next_stage=JobStage.PDF,
+                )
 
             except Exception as e:
                 job.job_metadata = json.dumps(
                     {"error": str(e), "trace": traceback.format_exc()}
                 )
+                await record_job(
+                    job_uuid=job.job_uuid, event=JobEvent.FAILED, error=str(e)
+                )
 
     await session.commit()
 
 
 async def handle_message(message: aio_pika.IncomingMessage):
-    async with message.process():
-        data = message.body.decode()
-        data = json.loads(data)
-        async for session in get_db_session():
-            if not (job_ids := data.get("job_ids")):
-                await handle_normal_flow(data=data, session=session)
-            else:
-                await handle_retry_flow(session=session, job_ids=job_ids)
+    data = message.body.decode()
+    data = json.loads(data)
+    async for session in get_db_session():
+        if not (job_ids := data.get("job_ids")):
+            await handle_normal_flow(data=data, session=session)
+        else:
+            await handle_retry_flow(session=session, job_ids=job_ids)
+
+
+async def log_stats():
+    while True:
+        await asyncio.sleep(config.TRANSLATION_STATS_INTERVAL)
+        logging.info(
+            f"Translation: backends {translation_service.translation_router.get_stats()}"
+        )
 
 
 async def main():
-    connection = await aio_pika.connect_robust(config.RABBITMQ_CONNECTION)
-    channel = await connection.channel(publisher_confirms=True, on_return_raises=True)
-    queue = await channel.declare_queue(
-        config.RABBITMQ_QUEUE_OCR_TO_TRANSLATE, durable=True
+    await publisher.start()
+    await batcher.start()
+    stats_logger = asyncio.create_task(log_stats())
+
+    consumer = Consumer(
+        url=config.RABBITMQ_CONNECTION,
+        queue_name=config.RABBITMQ_QUEUE_OCR_TO_TRANSLATE,
+        handler=handle_message,
+        concurrency=config.WORKER_CONCURRENCY,
+        prefetch_count=config.RABBITMQ_PREFETCH_COUNT,
+        message_timeout=config.WORKER_MESSAGE_TIMEOUT,
+        on_reject=handle_rejected_message,
     )
-    await queue.consume(handle_message)
 
-    await asyncio.Future()  # keep the script alive
+    try:
+        await consumer.run()
+    finally:
+        stats_logger.cancel()
+        await batcher.close()
+        await translation_memory.close()
+        await translation_service.translation_router.close()
+        await publisher.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+import json
+import time
+
+from redis.asyncio import Redis
+
+# State of a job, a hash updated by every stage it goes through:
+#   state, stage, pdf_url, error,
+#   <stage>_enqueued_at, <stage>_started_at, <stage>_finished_at,
+#   <stage>_failed_at, completed_at
+JOB_KEY = "job:{job_uuid}"
+JOB_TTL = 86400
+
+# Every finished job is announced on this channel, each gateway replica
+# subscribes once and hands the results to the clients waiting on it
+JOB_EVENTS_CHANNEL = "job-events"
+
+
+class JobState:
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobStage:
+    OCR = "ocr"
+    TRANSLATION = "translation"
+    PDF = "pdf"
+
+
+class JobEvent:
+    ENQUEUED = "enqueued"
+    STARTED = "started"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+
+_EVENT_STATES = {
+    JobEvent.ENQUEUED: JobState.QUEUED,
+    JobEvent.STARTED: JobState.PROCESSING,
+    JobEvent.FAILED: JobState.FAILED,
+}
+
+
+async def _update(redis: Redis, job_uuid: str, mapping: dict, ttl: int) -> None:
+    key = JOB_KEY.format(job_uuid=job_uuid)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, ttl)
+        await pipe.execute()
+
+
+async def record(
+    redis: Redis,
+    job_uuid: str,
+    stage: str,
+    event: str,
+    next_stage: str | None = None,
+    error: str | None = None,
+    ttl: int = JOB_TTL,
+) -> None:
+    """
+    Record that a stage of a job was enqueued, started, finished or failed,
+    with the current time.
+
+    :param redis: Redis connection
+    :param job_uuid: Job to update
+    :param stage: One of JobStage
+    :param event: One of JobEvent
+    :param next_stage: Stage the job was enqueued to once this one finished
+    :param error: Why the stage failed
+    :param ttl: Seconds the job's state is kept after this update
+    """
+    now = f"{time.time():.3f}"
+    mapping = {"stage": stage, f"{stage}_{event}_at": now}
+    if event in _EVENT_STATES:
+        mapping["state"] = _EVENT_STATES[event]
+    if next_stage is not None:
+        mapping.update(
+            {
+                "stage": next_stage,
+                "state": JobState.QUEUED,
+                f"{next_stage}_{JobEvent.ENQUEUED}_at": now,
+            }
+        )
+    if error is not None:
+        mapping["error"] = error
+    await _update(redis, job_uuid, mapping, ttl=ttl)
+
+
+async def publish_result(
+    redis: Redis, job_uuid: str, pdf_url: str, ttl: int = JOB_TTL
+) -> None:
+    """
+    Mark a job as completed and announce its result to the gateways.
+
+    :param redis: Redis connection
+    :param job_uuid: Finished job
+    :param pdf_url: URL of its PDF
+    :param ttl: Seconds the job's state and result can still be fetched
+    """
+    key = JOB_KEY.format(job_uuid=job_uuid)
+    event = json.dumps({"job_uuid": job_uuid, "pdf_url": pdf_url})
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hset(
+            key,
+            mapping={
+                "state": JobState.COMPLETED,
+                "pdf_url": pdf_url,
+                "completed_at": f"{time.time():.3f}",
+            },
+        )
+        pipe.expire(key, ttl)
+        pipe.publish(JOB_EVENTS_CHANNEL, event)
+        await pipe.execute()
+
+
+async def get_results(redis: Redis, job_uuids: list[str]) -> list[str | None]:
+    """
+    :return: URL of each job's PDF, None for the jobs not finished
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for job_uuid in job_uuids:
+            pipe.hget(JOB_KEY.format(job_uuid=job_uuid), "pdf_url")
+        return await pipe.execute()
+
+
+async def get_result(redis: Redis, job_uuid: str) -> str | None:
+    """
+    :return: URL of the job's PDF, None if the job isn't finished
+    """
+    return await redis.hget(JOB_KEY.format(job_uuid=job_uuid), "pdf_url")
+
+
+async def get_jobs(redis: Redis, job_uuids: list[str]) -> list[dict[str, str]]:
+    """
+    Read the state of many jobs with one round-trip.
+
+    :return: Fields of each job, empty for the unknown or expired ones
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for job_uuid in job_uuids:
+            pipe.hgetall(JOB_KEY.format(job_uuid=job_uuid))
+        return await pipe.execute()
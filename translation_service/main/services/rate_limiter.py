@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+# Token bucket shared by every worker. Refills at ARGV[1] tokens per second
+# up to ARGV[2], returns 0 if a token was taken, else the seconds to wait
+_TAKE_TOKEN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+RATE_LIMIT_KEY = "rate-limit:{name}"
+
+# Status codes of a provider asking us to slow down
+_THROTTLING_STATUS_CODES = {429, 503}
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def is_throttling_error(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    if status_code is None:
+        status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in _THROTTLING_STATUS_CODES
+    return "429" in str(error) or "Too Many Requests" in str(error)
+
+
+class AIMDController:
+    """
+    Concurrency limit growing by one request per window of successes and
+    cut by ``decrease_factor`` on throttling, at most once per ``cooldown``
+    seconds so a burst of throttled requests counts as one.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self.limit = float(initial)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            self._last_decrease = now
+
+
+class RateLimiter:
+    """
+    Keeps the requests of every worker to a provider under ``rate`` per
+    second with a token bucket in Redis, and the requests of this worker
+    under the concurrency found by an ``AIMDController``.
+
+    If Redis can't be reached, requests are only limited by the concurrency.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis: Redis,
+        rate: float,
+        burst: int = 1,
+        max_wait: float = 30,
+        concurrency: AIMDController | None = None,
+    ):
+        """
+        :param name: Name of the limited provider, shared by every worker
+        :param redis: Redis connection
+        :param rate: Max requests per second across every worker
+        :param burst: Max requests sent at once after an idle period
+        :param max_wait: Max seconds to wait for a token before giving up
+        :param concurrency: Concurrency controller of this worker
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.concurrency = concurrency or AIMDController()
+
+        self._key = RATE_LIMIT_KEY.format(name=name)
+        self._script = redis.register_script(_TAKE_TOKEN_SCRIPT)
+        self._sent: deque[float] = deque()
+
+        self.stats = {
+            "requests": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "rejections": 0,
+            "throttles": 0,
+            "redis_errors": 0,
+        }
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Wait for the right to send a request, then tell the concurrency
+        controller how it went.
+
+        :raises RateLimitExceeded: if no token came within ``max_wait``
+        """
+        await self.concurrency.acquire()
+        try:
+            await self._take_token()
+            self._record_request()
+            try:
+                yield
+            except Exception as e:
+                if is_throttling_error(e):
+                    self.stats["throttles"] += 1
+                    self.concurrency.on_throttle()
+                raise
+            else:
+                self.concurrency.on_success()
+        finally:
+            await self.concurrency.release()
+
+    async def _take_token(self) -> None:
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            try:
+                wait = float(
+                    await self._script(keys=[self._key], args=[self.rate, self.burst])
+                )
+            except RedisError as e:
+                self.stats["redis_errors"] += 1
+                logging.warning(f"Rate limiter {self.name}: Redis unavailable {e}")
+                return
+
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                self.stats["rejections"] += 1
+                raise RateLimitExceeded(
+                    f"No {self.name} token within {self.max_wait} seconds"
+                )
+
+            self.stats["waits"] += 1
+            self.stats["wait_seconds"] += wait
+            await asyncio.sleep(wait)
+
+    def _record_request(self, window: float = 60) -> None:
+        now = time.monotonic()
+        self._sent.append(now)
+        while self._sent[0] < now - window:
+            self._sent.popleft()
+        self.stats["requests"] += 1
+
+    def get_stats(self, window: float = 60) -> dict:
+        now = time.monotonic()
+        recent = sum(1 for sent_at in self._sent if sent_at >= now - window)
+        return {
+            **self.stats,
+            "rate": recent / window,
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+        }
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+
+DEFAULT_DICTIONARY_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "commons", "dictionaries", "en_vi.json"
+)
+
+
+class TranslationBackend(ABC):
+    name: str
+
+    @abstractmethod
+    async def translate(self, text: str, src: str, dest: str) -> str:
+        """
+        Translate a text from ``src`` to ``dest``.
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class GoogletransBackend(TranslationBackend):
+    """
+    Google Translate, through the unofficial web API of googletrans.
+    """
+
+    name = "googletrans"
+
+    def __init__(self):
+        from googletrans import Translator
+
+        self._translator = Translator()
+
+    async def translate(self, text: str, src: str, dest: str) -> str:
+        result = await self._translator.translate(text, src=src, dest=dest)
+        return result.text
+
+
+class LocalBackend(TranslationBackend):
+    """
+    Offline word-by-word translation from a phrase table, longest phrase
+    first. Words missing from the table are kept as they are.
+
+    Far below a real provider, its translations would be cached like any
+    other, so it's a stand-in for local runs, tests and benchmarks only.
+    """
+
+    name = "local"
+
+    _WORD_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+
+    def __init__(self, dictionary_path: str | None = None):
+        """
+        :param dictionary_path: JSON object of lowercase phrase -> translation
+        """
+        with open(dictionary_path or DEFAULT_DICTIONARY_PATH, encoding="utf-8") as f:
+            self.phrases: dict[str, str] = json.load(f)
+        self._max_words = max(
+            (len(phrase.split()) for phrase in self.phrases), default=0
+        )
+
+    async def translate(self, text: str, src: str, dest: str) -> str:
+        return self.translate_sync(text)
+
+    def translate_sync(self, text: str) -> str:
+        words = list(self._WORD_PATTERN.finditer(text))
+        output = []
+        position = 0
+        i = 0
+        while i < len(words):
+            for n in range(min(self._max_words, len(words) - i), 0, -1):
+                phrase_words = words[i : i + n]
+                # Only words separated by spaces make up a phrase
+                if any(
+                    text[left.end() : right.start()] != " "
+                    for left, right in zip(phrase_words, phrase_words[1:])
+                ):
+                    continue
+                phrase = " ".join(word.group().lower() for word in phrase_words)
+                if (translation := self.phrases.get(phrase)) is None:
+                    continue
+
+                start, end = phrase_words[0].start(), phrase_words[-1].end()
+                if phrase_words[0].group()[0].isupper():
+                    translation = translation[:1].upper() + translation[1:]
+                output += [text[position:start], translation]
+                position = end
+                i += n
+                break
+            else:
+                i += 1
+
+        output.append(text[position:])
+        return "".join(output)
+
+
+BACKENDS: dict[str, type[TranslationBackend]] = {
+    GoogletransBackend.name: GoogletransBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+
+def create_backends(
+    names: list[str], dictionary_path: str | None = None
+) -> list[TranslationBackend]:
+    """
+    Create the translation backends registered under ``names``, in order.
+
+    Backends that are unknown or can't be initialized, e.g. googletrans is
+    not installed, are left out.
+
+    :raises ValueError: if none of the backends could be created
+    """
+    backends = []
+    for name in names:
+        backend_class = BACKENDS.get(name)
+        if backend_class is None:
+            logging.warning(f"Translation: Unknown backend {name}, skipping it")
+            continue
+
+        try:
+            if backend_class is LocalBackend:
+                backends.append(LocalBackend(dictionary_path=dictionary_path))
+            else:
+                backends.append(backend_class())
+        except (ImportError, OSError, ValueError) as e:
+            logging.warning(f"Translation: Can't start {name} backend ({e})")
+
+    if not backends:
+        raise ValueError(f"No translation backend could be started from {names}")
+    return backends
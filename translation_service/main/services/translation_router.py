@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from .rate_limiter import RateLimiter, RateLimitExceeded
+from .translation_backends import TranslationBackend
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend after ``failure_threshold`` failures in a row.
+
+    Once ``reset_timeout`` seconds have passed, a single trial request is let
+    through: the circuit closes again if it succeeds, stays open otherwise.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """
+        Whether a request may be sent now. In half-open state, the caller
+        that gets True owns the trial request and must settle it.
+        """
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """
+        Give the trial request up without a result, e.g. it was cancelled.
+        """
+        self._probing = False
+
+
+class LatencyWindow:
+    """
+    Latencies of the last ``size`` successful requests.
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class _Route:
+    def __init__(
+        self,
+        backend: TranslationBackend,
+        breaker: CircuitBreaker,
+        limiter: RateLimiter | None = None,
+    ):
+        self.backend = backend
+        self.breaker = breaker
+        self.limiter = limiter
+        self.latencies = LatencyWindow()
+        self.stats = {"requests": 0, "failures": 0, "hedges": 0, "hedge_wins": 0}
+
+
+class TranslationRouter:
+    """
+    Sends each translation to the first backend, in fallback order, whose
+    circuit is closed, and to the next ones if it fails.
+
+    A request still running once the backend's usual latency percentile has
+    passed is hedged: the same request is sent again and the first answer
+    wins, so a few stuck connections don't hold whole batches back.
+
+    A failed request is tried again on the same backend, with backoff,
+    before falling back to the next one.
+
+    Requests of a backend with a rate limiter wait for their turn first,
+    the wait doesn't count towards the request's timeout, latency nor hedge
+    delay.
+    """
+
+    def __init__(self, backends: list[TranslationBackend], **options):
+        self.configure(backends=backends, **options)
+
+    def configure(
+        self,
+        backends: list[TranslationBackend],
+        limiters: dict[str, RateLimiter] | None = None,
+        request_timeout: float = 10,
+        retries: int = 3,
+        retry_delay: float = 1,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay: float = 0.1,
+        hedge_min_samples: int = 20,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+    ) -> None:
+        """
+        :param backends: Backends in fallback order
+        :param limiters: Backend name -> rate limiter its requests go through
+        :param request_timeout: Seconds before a request counts as failed
+        :param retries: Tries per backend before falling back to the next one
+        :param retry_delay: Seconds before the first retry, doubled after each
+        :param hedge_percentile: Latency percentile after which a request is
+            hedged, 0 disables hedging
+        :param hedge_min_delay: Min seconds before a request is hedged
+        :param hedge_min_samples: Latencies needed before hedging a backend
+        :param failure_threshold: Failures in a row opening a backend's circuit
+        :param reset_timeout: Seconds before an open circuit lets a trial
+            request through
+        """
+        self.request_timeout = request_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self._routes = [
+            _Route(
+                backend=backend,
+                breaker=CircuitBreaker(
+                    failure_threshold=failure_threshold, reset_timeout=reset_timeout
+                ),
+                limiter=(limiters or {}).get(backend.name),
+            )
+            for backend in backends
+        ]
+
+    async def translate(self, text: str, src: str, dest: str) -> str:
+        """
+        :raises CircuitOpenError: if every backend's circuit is open
+        :raises Exception: error of the last backend tried, if they all failed
+        """
+        if not self._routes:
+            raise RuntimeError("No translation backend is configured")
+
+        error = None
+        for route in self._routes:
+            delay = self.retry_delay
+            for attempt in range(self.retries):
+                # Stops retrying once the failures opened the circuit
+                if not route.breaker.allow():
+                    break
+                try:
+                    return await self._translate_hedged(route, text, src=src, dest=dest)
+                except RateLimitExceeded as e:
+                    # Already waited for its turn as long as allowed
+                    error = e
+                    break
+                except Exception as e:
+                    logging.warning(
+                        f"Translation: {route.backend.name} backend failed {e!r}"
+                    )
+                    error = e
+
+                if attempt < self.retries - 1:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+        if error is not None:
+            raise error
+        raise CircuitOpenError("Every translation backend is unavailable")
+
+    def _hedge_delay(self, route: _Route) -> float | None:
+        if not self.hedge_percentile or len(route.latencies) < self.hedge_min_samples:
+            return None
+        return max(
+            self.hedge_min_delay, route.latencies.percentile(self.hedge_percentile)
+        )
+
+    async def _translate_hedged(
+        self, route: _Route, text: str, src: str, dest: str
+    ) -> str:
+        sending = asyncio.Event()
+        first = asyncio.create_task(
+            self._request(route, text, src=src, dest=dest, sending=sending)
+        )
+        pending = {first}
+        try:
+            hedge_delay = self._hedge_delay(route)
+            if hedge_delay is not None:
+                # The delay starts once the request got its rate limit slot,
+                # a hedge sent while waiting for it would only take another
+                await self._wait_sending(first, sending)
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+                # A trial request of a half-open circuit is never hedged
+                if not done and route.breaker.state == CircuitBreaker.CLOSED:
+                    route.stats["hedges"] += 1
+                    pending.add(
+                        asyncio.create_task(
+                            self._request(route, text, src=src, dest=dest)
+                        )
+                    )
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is not first:
+                        route.stats["hedge_wins"] += 1
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def _wait_sending(request: asyncio.Task, sending: asyncio.Event) -> None:
+        sent = asyncio.create_task(sending.wait())
+        try:
+            await asyncio.wait({request, sent}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sent.cancel()
+
+    async def _request(
+        self,
+        route: _Route,
+        text: str,
+        src: str,
+        dest: str,
+        sending: asyncio.Event | None = None,
+    ) -> str:
+        """
+        :param sending: Set once the request is sent to the backend
+        """
+        try:
+            if route.limiter is None:
+                return await self._send(
+                    route, text, src=src, dest=dest, sending=sending
+                )
+            async with route.limiter.slot():
+                return await self._send(
+                    route, text, src=src, dest=dest, sending=sending
+                )
+        except (asyncio.CancelledError, RateLimitExceeded):
+            # Nothing was learnt about the backend
+            route.breaker.release()
+            raise
+
+    async def _send(
+        self,
+        route: _Route,
+        text: str,
+        src: str,
+        dest: str,
+        sending: asyncio.Event | None = None,
+    ) -> str:
+        if sending is not None:
+            sending.set()
+        route.stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.request_timeout):
+                result = await route.backend.translate(text, src=src, dest=dest)
+        except Exception:
+            route.stats["failures"] += 1
+            route.breaker.record_failure()
+            raise
+
+        route.latencies.add(time.monotonic() - started)
+        route.breaker.record_success()
+        return result
+
+    async def close(self) -> None:
+        for route in self._routes:
+            await route.backend.close()
+
+    def get_stats(self) -> dict:
+        stats = {}
+        for route in self._routes:
+            stats[route.backend.name] = {
+                **route.stats,
+                "state": route.breaker.state,
+                "p50_latency": route.latencies.percentile(0.5),
+                "p95_latency": route.latencies.percentile(0.95),
+            }
+            if route.limiter is not None:
+                stats[route.backend.name]["rate_limit"] = route.limiter.get_stats()
+        return stats
@@ -1,21 +1,176 @@
 import asyncio
+import re
 
-from googletrans import Translator
+from .translation_router import TranslationRouter
 
-translator = Translator()
+# Given its backends from the config at startup, by the worker (run.py) and
+# the API (_app.py), so importing this module doesn't need any provider
+translation_router = TranslationRouter(backends=[])
 
+# Texts of a batch are joined into a single request, on lines of their own
+# which the provider leaves untranslated
+SEGMENT_SEPARATOR = "\n\n###\n\n"
+_SEGMENT_SEPARATOR_PATTERN = re.compile(r"\s*###\s*")
 
-async def translate(text):
-    retries = 3
-    delay = 1  # Initial delay in seconds
+# Max characters sent in a single request
+MAX_REQUEST_CHARS = 4500
+# Max requests in flight for a single call of translate_many
+MAX_CONCURRENT_REQUESTS = 4
+# Times the failed requests of a translate_many call are sent again
+MAX_REQUEST_RETRIES = 1
 
-    for attempt in range(retries):
-        try:
-            result = await translator.translate(text, src="en", dest="vi")
-            return result.text
-        except Exception as e:
-            if attempt < retries - 1:  # Check if retries are remaining
-                await asyncio.sleep(delay)
-                delay *= 2  # Exponential backoff
+# Texts too long for a single request are split on the first of these
+# that gives small enough chunks: paragraphs, sentences, words
+_CHUNK_SEPARATOR_PATTERNS = [
+    re.compile(r"(\n\s*\n)"),
+    re.compile(r"((?<=[.!?…])\s+|\s*\n\s*)"),
+    re.compile(r"(\s+)"),
+]
+
+
+class PartialTranslationError(Exception):
+    """
+    Some requests of a translate_many call failed for good.
+
+    :ivar translated: Index -> translation of the texts fully translated
+    """
+
+    def __init__(self, translated: dict[int, str], failed: int):
+        super().__init__(f"{failed} translation requests failed")
+        self.translated = translated
+
+
+async def translate(text: str, src: str = "en", dest: str = "vi") -> str:
+    return await translation_router.translate(text, src=src, dest=dest)
+
+
+def split_chunks(text: str, max_chars: int, level: int = 0) -> list[str]:
+    """
+    Split a text into chunks of at most ``max_chars``, cutting between
+    paragraphs if possible, else between sentences, else between words.
+
+    :return: Chunks at even indices, the separators between them at odd
+        indices, so the text is ``"".join()`` of the result
+    """
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_CHUNK_SEPARATOR_PATTERNS):
+        # A single word longer than a request
+        parts = []
+        for start in range(0, len(text), max_chars):
+            parts += [text[start : start + max_chars], ""]
+        return parts[:-1]
+
+    pieces = _CHUNK_SEPARATOR_PATTERNS[level].split(text)
+    parts = []
+    chunk = pieces[0]
+    for separator, piece in zip(pieces[1::2], pieces[2::2]):
+        if len(chunk) + len(separator) + len(piece) <= max_chars:
+            chunk += separator + piece
+        else:
+            parts += split_chunks(chunk, max_chars, level + 1) + [separator]
+            chunk = piece
+    return parts + split_chunks(chunk, max_chars, level + 1)
+
+
+def _pack(texts: list[str], max_chars: int) -> list[list[int]]:
+    """
+    Group the texts, by index, into requests of at most ``max_chars``.
+    """
+    groups = []
+    group, size = [], 0
+    for i, text in enumerate(texts):
+        added = len(text) + (len(SEGMENT_SEPARATOR) if group else 0)
+        if group and size + added > max_chars:
+            groups.append(group)
+            group, size = [], 0
+            added = len(text)
+        group.append(i)
+        size += added
+    if group:
+        groups.append(group)
+    return groups
+
+
+async def _translate_group(texts: list[str]) -> list[str]:
+    if len(texts) == 1:
+        return [await translate(texts[0])]
+
+    translated = await translate(SEGMENT_SEPARATOR.join(texts))
+    segments = _SEGMENT_SEPARATOR_PATTERN.split(translated.strip())
+    if len(segments) == len(texts):
+        return segments
+
+    # A separator got translated or was part of a text, go one by one
+    return list(await asyncio.gather(*(translate(text) for text in texts)))
+
+
+async def translate_many(
+    texts: list[str],
+    max_chars: int = MAX_REQUEST_CHARS,
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+    retries: int = MAX_REQUEST_RETRIES,
+) -> list[str]:
+    """
+    Translate many texts in as few requests as possible, joining them into
+    multi-segment requests of at most ``max_chars`` characters.
+
+    Texts longer than that are split into chunks translated concurrently,
+    and put back together with their original separators, paragraph
+    breaks included. Once every request is done, the failed ones are sent
+    again, up to ``retries`` times, without the requests that succeeded.
+
+    :param max_concurrency: Max requests in flight at once
+    :param retries: Times the failed requests are sent again
+    :return: Translation of each text, in order
+    :raises PartialTranslationError: if some requests still failed, with
+        the texts that were fully translated
+    """
+    parts = [split_chunks(text, max_chars=max_chars) for text in texts]
+    chunks = [chunk for text_parts in parts for chunk in text_parts[::2]]
+
+    # Blank chunks have nothing to translate
+    translated = {i: chunk for i, chunk in enumerate(chunks) if not chunk.strip()}
+    to_translate = [i for i in range(len(chunks)) if i not in translated]
+    groups = [
+        [to_translate[i] for i in group]
+        for group in _pack([chunks[i] for i in to_translate], max_chars=max_chars)
+    ]
+
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def _translate_slotted(group: list[int]) -> list[str]:
+        async with slots:
+            return await _translate_group([chunks[i] for i in group])
+
+    failed = []
+    for _ in range(retries + 1):
+        results = await asyncio.gather(
+            *(_translate_slotted(group) for group in groups), return_exceptions=True
+        )
+
+        failed, failed_groups = [], []
+        for group, result in zip(groups, results):
+            if isinstance(result, BaseException):
+                failed.append(result)
+                failed_groups.append(group)
             else:
-                raise e
+                translated.update(zip(group, result))
+        if not failed:
+            break
+        groups = failed_groups
+
+    output, chunk_index = {}, 0
+    for i, text_parts in enumerate(parts):
+        n = len(text_parts[::2])
+        indices = range(chunk_index, chunk_index + n)
+        chunk_index += n
+        if all(j in translated for j in indices):
+            output[i] = "".join(
+                translated[indices[k // 2]] if k % 2 == 0 else part
+                for k, part in enumerate(text_parts)
+            )
+
+    if failed:
+        raise PartialTranslationError(output, failed=len(failed)) from failed[0]
+    return [output[i] for i in range(len(texts))]
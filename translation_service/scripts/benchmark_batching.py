@@ -0,0 +1,106 @@
+"""
+Messages/sec of the translation micro-batching against the batch size.
+
+By default the provider is simulated: each request takes a fixed overhead
+plus a per-character cost, and only a few requests are served at once, as
+with a rate-limited API. Use --provider google to call the real one.
+
+    python scripts/benchmark_batching.py --messages 256 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from functools import partial
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main")
+)
+from libs.batcher import MicroBatcher  # noqa: E402
+from services import translation_service  # noqa: E402
+from services.translation_backends import (  # noqa: E402
+    TranslationBackend,
+    create_backends,
+)
+
+TEXT = (
+    "The quick brown fox jumps over the lazy dog. "
+    "Pack my box with five dozen liquor jugs.\n\n"
+) * 3
+
+
+class SimulatedBackend(TranslationBackend):
+    name = "simulated"
+
+    def __init__(self, overhead: float, per_char: float, concurrency: int):
+        self.overhead = overhead
+        self.per_char = per_char
+        self.requests = 0
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def translate(self, text: str, src: str, dest: str):
+        self.requests += 1
+        async with self._slots:
+            await asyncio.sleep(self.overhead + len(text) * self.per_char)
+        return text.upper()
+
+
+async def run(batch_size: int, wait_ms: float, messages: int, concurrency: int):
+    batcher = MicroBatcher(
+        partial(translation_service.translate_many, max_chars=4500),
+        max_size=batch_size,
+        max_wait=wait_ms / 1000,
+    )
+    await batcher.start()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def _handle_one():
+        async with slots:
+            await batcher.submit(TEXT)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_handle_one() for _ in range(messages)))
+    elapsed = time.perf_counter() - started
+    await batcher.close()
+    return elapsed
+
+
+async def main(args) -> None:
+    if args.provider == "simulated":
+        backend = SimulatedBackend(
+            overhead=args.overhead_ms / 1000,
+            per_char=args.per_char_ms / 1000,
+            concurrency=args.provider_concurrency,
+        )
+        translation_service.translation_router.configure(
+            backends=[backend], hedge_percentile=0
+        )
+    else:
+        translation_service.translation_router.configure(
+            backends=create_backends(["googletrans"])
+        )
+
+    print(f"{'batch size':>10} {'msg/s':>10} {'batches':>10}")
+    for batch_size in args.batch_sizes:
+        elapsed = await run(batch_size, args.wait_ms, args.messages, args.concurrency)
+        batches = -(-args.messages // batch_size)
+        print(f"{batch_size:>10} {args.messages / elapsed:>10.1f} {batches:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--provider", choices=["simulated", "google"], default="simulated"
+    )
+    parser.add_argument("--messages", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument("--wait-ms", type=float, default=50)
+    parser.add_argument("--overhead-ms", type=float, default=300)
+    parser.add_argument("--per-char-ms", type=float, default=0.01)
+    parser.add_argument("--provider-concurrency", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
@@ -3,7 +3,9 @@ import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import config
 from main.services import ocr_service, pdf_service, translation_service
+from main.services.translation_backends import create_backends
 
 
 async def run_system_as_is():
@@ -12,6 +14,9 @@ async def run_system_as_is():
     text = await ocr_service.image_to_text(
         image_path=os.path.join(os.getcwd(), "scripts", "sample.png")
     )
+    translation_service.translation_router.configure(
+        backends=create_backends(config.TRANSLATION_BACKENDS)
+    )
     translated_text = await translation_service.translate(text)
     await pdf_service.text_to_pdf(
         text=translated_text,
@@ -0,0 +1,81 @@
+"""
+Warm the translation memory with the texts already translated.
+
+retry_jobs rows past the translation step hold both the OCR text and its
+translation; their sentences are paired up and saved to the memory when
+both texts split into the same number of sentences. text_cache rows only
+map a digest of the text to a PDF, so they can't seed the memory.
+
+    python scripts/warm_translation_memory.py --batch-size 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from sqlalchemy import select
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main")
+)
+from libs.translation_memory import split_segments  # noqa: E402
+from models.retry_job import RetryJobModel  # noqa: E402
+from run import AsyncSessionLocal, translation_memory  # noqa: E402
+
+
+def align(source: str, translated: str) -> dict[str, str]:
+    """
+    Pair up the sentences of a text and of its translation.
+
+    :return: Source -> translated sentence, empty if they don't line up
+    """
+    source_parts = split_segments(source)[::2]
+    translated_parts = split_segments(translated)[::2]
+    if len(source_parts) != len(translated_parts):
+        return {}
+
+    return {
+        source_part: translated_part
+        for source_part, translated_part in zip(source_parts, translated_parts)
+        if source_part.strip() and translated_part.strip()
+    }
+
+
+async def warm(batch_size: int) -> None:
+    last_id, jobs, sentences = 0, 0, 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            stmt = (
+                select(
+                    RetryJobModel.id,
+                    RetryJobModel.text_to_translate,
+                    RetryJobModel.translated_text,
+                )
+                .where(RetryJobModel.id > last_id)
+                .where(RetryJobModel.text_to_translate.is_not(None))
+                .where(RetryJobModel.translated_text.is_not(None))
+                .order_by(RetryJobModel.id)
+                .limit(batch_size)
+            )
+            rows = (await session.execute(stmt)).all()
+        if not rows:
+            break
+
+        pairs = {}
+        for _, source, translated in rows:
+            pairs.update(align(source, translated))
+        if pairs:
+            await translation_memory.add_many(pairs)
+
+        last_id = rows[-1].id
+        jobs += len(rows)
+        sentences += len(pairs)
+
+    print(f"Saved {sentences} sentences from {jobs} jobs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(warm(parser.parse_args().batch_size))
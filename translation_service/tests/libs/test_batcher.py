@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from main.libs.batcher import MicroBatcher
+
+
+async def test_micro_batcher_groups_concurrent_items():
+    batches = []
+
+    async def double(items):
+        batches.append(items)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_size=4, max_wait=0.05)
+    await batcher.start()
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+    await batcher.close()
+
+    assert results == [i * 2 for i in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+
+
+async def test_micro_batcher_fails_every_item_of_a_failed_batch():
+    async def fail(items):
+        raise ValueError("provider is down")
+
+    batcher = MicroBatcher(fail, max_size=4, max_wait=0.01)
+    await batcher.start()
+
+    results = await asyncio.gather(
+        *(batcher.submit(i) for i in range(3)), return_exceptions=True
+    )
+    await batcher.close()
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_micro_batcher_only_fails_the_items_missing_from_a_partial_result():
+    class PartialError(Exception):
+        translated = {0: "zero", 2: "two"}
+
+    async def fail(items):
+        raise PartialError()
+
+    batcher = MicroBatcher(fail, max_size=4, max_wait=0.01)
+    await batcher.start()
+
+    results = await asyncio.gather(
+        *(batcher.submit(i) for i in range(3)), return_exceptions=True
+    )
+    await batcher.close()
+
+    assert results[0] == "zero" and results[2] == "two"
+    assert isinstance(results[1], PartialError)
+
+
+async def test_micro_batcher_must_be_started():
+    batcher = MicroBatcher(lambda items: items)
+
+    with pytest.raises(RuntimeError):
+        await batcher.submit(1)
@@ -0,0 +1,65 @@
+import asyncio
+
+from main.libs.consumer import Consumer
+
+
+class FakeMessage:
+    def __init__(self):
+        self.delivery_tag = 1
+        self.settled = []
+
+    async def ack(self) -> None:
+        self.settled.append("ack")
+
+    async def reject(self) -> None:
+        self.settled.append("reject")
+
+
+async def _consume(handler, message: FakeMessage) -> list[tuple]:
+    rejected = []
+
+    async def on_reject(message, error: str) -> None:
+        rejected.append((message, error))
+
+    consumer = Consumer(
+        url="amqp://",
+        queue_name="queue",
+        handler=handler,
+        message_timeout=0.05,
+        on_reject=on_reject,
+    )
+    await consumer._process(message)
+    return rejected
+
+
+async def test_consumer_hands_rejected_messages_over():
+    async def fail(message):
+        raise ValueError("handler failed")
+
+    message = FakeMessage()
+    rejected = await _consume(fail, message)
+
+    assert message.settled == ["reject"]
+    assert rejected == [(message, "handler failed")]
+
+
+async def test_consumer_hands_timed_out_messages_over():
+    async def hang(message):
+        await asyncio.sleep(1)
+
+    message = FakeMessage()
+    rejected = await _consume(hang, message)
+
+    assert message.settled == ["reject"]
+    assert rejected == [(message, "Took more than 0.05s to handle")]
+
+
+async def test_consumer_acks_handled_messages():
+    async def handle(message):
+        pass
+
+    message = FakeMessage()
+    rejected = await _consume(handle, message)
+
+    assert message.settled == ["ack"]
+    assert rejected == []
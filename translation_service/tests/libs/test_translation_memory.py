@@ -0,0 +1,86 @@
+import pytest
+
+from main.libs.translation_memory import TranslationMemory, split_segments
+
+TEXT = "First sentence. Second one!\n\nNew paragraph?  Last\nline"
+
+
+class _Cache:
+    def __init__(self):
+        self.values = {}
+
+    async def get_many(self, keys, session=None):
+        return {key: self.values[key] for key in keys if key in self.values}
+
+    async def set_many(self, mapping, session=None):
+        self.values.update(mapping)
+
+    def get_stats(self):
+        return {}
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def test_split_segments():
+    parts = split_segments(TEXT)
+
+    assert "".join(parts) == TEXT
+    assert parts[::2] == [
+        "First sentence.",
+        "Second one!",
+        "New paragraph?",
+        "Last",
+        "line",
+    ]
+
+
+async def test_translation_memory_only_translates_new_sentences():
+    requests = []
+
+    async def translate_many(segments):
+        requests.append(segments)
+        return [segment.upper() for segment in segments]
+
+    memory = TranslationMemory(
+        cache=_Cache(), session_factory=_Session, translate_many=translate_many
+    )
+
+    assert await memory.translate_many([TEXT]) == [TEXT.upper()]
+    await memory.close()
+
+    translated = await memory.translate_many(["Second one! Unseen."])
+
+    assert translated == ["SECOND ONE! UNSEEN."]
+    assert requests[-1] == ["Unseen."]
+    assert memory.stats == {"segments": 7, "hits": 1}
+
+
+async def test_translation_memory_reports_partial_results_by_text():
+    class PartialError(Exception):
+        def __init__(self, translated):
+            self.translated = translated
+
+    async def translate_many(segments):
+        raise PartialError(
+            {
+                i: segment.upper()
+                for i, segment in enumerate(segments)
+                if segment != "Bad."
+            }
+        )
+
+    memory = TranslationMemory(
+        cache=_Cache(), session_factory=_Session, translate_many=translate_many
+    )
+
+    with pytest.raises(PartialError) as e:
+        await memory.translate_many(["Good. Fine.", "Good. Bad."])
+    await memory.close()
+
+    assert e.value.translated == {0: "GOOD. FINE."}
@@ -0,0 +1,78 @@
+from main.services import inflight_service, job_service
+from main.services.job_service import JobStage, JobState
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def hset(self, key: str, mapping: dict) -> None:
+        self.redis.hashes.setdefault(key, {}).update(mapping)
+
+    def expire(self, key: str, seconds: int) -> None:
+        pass
+
+    async def execute(self) -> list:
+        return []
+
+
+class FakeRedis:
+    """
+    The commands of Redis used to release an in-flight job and record the
+    state of its subscribers.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.hashes = {}
+
+    def register_script(self, script: str):
+        async def release(keys: list[str], args=()) -> list[str]:
+            self.values.pop(keys[0], None)
+            return sorted(self.sets.pop(keys[1], set()))
+
+        return release
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+
+async def test_fail_releases_the_image_and_fails_its_subscribers():
+    redis = FakeRedis()
+    redis.values["inflight:image"] = "job-1"
+    redis.sets["inflight:image:subscribers"] = {"job-2", "job-3"}
+
+    subscribers = await inflight_service.fail(
+        redis=redis,
+        image_hash="image",
+        stage=JobStage.TRANSLATION,
+        error="provider is down",
+    )
+
+    assert subscribers == ["job-2", "job-3"]
+    assert "inflight:image" not in redis.values
+    assert "inflight:image:subscribers" not in redis.sets
+    for job_uuid in subscribers:
+        job = redis.hashes[job_service.JOB_KEY.format(job_uuid=job_uuid)]
+        assert job["state"] == JobState.FAILED
+        assert job["error"] == "provider is down"
+
+
+async def test_fail_without_subscribers():
+    redis = FakeRedis()
+    redis.values["inflight:image"] = "job-1"
+
+    subscribers = await inflight_service.fail(
+        redis=redis, image_hash="image", stage=JobStage.TRANSLATION, error="error"
+    )
+
+    assert subscribers == []
+    assert redis.values == {}
+    assert redis.hashes == {}
@@ -0,0 +1,40 @@
+import asyncio
+
+from main.services.rate_limiter import AIMDController, is_throttling_error
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+def test_aimd_controller_backs_off_and_probes_upward():
+    controller = AIMDController(initial=8, min_limit=1, max_limit=10, cooldown=60)
+
+    controller.on_throttle()
+    # A burst of throttled requests only halves the limit once
+    controller.on_throttle()
+    assert controller.limit == 4
+
+    for _ in range(100):
+        controller.on_success()
+    assert controller.limit == 10
+
+
+async def test_aimd_controller_limits_concurrency():
+    controller = AIMDController(initial=2)
+    await controller.acquire()
+    await controller.acquire()
+
+    waiting = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    await controller.release()
+    await asyncio.wait_for(waiting, timeout=1)
+    assert controller.in_flight == 2
+
+
+def test_is_throttling_error():
+    assert is_throttling_error(ThrottledError())
+    assert is_throttling_error(Exception('Unexpected status code "429"'))
+    assert not is_throttling_error(ConnectionError("reset by peer"))
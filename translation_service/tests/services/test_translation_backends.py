@@ -0,0 +1,22 @@
+import pytest
+
+from main.services.translation_backends import LocalBackend, create_backends
+
+
+async def test_local_backend_translates_longest_phrases():
+    backend = LocalBackend()
+
+    translated = await backend.translate(
+        "Thank you for the book.\n\n###\n\nPage 12", src="en", dest="vi"
+    )
+
+    assert translated == "Cảm ơn cho the sách.\n\n###\n\nTrang 12"
+
+
+def test_create_backends_skips_unknown_backends():
+    backends = create_backends(["unknown", "local"])
+
+    assert [backend.name for backend in backends] == ["local"]
+
+    with pytest.raises(ValueError):
+        create_backends(["unknown"])
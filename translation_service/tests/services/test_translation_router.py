@@ -0,0 +1,127 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from main.services.translation_backends import TranslationBackend
+from main.services.translation_router import (
+    CircuitBreaker,
+    CircuitOpenError,
+    TranslationRouter,
+)
+
+
+class FakeBackend(TranslationBackend):
+    def __init__(self, name, delays=(), fail=False):
+        self.name = name
+        self.delays = list(delays)
+        self.fail = fail
+        self.calls = 0
+
+    async def translate(self, text, src, dest):
+        self.calls += 1
+        await asyncio.sleep(self.delays.pop(0) if self.delays else 0)
+        if self.fail:
+            raise ConnectionError(self.name)
+        return f"{self.name}:{text}"
+
+
+async def test_router_falls_back_and_opens_circuit():
+    primary = FakeBackend("primary", fail=True)
+    fallback = FakeBackend("fallback")
+    router = TranslationRouter([primary, fallback], failure_threshold=2, retry_delay=0)
+
+    for _ in range(3):
+        assert await router.translate("hi", src="en", dest="vi") == "fallback:hi"
+
+    # The circuit opened after 2 failures, the third call skipped the primary
+    assert primary.calls == 2
+    assert router.get_stats()["primary"]["state"] == CircuitBreaker.OPEN
+
+
+async def test_router_raises_when_every_circuit_is_open():
+    router = TranslationRouter(
+        [FakeBackend("primary", fail=True)], failure_threshold=1, retry_delay=0
+    )
+
+    with pytest.raises(ConnectionError):
+        await router.translate("hi", src="en", dest="vi")
+    with pytest.raises(CircuitOpenError):
+        await router.translate("hi", src="en", dest="vi")
+
+
+async def test_router_retries_a_backend_before_falling_back():
+    primary = FakeBackend("primary", fail=True)
+    fallback = FakeBackend("fallback")
+    router = TranslationRouter([primary, fallback], retries=3, retry_delay=0)
+
+    assert await router.translate("hi", src="en", dest="vi") == "fallback:hi"
+    assert primary.calls == 3
+
+
+async def test_router_without_backends_raises():
+    router = TranslationRouter([])
+
+    with pytest.raises(RuntimeError):
+        await router.translate("hi", src="en", dest="vi")
+
+
+async def test_circuit_lets_a_single_trial_through_after_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_router_hedges_slow_requests():
+    backend = FakeBackend("primary")
+    router = TranslationRouter(
+        [backend], hedge_percentile=0.95, hedge_min_delay=0.01, hedge_min_samples=5
+    )
+    for _ in range(5):
+        await router.translate("warm up", src="en", dest="vi")
+
+    backend.delays = [1, 0]
+    translated = await asyncio.wait_for(
+        router.translate("hi", src="en", dest="vi"), timeout=0.5
+    )
+
+    assert translated == "primary:hi"
+    assert router.get_stats()["primary"]["hedge_wins"] == 1
+
+
+class SlowLimiter:
+    def __init__(self, wait: float):
+        self.wait = wait
+
+    @asynccontextmanager
+    async def slot(self):
+        await asyncio.sleep(self.wait)
+        yield
+
+    def get_stats(self) -> dict:
+        return {}
+
+
+async def test_router_does_not_hedge_while_waiting_for_the_rate_limiter():
+    backend = FakeBackend("primary")
+    router = TranslationRouter(
+        [backend],
+        limiters={"primary": SlowLimiter(wait=0)},
+        hedge_percentile=0.95,
+        hedge_min_delay=0.01,
+        hedge_min_samples=5,
+    )
+    for _ in range(5):
+        await router.translate("warm up", src="en", dest="vi")
+
+    router._routes[0].limiter.wait = 0.1
+    translated = await router.translate("hi", src="en", dest="vi")
+
+    assert translated == "primary:hi"
+    assert backend.calls == 6
+    assert router.get_stats()["primary"]["hedges"] == 0
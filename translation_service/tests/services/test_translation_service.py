@@ -0,0 +1,111 @@
+import pytest
+
+from main.services import translation_service
+
+
+async def test_translate_many_joins_texts(mocker):
+    requests = []
+
+    async def translate(text):
+        requests.append(text)
+        return text.upper()
+
+    mocker.patch.object(translation_service, "translate", translate)
+
+    texts = ["first page\n\nsecond paragraph", "", "third"]
+    translated = await translation_service.translate_many(texts)
+
+    assert translated == ["FIRST PAGE\n\nSECOND PARAGRAPH", "", "THIRD"]
+    assert len(requests) == 1
+
+
+async def test_translate_many_splits_large_requests(mocker):
+    requests = []
+
+    async def translate(text):
+        requests.append(text)
+        return text
+
+    mocker.patch.object(translation_service, "translate", translate)
+
+    texts = ["a" * 30, "b" * 30, "c" * 30]
+    translated = await translation_service.translate_many(texts, max_chars=70)
+
+    assert translated == texts
+    assert len(requests) == 2
+
+
+async def test_translate_many_falls_back_when_separator_is_lost(mocker):
+    async def translate(text):
+        return text.replace("###", "")
+
+    mocker.patch.object(translation_service, "translate", translate)
+
+    translated = await translation_service.translate_many(["one", "two"])
+
+    assert translated == ["one", "two"]
+
+
+def test_split_chunks_keeps_paragraphs():
+    paragraphs = ["First paragraph. " * 3, "Second. " * 10, "Third."]
+    text = "\n\n".join(paragraphs)
+
+    parts = translation_service.split_chunks(text, max_chars=60)
+
+    assert "".join(parts) == text
+    assert all(len(chunk) <= 60 for chunk in parts[::2])
+    assert parts[1] == "\n\n"
+
+
+def test_split_chunks_cuts_long_words():
+    parts = translation_service.split_chunks("x" * 25, max_chars=10)
+
+    assert parts == ["x" * 10, "", "x" * 10, "", "x" * 5]
+
+
+async def test_translate_many_translates_long_texts_in_chunks(mocker):
+    requests = []
+
+    async def translate(text):
+        requests.append(text)
+        return text.upper()
+
+    mocker.patch.object(translation_service, "translate", translate)
+
+    text = "\n\n".join(["Sentence one. Sentence two."] * 4)
+    translated = await translation_service.translate_many([text], max_chars=30)
+
+    assert translated == [text.upper()]
+    assert len(requests) == 4
+    assert all(len(request) <= 30 for request in requests)
+
+
+async def test_translate_many_keeps_translated_texts_on_failure(mocker):
+    async def translate(text):
+        if "fail" in text:
+            raise ValueError("provider is down")
+        return text.upper()
+
+    mocker.patch.object(translation_service, "translate", translate)
+
+    with pytest.raises(translation_service.PartialTranslationError) as e:
+        await translation_service.translate_many(["ok", "fail"], max_chars=5)
+
+    assert e.value.translated == {0: "OK"}
+
+
+async def test_translate_many_retries_only_the_failed_requests(mocker):
+    requests = []
+
+    async def translate(text):
+        requests.append(text)
+        if text == "fail" and requests.count(text) == 1:
+            raise ValueError("provider is down")
+        return text.upper()
+
+    mocker.patch.object(translation_service, "translate", translate)
+
+    translated = await translation_service.translate_many(["ok", "fail"], max_chars=5)
+
+    assert translated == ["OK", "FAIL"]
+    assert requests == ["ok", "fail", "fail"]